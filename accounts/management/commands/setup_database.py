@@ -19,5 +19,21 @@ class Command(BaseCommand):
         call_command("loaddata", "products/fixtures/products_review_fixtures.json")
         call_command("loaddata", "products/fixtures/trainer_reviews_fixtures.json")
 
+        # loaddata neukládá přes Model.save(), řadicí klíče a atributy produktů je proto nutné dopočítat.
+        self.stdout.write("Počítám řadicí klíče...")
+        call_command("backfill_sort_keys")
+        call_command("backfill_product_attributes")
+
+        # Kategorie z fixtur se ukládají bez signálů, strom kategorií je nutné sestavit.
+        self.stdout.write("Sestavuji strom kategorií...")
+        call_command("rebuild_category_tree")
+
+        # Recenze z fixtur se ukládají bez signálů, souhrny hodnocení je nutné dopočítat.
+        self.stdout.write("Počítám souhrny hodnocení...")
+        call_command("reconcile_ratings")
+
+        self.stdout.write("Sestavuji vyhledávací index...")
+        call_command("rebuild_search_index")
+
 
         self.stdout.write("Databáze byla úspěšně nastavena!")
@@ -1,13 +1,15 @@
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.db.models import Model, DateTimeField, CharField, URLField, ForeignKey, SET_NULL, BooleanField, \
-    IntegerField, EmailField, TextField, DateField, UniqueConstraint, CASCADE, Avg
+    IntegerField, EmailField, TextField, DateField, BinaryField, UniqueConstraint, CASCADE
 
 from perfectbody.settings import AUTH_USER_MODEL
+from products.collation import czech_sort_key
+from products.models import RatingSummary
 
 # from products.models import Product
 
-class UserProfile(AbstractUser):
+class UserProfile(AbstractUser, RatingSummary):
     PREFERRED_CHANNEL = [('PHONE', 'Telefón'), ('EMAIL', 'Email'), ('POST', 'Pošta')]
     ACCOUNT_TYPES = [('registered', 'Registrovaný uživatel'), ('guest', 'Neregistrovaný uživatel')]
 
@@ -23,13 +25,11 @@ class UserProfile(AbstractUser):
     date_of_birth = DateField(blank=True, null=True)
     created_at = DateTimeField(auto_now_add=True) # datum vytvoreni uctu
     account_type = CharField(max_length=15, choices=ACCOUNT_TYPES, default='registered')
+    full_name_sort_key = BinaryField(default=b'', db_index=True)  # český řadicí klíč pro full_name()
 
     def calculate_average_rating(self):
-        reviews = self.trainer_reviews.all()
-        if not reviews.exists():
-            return 0.0
-        average = reviews.aggregate(Avg('rating'))['rating__avg']
-        return round(average, 2) if average is not None else 0.0
+        # Průměr hodnocení trenéra je uložený v rating_average (viz RatingSummary).
+        return round(self.rating_average, 2)
 
     class Meta:
         ordering = ['first_name', 'last_name']
@@ -43,6 +43,10 @@ class UserProfile(AbstractUser):
     def full_name(self):
         return f'{self.first_name} {self.last_name}'
 
+    def save(self, *args, **kwargs):
+        self.full_name_sort_key = czech_sort_key(self.full_name())
+        super().save(*args, **kwargs)
+
 
 class Address(Model):
 
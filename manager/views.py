@@ -7,6 +7,7 @@ from unicodedata import category
 
 from accounts.models import TrainersServices, UserProfile
 from manager.forms import CategoryForm, ProductForm, ServiceForm, TrainerForm, ProducerForm, UserForm
+from products.listing import listing_queryset
 from products.models import Product, Category, Producer, ProductReview, TrainerReview
 
 
@@ -187,12 +188,12 @@ def delete_service(request, service_id):
 
 @user_passes_test(is_admin)
 def manage_products(request):
-    products = Product.objects.filter(product_type='merchantdise')
+    products = listing_queryset(Product.objects.filter(product_type='merchantdise'), with_category=True)
     return render(request, 'manage_products.html', {'products': products})
 
 @user_passes_test(is_admin)
 def manage_services(request):
-    services = Product.objects.filter(product_type='service')
+    services = listing_queryset(Product.objects.filter(product_type='service'), with_category=True)
     return render(request, 'manage_services.html', {'services': services})
 
 @user_passes_test(is_admin)
@@ -81,6 +81,7 @@ TEMPLATES = [
                 'viewer.context_processors.navbar_products_context',
                 'viewer.context_processors.navbar_services_context',
                 'viewer.context_processors.navbar_trainers_context',
+                'products.page_cache.page_cache_context',
             ],
         },
     },
@@ -100,6 +101,29 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# The navbar, versions of cached pages, ETags (site version), the catalog index and search versions
+# are invalidated through keys in this cache, so every worker process must use the same cache.
+# REDIS_URL (e.g. redis://127.0.0.1:6379/1, needs the redis package) is required for deployments
+# with more than one worker. Without it each process has its own local-memory cache, which is only
+# correct for a single process (runserver, tests).
+REDIS_URL = os.getenv("REDIS_URL")
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -147,3 +171,59 @@ STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
+# Catalog listings and reviews
+# Keyset pagination (?after=<cursor>) instead of numbered pages, see products/pagination.py.
+# It is also used for any request carrying the ?after= parameter.
+CURSOR_PAGINATION = False
+# In-process array index of the catalog (products/catalog_index.py): category listings, sorting
+# and facet counts are computed in memory and only the displayed rows are loaded from the database.
+CATALOG_INDEX = False
+# Directory of the read-only catalog snapshot written by publish_catalog_snapshot (products/snapshot.py).
+# Workers mmap the published file and use it for listings instead of a per-process index; it is refreshed
+# only by publishing a new version. None disables it.
+CATALOG_SNAPSHOT_DIR = None
+
+
+
+
+# Search
+# 'index' = in-process inverted index (viewer/search.py),
+# 'fts' = SQLite FTS5 table shared by all workers (viewer/search_fts.py, see rebuild_search_index),
+# 'snapshot' = memory-mapped catalog snapshot shared by all workers (see CATALOG_SNAPSHOT_DIR),
+# 'scan' = substring scan over the tables.
+SEARCH_BACKEND = 'index'
+# Maximum number of results per type (products, services, trainers).
+SEARCH_RESULTS_LIMIT = 50
+# Per-process LRU cache of search results (number of queries, 0 disables it) and its TTL in seconds.
+# Entries are keyed by the catalog version, so catalog changes invalidate them immediately.
+SEARCH_CACHE_SIZE = 1000
+SEARCH_CACHE_TIMEOUT = 300
+# Minimum trigram similarity (0-1) of a misspelled word to a word in a name, used by the 'index'
+# backend when a query finds nothing ("protien" -> "protein"). None disables typo tolerance.
+SEARCH_FUZZY_THRESHOLD = 0.3
+# Navbar typeahead (/search/suggest/): default and maximum number of suggestions per type,
+# longest accepted query and how long browsers/proxies may cache a response (seconds).
+SEARCH_SUGGEST_LIMIT = 5
+SEARCH_SUGGEST_MAX_LIMIT = 10
+SEARCH_SUGGEST_MAX_QUERY_LENGTH = 100
+SEARCH_SUGGEST_MAX_AGE = 60
+
+
+# Full-page cache of product, service and trainer detail pages for anonymous visitors
+# (products/page_cache.py), timeout in seconds; 0 disables it.
+# Pages are keyed by object/site versions, so edits and new reviews show up immediately.
+PAGE_CACHE_TIMEOUT = 600
+
+
+# Outbound HTTP (viewer/http_client.py)
+# Per-service base URL; optional keys override the client defaults: timeout (connect, read),
+# retries, backoff, failure_threshold and cooldown of the circuit breaker, pool_size.
+EXTERNAL_SERVICES = {
+    'weather': {
+        'base_url': 'https://wttr.in',
+    },
+}
+# Answer outbound requests from the JSON files in viewer/stubs/ instead of the network,
+# optionally with an artificial delay (seconds) to emulate upstream latency in load tests.
+EXTERNAL_STUB = os.getenv('EXTERNAL_STUB', 'False') == 'True'
+EXTERNAL_STUB_DELAY = float(os.getenv('EXTERNAL_STUB_DELAY', '0'))
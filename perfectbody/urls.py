@@ -29,9 +29,9 @@ from products.views import products, product, producer, services, service, train
     add_trainer_review, add_service_review, add_product_review
 from accounts.views import edit_profile, profile_view, change_password, register, login_view, logout_view, \
     TrainerRegistrationWizard, registration_success
-from viewer.views import view_cart, add_to_cart, remove_from_cart, home, user_profile_view, search, update_cart_ajax, \
-    update_note_in_cart, custom_400, custom_403, custom_404, custom_408, custom_429, custom_500, custom_503, cart_data, \
-    cart_data_navbar
+from viewer.views import view_cart, add_to_cart, remove_from_cart, home, user_profile_view, search, search_suggest, \
+    update_cart_ajax, update_note_in_cart, custom_400, custom_403, custom_404, custom_408, custom_429, custom_500, \
+    custom_503, cart_data, cart_data_navbar
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -65,6 +65,7 @@ urlpatterns = [
     path('detail/<int:order_id>/', order_detail, name='order_detail'),
     path('orders/cancel/<int:order_id>/', cancel_order, name='cancel_order'),
     path('search/', search, name='search'),
+    path('search/suggest/', search_suggest, name='search_suggest'),
     path(
         'register/trainer/',
         TrainerRegistrationWizard.as_view(
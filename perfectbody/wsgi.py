@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'perfectbody.settings')
 
 application = get_wsgi_application()
+
+# Sestavení vyhledávacího indexu (a indexu katalogu, je-li zapnutý) při startu workeru, ne až při prvním dotazu.
+from viewer.search import catalog_search  # noqa: E402
+from products.catalog_index import catalog_index  # noqa: E402
+catalog_search.warm_up()
+catalog_index.warm_up()
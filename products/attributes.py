@@ -0,0 +1,31 @@
+"""
+Odvozené atributy produktu pro filtrování (fasety).
+
+Atribut je indexovaný sloupec Product dopočítaný v Product.save() (po nahrání fixtur
+ho doplní příkaz backfill_product_attributes). Dostupnost hodnot i jejich počty pak dává
+jeden seskupený dotaz (`attribute_counts`) místo LIKE dotazu na každou hodnotu.
+"""
+from django.db.models import Count
+
+# Hodnota atributu gender -> slovo v názvu produktu, podle kterého se pozná.
+GENDER_KEYWORDS = {
+    'ladies': 'dámské',
+    'gentlemans': 'pánské',
+}
+
+
+def product_gender(name):
+    """'ladies', 'gentlemans', nebo '' podle názvu produktu (bez ohledu na velikost písmen)."""
+    name = (name or '').lower()
+    for gender, keyword in GENDER_KEYWORDS.items():
+        if keyword in name:
+            return gender
+    return ''
+
+
+def attribute_counts(queryset, field):
+    """Počty produktů podle hodnot atributu `field` jedním GROUP BY dotazem: {hodnota: počet}."""
+    if hasattr(queryset, 'attribute_counts'):
+        # Výběr z indexu katalogu spočítá hodnoty z polí v paměti.
+        return queryset.attribute_counts(field)
+    return dict(queryset.order_by().values_list(field).annotate(count=Count('pk')))
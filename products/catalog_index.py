@@ -0,0 +1,414 @@
+"""
+Volitelný index katalogu v paměti procesu pro výpisy produktů a služeb (settings.CATALOG_INDEX).
+
+Produkty jsou uložené ve sloupcích typovaných polí (modul array): id, kategorie, výrobce, typ,
+gender, cena v haléřích, sklad, průměr hodnocení a pořadí podle českého řazení názvu.
+Pro každý typ a kategorii drží index seznamy řádků předem seřazené pro všechna řazení výpisu,
+výpis kategorie tak prochází jen své řádky (podstrom slévá seřazené seznamy) a z databáze
+se načte jen deset zobrazených produktů; počty pro fasety a gender se spočítají ze stejných polí.
+
+Index se sestaví při prvním použití. Změny produktů (sklad, cena, hodnocení, kategorie) se
+zapisují do deníku ve sdílené cache (pořadové číslo změny -> id produktu) a každý proces si
+změněné řádky při dalším použití dočte a zařadí. Přestavění celého indexu vyvolá jen nový nebo
+přejmenovaný produkt, hromadná úprava (zvýšení verze indexu) nebo výpadek deníku.
+"""
+import heapq
+import logging
+import operator
+import sys
+import threading
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError
+
+from products.facets import price_bucket
+from products.listing import listing_queryset
+from products.models import Product
+from products.page_cache import get_versions
+from products.snapshot import current_snapshot
+
+logger = logging.getLogger(__name__)
+
+CATALOG_INDEX_VERSION_KEY = 'catalog_index:version'
+# Deník změn řádků: počítadlo změn a klíč jedné změny (id produktu).
+CATALOG_INDEX_CHANGES_KEY = 'catalog_index:changes'
+CATALOG_INDEX_CHANGE_KEY = 'catalog_index:change:{}'
+# How long a journal entry stays in the cache (seconds) and how many pending changes a worker
+# applies row by row before it rebuilds the whole index instead.
+CATALOG_INDEX_CHANGE_TIMEOUT = 3600
+MAX_PENDING_CHANGES = 500
+PRODUCT_TYPES = {'merchantdise': 1, 'service': 2}
+GENDERS = {'': 0, 'ladies': 1, 'gentlemans': 2}
+GENDER_NAMES = {code: gender for gender, code in GENDERS.items()}
+DELETED = 0
+# Řazení výpisu (jako ve views) -> název seřazeného seznamu v indexu.
+ORDERINGS = {
+    ('product_sort_key', 'pk'): 'name',
+    ('price', 'pk'): 'price_asc',
+    ('-price', 'pk'): 'price_desc',
+    ('-rating_average', 'pk'): 'rating',
+}
+COLUMNS = (
+    'pk', 'category_id', 'producer_id', 'product_type', 'gender', 'price', 'stock_availability', 'rating_average',
+    'product_sort_key',
+)
+
+
+def get_index_version():
+    return get_versions([CATALOG_INDEX_VERSION_KEY])[0]
+
+
+def bump_index_version():
+    try:
+        return cache.incr(CATALOG_INDEX_VERSION_KEY)
+    except ValueError:
+        return get_index_version()
+
+
+def get_change_count():
+    return get_versions([CATALOG_INDEX_CHANGES_KEY])[0]
+
+
+def record_change(product_id):
+    """Zapíše změnu produktu do deníku, vrací její pořadové číslo."""
+    get_change_count()
+    try:
+        number = cache.incr(CATALOG_INDEX_CHANGES_KEY)
+    except ValueError:
+        # Počítadlo mezitím z cache vypadlo, ostatní procesy index přestaví.
+        return None
+    cache.set(CATALOG_INDEX_CHANGE_KEY.format(number), product_id, CATALOG_INDEX_CHANGE_TIMEOUT)
+    return number
+
+
+def index_enabled():
+    return getattr(settings, 'CATALOG_INDEX', False) or getattr(settings, 'CATALOG_SNAPSHOT_DIR', None)
+
+
+def use_index(request):
+    """
+    Index (nebo sdílený snímek, products/snapshot.py) se použije pro číslované stránky,
+    stránkování kurzorem potřebuje QuerySet.
+    """
+    return (
+        index_enabled()
+        and not getattr(settings, 'CURSOR_PAGINATION', False)
+        and 'after' not in request.GET
+    )
+
+
+class CatalogArrays:
+    """Sloupce katalogu v paralelních typovaných polích, řádek = jeden produkt."""
+
+    def __init__(self, rows):
+        self.ids = array('q')
+        self.categories = array('q')
+        self.producers = array('q')     # -1 = bez výrobce
+        self.types = array('b')         # 0 = smazaný produkt
+        self.genders = array('b')
+        self.prices = array('q')        # haléře
+        self.stock = array('q')
+        self.ratings = array('d')
+        self.name_hashes = array('q')   # pozná přejmenování (pořadí podle názvu se musí přestavět)
+        self.position = {}
+        # (typ, kategorie) -> {řazení: seznam řádků v tomto řazení}
+        self.buckets = {}
+        # Řádky jsou načtené v pořadí českého řazení názvů, pořadí řádku je tedy i jeho pořadí podle názvu.
+        for row in rows:
+            index = len(self.ids)
+            self.position[row[0]] = index
+            self.ids.append(row[0])
+            self._set(index, row)
+            lists = self._lists(index)
+            if lists is not None:
+                lists['name'].append(index)
+        for lists in self.buckets.values():
+            for name in lists:
+                if name != 'name':
+                    lists[name] = sorted(lists['name'], key=self.order_key(name))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _set(self, index, row):
+        _, category_id, producer_id, product_type, gender, price, stock, rating, sort_key = row
+        values = (
+            (self.categories, category_id), (self.producers, -1 if producer_id is None else producer_id),
+            (self.types, PRODUCT_TYPES.get(product_type, DELETED)), (self.genders, GENDERS.get(gender, 0)),
+            (self.prices, int(price * 100)), (self.stock, stock), (self.ratings, rating or 0.0),
+            (self.name_hashes, hash(bytes(sort_key))),
+        )
+        for column, value in values:
+            if index < len(column):
+                column[index] = value
+            else:
+                column.append(value)
+
+    def _lists(self, index):
+        """Seřazené seznamy typu a kategorie řádku (None pro smazaný produkt)."""
+        if self.types[index] == DELETED:
+            return None
+        key = (self.types[index], self.categories[index])
+        if key not in self.buckets:
+            self.buckets[key] = {name: [] for name in ORDERINGS.values()}
+        return self.buckets[key]
+
+    def _unlink(self, index):
+        lists = self._lists(index)
+        for name, rows in (lists or {}).items():
+            key = self.order_key(name)
+            del rows[bisect_left(rows, index if key is None else key(index), key=key)]
+
+    def _link(self, index):
+        lists = self._lists(index)
+        for name, rows in (lists or {}).items():
+            insort(rows, index, key=self.order_key(name))
+
+    def order_key(self, name):
+        """Klíč řádku v daném řazení; None = pořadí řádků (podle názvu)."""
+        ids, prices, ratings = self.ids, self.prices, self.ratings
+        if name == 'price_asc':
+            return lambda row: (prices[row], ids[row])
+        if name == 'price_desc':
+            return lambda row: (-prices[row], ids[row])
+        if name == 'rating':
+            return lambda row: (-ratings[row], ids[row])
+        return None
+
+    def bucket(self, type_code, category_id, name):
+        """Řádky produktů typu `type_code` v kategorii `category_id` seřazené podle `name`."""
+        lists = self.buckets.get((type_code, category_id))
+        return lists[name] if lists else ()
+
+    def update(self, row):
+        """Promítne změněný produkt. Vrací False, pokud je nutné index přestavět (nový nebo přejmenovaný)."""
+        index = self.position.get(row[0])
+        if index is None or self.name_hashes[index] != hash(bytes(row[-1])):
+            return False
+        # Řádek se vyřadí ze seznamů podle starých hodnot a zařadí podle nových.
+        self._unlink(index)
+        self._set(index, row)
+        self._link(index)
+        return True
+
+    def remove(self, product_id):
+        index = self.position.get(product_id)
+        if index is not None:
+            self._unlink(index)
+            self.types[index] = DELETED
+
+    def rank(self, name):
+        """Pořadí každého řádku v daném řazení přes celý katalog (array, pro snímek products/snapshot.py)."""
+        order = sorted(range(len(self.ids)), key=self.order_key(name))
+        rank = array('q', bytes(array('q').itemsize * len(self.ids)))
+        for position, row in enumerate(order):
+            rank[row] = position
+        return rank
+
+    def memory_usage(self):
+        """Přibližná velikost indexu v bajtech (pole, seřazené seznamy a slovník id -> řádek)."""
+        columns = (
+            self.ids, self.categories, self.producers, self.types, self.genders, self.prices, self.stock,
+            self.ratings, self.name_hashes,
+        )
+        lists = sum(sys.getsizeof(rows) for bucket in self.buckets.values() for rows in bucket.values())
+        return sum(column.itemsize * len(column) for column in columns) + lists + sys.getsizeof(self.position)
+
+
+class CatalogSelection:
+    """
+    Produkty vybraných kategorií indexu s rozhraním QuerySetu, které používají výpisy:
+    filter() s lookupy z views a products.facets, order_by(), count() a řezy pro Paginator.
+    Řádky se projdou až při prvním použití a jen v seřazených seznamech vybraných kategorií.
+    """
+
+    # lookup -> (sloupec, porovnání, převod hodnoty)
+    LOOKUPS = {
+        'gender': ('genders', operator.eq, lambda value: GENDERS.get(value, -1)),
+        'price__gte': ('prices', operator.ge, lambda value: int(value * 100)),
+        'price__lt': ('prices', operator.lt, lambda value: int(value * 100)),
+        'producer_id': ('producers', operator.eq, int),
+        'stock_availability__gt': ('stock', operator.gt, int),
+        'rating_average__gte': ('ratings', operator.ge, float),
+    }
+
+    def __init__(self, arrays, buckets, conditions=(), ordering='name'):
+        self.arrays = arrays
+        self.buckets = buckets
+        self.conditions = conditions
+        self.ordering = ordering
+        self._rows = None
+
+    def filter(self, **lookups):
+        conditions = list(self.conditions)
+        for lookup, value in lookups.items():
+            column_name, compare, convert = self.LOOKUPS[lookup]
+            conditions.append((getattr(self.arrays, column_name), compare, convert(value)))
+        return CatalogSelection(self.arrays, self.buckets, tuple(conditions), self.ordering)
+
+    def order_by(self, *ordering):
+        return CatalogSelection(self.arrays, self.buckets, self.conditions, ORDERINGS[tuple(ordering)])
+
+    @property
+    def rows(self):
+        """Vybrané řádky v pořadí výpisu (seznamy kategorií podstromu se slijí, ne seřadí znovu)."""
+        if self._rows is None:
+            arrays = self.arrays
+            lists = [arrays.bucket(type_code, category_id, self.ordering) for type_code, category_id in self.buckets]
+            lists = [rows for rows in lists if len(rows)]
+            rows = lists[0] if len(lists) == 1 else heapq.merge(*lists, key=arrays.order_key(self.ordering))
+            for column, compare, value in self.conditions:
+                rows = [row for row in rows if compare(column[row], value)]
+            self._rows = list(rows)
+        return self._rows
+
+    def count(self):
+        return len(self.rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, index):
+        # Z databáze se načtou jen produkty zobrazené stránky, v pořadí indexu.
+        rows = self.rows[index] if isinstance(index, slice) else [self.rows[index]]
+        ids = [self.arrays.ids[row] for row in rows]
+        products = listing_queryset(Product.objects).in_bulk(ids)
+        page = [products[product_id] for product_id in ids if product_id in products]
+        return page if isinstance(index, slice) else page[0]
+
+    def attribute_counts(self, field):
+        """Jako products.attributes.attribute_counts (zatím jen gender)."""
+        genders = self.arrays.genders
+        return {GENDER_NAMES[code]: count for code, count in Counter(genders[row] for row in self.rows).items()}
+
+    def facet_rows(self):
+        """Řádky ve tvaru seskupeného dotazu z products.facets."""
+        arrays = self.arrays
+        groups = Counter(
+            (
+                arrays.producers[row], price_bucket(arrays.prices[row] / 100),
+                int(arrays.stock[row] > 0), int(arrays.ratings[row]),
+            )
+            for row in self.rows
+        )
+        return [
+            {'producer_id': None if producer < 0 else producer, 'price_bucket': bucket, 'in_stock': in_stock,
+             'stars': stars, 'count': count}
+            for (producer, bucket, in_stock, stars), count in groups.items()
+        ]
+
+
+def load_arrays():
+    """Sloupce všech produktů z databáze (jeden dotaz, řádky v pořadí českého řazení názvů)."""
+    rows = Product.objects.order_by('product_sort_key', 'pk').values_list(*COLUMNS)
+    return CatalogArrays(rows.iterator(chunk_size=2000))
+
+
+class CatalogIndex:
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.arrays = None
+        self.version = None
+        self.changes = None     # pořadové číslo poslední promítnuté změny z deníku
+
+    def build(self, version=None):
+        if version is None:
+            version = get_index_version()
+        # Změny zapsané během načítání se později promítnou znovu, žádná se neztratí.
+        changes = get_change_count()
+        arrays = load_arrays()
+        with self.lock:
+            self.arrays = arrays
+            self.version = version
+            self.changes = changes
+        logger.info(f"Index katalogu sestaven: {len(arrays)} produktů, {arrays.memory_usage()} B.")
+
+    def ensure_built(self):
+        # Zveřejněný snímek sdílený workery (products/snapshot.py) má přednost před vlastním indexem.
+        snapshot = current_snapshot()
+        if snapshot is not None:
+            return snapshot.catalog
+        version = get_index_version()
+        with self.lock:
+            if self.arrays is None or self.version != version or not self._catch_up():
+                self.build(version)
+            return self.arrays
+
+    def warm_up(self):
+        if not getattr(settings, 'CATALOG_INDEX', False):
+            return
+        try:
+            self.ensure_built()
+        except DatabaseError as e:
+            logger.warning(f"Index katalogu nelze sestavit: {e}")
+
+    def reset(self):
+        with self.lock:
+            self.arrays = None
+            self.version = None
+            self.changes = None
+
+    def _catch_up(self):
+        """Promítne změny z deníku zapsané jinými procesy. False = index je nutné přestavět."""
+        current = get_change_count()
+        pending = current - self.changes
+        if pending == 0:
+            return True
+        if not 0 < pending <= MAX_PENDING_CHANGES:
+            return False
+        keys = [CATALOG_INDEX_CHANGE_KEY.format(number) for number in range(self.changes + 1, current + 1)]
+        product_ids = cache.get_many(keys)
+        if len(product_ids) != len(keys) or not self._apply(set(product_ids.values())):
+            return False
+        self.changes = current
+        return True
+
+    def _apply(self, product_ids):
+        rows = {row[0]: row for row in Product.objects.filter(pk__in=product_ids).values_list(*COLUMNS)}
+        for product_id in product_ids:
+            row = rows.get(product_id)
+            if row is None:
+                self.arrays.remove(product_id)
+            elif not self.arrays.update(row):
+                return False
+        return True
+
+    def refresh_product(self, product_id):
+        """Promítne uložený nebo smazaný produkt (i změnu hodnocení provedenou UPDATE dotazem)."""
+        if not index_enabled():
+            return
+        with self.lock:
+            number = record_change(product_id)
+            # Změny jiných procesů ještě nejsou promítnuté: tato se dočte s nimi při dalším použití.
+            if self.arrays is None or number is None or number != self.changes + 1:
+                return
+            if self._apply([product_id]):
+                self.changes = number
+            else:
+                self.reset()
+
+    def remove_product(self, product_id):
+        self.refresh_product(product_id)
+
+    def invalidate(self):
+        """Změna, kterou nejde promítnout po řádcích (hromadné úpravy): přestavění při dalším použití."""
+        bump_index_version()
+        self.reset()
+
+    def select(self, product_type, category_ids):
+        """Produkty daného typu v kategoriích `category_ids` (seřazené podle názvu)."""
+        arrays = self.ensure_built()
+        type_code = PRODUCT_TYPES[product_type]
+        return CatalogSelection(arrays, [(type_code, category_id) for category_id in category_ids])
+
+    def memory_usage(self):
+        """Paměť indexu v procesu (bajty); snímek sdílený přes mmap se nepočítá."""
+        with self.lock:
+            return 0 if self.arrays is None else self.arrays.memory_usage()
+
+
+catalog_index = CatalogIndex()
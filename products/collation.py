@@ -0,0 +1,11 @@
+import czech_sort
+
+
+def czech_sort_key(value):
+    """
+    Binary Czech collation key for `value`.
+
+    Keys compare byte by byte in the same order as `czech_sort.key()`, so they can be
+    stored in the database and used in ORDER BY instead of sorting rows in Python.
+    """
+    return czech_sort.bytes_key(value or '')
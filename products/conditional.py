@@ -0,0 +1,129 @@
+"""
+Podmíněné GET (ETag / Last-Modified) pro stránky katalogu.
+
+Každá stránka má funkci stavu, která levně (agregací `updated_at` nebo verzemi a časy změn
+z cache, viz products/page_cache.py) vrátí data, na kterých obsah závisí, a čas poslední změny.
+Shoduje-li se ETag nebo Last-Modified s požadavkem, vrátí se `304 Not Modified`
+a šablona se vůbec nevykreslí.
+
+Výpisy kategorií berou validátory z časů změn v cache (products/page_cache.listing_modified),
+ne z databáze. Každý zápis produktů musí proto čas změny posunout: signály (products/signals.py)
+při uložení a smazání, UPDATE dotazy přes touch_product(), hromadné zápisy v příkazech přes
+catalog_bulk_changed() a zveřejnění snímku katalogu přes touch_all_listings().
+
+Stránky obsahují menu, stav přihlášení a CSRF token, proto ETag zahrnuje i verzi webu,
+přihlášeného uživatele a CSRF cookie a odpovědi jsou `private, no-cache`
+(prohlížeč se vždy zeptá, ale stránku nestahuje znovu).
+"""
+import hashlib
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.db.models import Count, FilteredRelation, Max, Q
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from products.models import Producer, Product
+from products.page_cache import listing_modified, page_versions, site_version
+
+
+def page_etag(request, parts):
+    csrf_cookie = request.COOKIES.get(settings.CSRF_COOKIE_NAME, '')
+    raw = repr((parts, site_version(), request.user.pk, csrf_cookie, request.get_full_path()))
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def conditional_page(state_func):
+    """
+    Dekorátor view: z `state_func(request, *args, **kwargs)` odvodí ETag a Last-Modified.
+
+    `state_func` vrací dvojici (data pro ETag, datetime poslední změny nebo None),
+    případně None, pokud stránka validátory mít nemá (např. neexistující objekt).
+    """
+    def state(request, *args, **kwargs):
+        # Funkce ETag a Last-Modified se volají zvlášť, stav se počítá jednou.
+        if not hasattr(request, '_page_state'):
+            request._page_state = None
+            # Zprávy (messages) patří jednomu zobrazení, taková stránka se neověřuje.
+            if request.method in ('GET', 'HEAD') and not len(get_messages(request)):
+                request._page_state = state_func(request, *args, **kwargs)
+        return request._page_state
+
+    def etag(request, *args, **kwargs):
+        current = state(request, *args, **kwargs)
+        return None if current is None else page_etag(request, current[0])
+
+    def last_modified(request, *args, **kwargs):
+        current = state(request, *args, **kwargs)
+        return None if current is None else current[1]
+
+    def decorator(view):
+        conditional_view = condition(etag_func=etag, last_modified_func=last_modified)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            if getattr(request, '_page_state', None) is not None:
+                patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapper
+    return decorator
+
+
+def _latest(*values):
+    values = [value for value in values if value is not None]
+    return max(values) if values else None
+
+
+def product_detail_state(kind):
+    def state(request, pk):
+        if not str(pk).isdigit():
+            return None
+        versions = page_versions(kind, pk)
+
+        # Čas změny se mění jen spolu s verzemi, stačí ho spočítat jednou pro každou verzi
+        # (klíč obsahuje verze, proto nemusí expirovat).
+        def modified():
+            row = Product.objects.filter(pk=pk).values_list(
+                'updated_at', 'category__updated_at', 'category__category_parent__updated_at', 'producer__updated_at'
+            ).first()
+            return _latest(*row) if row else None
+
+        key = f'page:modified:{kind}:{pk}:{versions[0]}:{versions[1]}'
+        return versions, cache.get_or_set(key, modified, None)
+    return state
+
+
+def trainer_detail_state(request, pk):
+    # Profil trenéra nemá updated_at, stačí ETag z verzí.
+    if not str(pk).isdigit():
+        return None
+    return page_versions('trainer', pk), None
+
+
+def listing_state(product_type):
+    # Bez dotazu do databáze: časy změn udržují signály (products/signals.py), verzi webu ETag obsahuje vždy.
+    def state(request, pk=None):
+        if pk is not None and not str(pk).isdigit():
+            return None
+        modified = listing_modified(pk)
+        return modified, datetime.fromtimestamp(max(modified) / 1e9, tz=timezone.utc)
+    return state
+
+
+def producer_state(request, pk):
+    if not str(pk).isdigit():
+        return None
+    # Jeden dotaz: všichni výrobci (seznam na stránce) a k nim připojené jen produkty tohoto výrobce.
+    result = Producer.objects.annotate(
+        own_products=FilteredRelation('producers', condition=Q(producers__producer_id=pk)),
+    ).aggregate(
+        producer_count=Count('pk', distinct=True), producers_modified=Max('updated_at'),
+        product_count=Count('own_products'), products_modified=Max('own_products__updated_at'),
+    )
+    modified = _latest(result['products_modified'], result['producers_modified'])
+    # Čas změny patří i do ETagu, úprava produktu počty nezmění.
+    return (result['product_count'], result['producer_count'], modified), modified
@@ -0,0 +1,60 @@
+"""
+Načítání detailu produktu, služby a trenéra s pevným počtem dotazů.
+
+Produkt (služba) se načte jedním dotazem i s kategorií, nadřazenou kategorií a výrobcem,
+stránka recenzí dalším dotazem i s autory recenzí. Počet recenzí pro stránkování je v cache,
+při přidání nebo smazání recenze ho zneplatní signály (products/signals.py).
+"""
+from django.core.cache import cache
+from django.shortcuts import get_object_or_404
+
+from accounts.models import UserProfile
+from products.models import Product, ProductReview, TrainerReview
+from products.pagination import paginate
+from products.ratings import star_states
+
+REVIEWS_PER_PAGE = 5
+DETAIL_KINDS = ('product', 'service', 'trainer')
+
+
+def review_count_key(kind, pk):
+    return f'reviews:count:{kind}:{pk}'
+
+
+def invalidate_review_count(kinds, pk):
+    cache.delete_many([review_count_key(kind, pk) for kind in kinds])
+
+
+def load_object(kind, pk):
+    if kind == 'trainer':
+        return get_object_or_404(UserProfile, pk=pk)
+    products = Product.objects.select_related('category__category_parent', 'producer')
+    if kind == 'service':
+        products = products.filter(product_type='service')
+    return get_object_or_404(products, pk=pk)
+
+
+def load_detail(request, kind, pk):
+    """
+    Objekt detailu ('product', 'service' nebo 'trainer'), stránka jeho recenzí a hvězdičky průměru.
+
+    Vrací slovník {'object', 'page_reviews', 'average_rating', 'star_states'}.
+    """
+    obj = load_object(kind, pk)
+    if kind == 'trainer':
+        reviews = TrainerReview.objects.filter(trainer=obj)
+    else:
+        reviews = ProductReview.objects.filter(product=obj)
+
+    page_reviews = paginate(
+        request, reviews.select_related('reviewer'), REVIEWS_PER_PAGE, ['-review_updated_datetime', '-pk'],
+        count_cache_key=review_count_key(kind, obj.pk), cache_count=True
+    )
+    # Průměr hodnocení je uložený u objektu (RatingSummary), recenze se kvůli němu nenačítají.
+    average_rating, stars = star_states(obj.rating_average)
+    return {
+        'object': obj,
+        'page_reviews': page_reviews,
+        'average_rating': average_rating,
+        'star_states': stars,
+    }
@@ -0,0 +1,201 @@
+"""
+Fasetové filtrování výpisu produktů a služeb: cena, výrobce, skladem, minimální hodnocení.
+
+Počty pro všechny fasety dává jeden seskupený dotaz nad produkty kategorie (podle výrobce,
+cenového pásma, skladu a hvězdiček), výsledek se ukládá do cache pro kategorii. Klíč obsahuje
+verzi webu (přidání, smazání a přesun produktu), změny skladu, ceny a hodnocení se do počtů
+promítnou nejpozději po FACET_CACHE_TIMEOUT. Stránka s fasetami má tak pevný počet dotazů
+bez ohledu na velikost katalogu.
+"""
+from decimal import Decimal, InvalidOperation
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+from django.db.models import Case, Count, IntegerField, Q, Value, When
+from django.db.models.functions import Floor
+
+from products.models import Producer
+from products.page_cache import site_version
+
+# How long cached facet counts of a category stay valid (seconds).
+FACET_CACHE_TIMEOUT = 300
+# Cenová pásma (od, do) v Kč, horní mez se do pásma nepočítá.
+PRICE_RANGES = [(None, 500), (500, 1000), (1000, 2000), (2000, None)]
+# Nabízené minimální hodnocení (hvězdičky).
+MIN_RATINGS = (4, 3, 2, 1)
+# Největší hodnota 64bitového primárního klíče.
+MAX_ID = 2 ** 63 - 1
+FILTER_PARAMS = ('price_min', 'price_max', 'producer', 'in_stock', 'min_rating')
+
+
+def _price(value):
+    try:
+        price = Decimal(value)
+    except (InvalidOperation, TypeError, ValueError):
+        return None
+    return price if price.is_finite() and price >= 0 else None
+
+
+def _producer(value):
+    # Mimo rozsah 64bitového sloupce (a indexu katalogu) by dotaz selhal přetečením.
+    try:
+        producer = int(value)
+    except (TypeError, ValueError):
+        return None
+    return producer if 0 < producer <= MAX_ID else None
+
+
+def parse_filters(request):
+    """Zvolené filtry z URL, neplatné hodnoty se ignorují (None)."""
+    params = request.GET
+    min_rating = params.get('min_rating', '')
+    return {
+        'price_min': _price(params.get('price_min')),
+        'price_max': _price(params.get('price_max')),
+        'producer': _producer(params.get('producer')),
+        'in_stock': params.get('in_stock') == '1' or None,
+        'min_rating': int(min_rating) if min_rating.isdigit() and int(min_rating) in MIN_RATINGS else None,
+    }
+
+
+def filter_query(filters):
+    """Zvolené filtry jako query string pro odkazy (řazení, stránkování)."""
+    return urlencode([
+        (name, '1' if value is True else value) for name, value in filters.items() if value is not None
+    ])
+
+
+def apply_filters(queryset, filters):
+    if filters['price_min'] is not None:
+        queryset = queryset.filter(price__gte=filters['price_min'])
+    if filters['price_max'] is not None:
+        queryset = queryset.filter(price__lt=filters['price_max'])
+    if filters['producer'] is not None:
+        queryset = queryset.filter(producer_id=filters['producer'])
+    if filters['in_stock']:
+        queryset = queryset.filter(stock_availability__gt=0)
+    if filters['min_rating'] is not None:
+        queryset = queryset.filter(rating_average__gte=filters['min_rating'])
+    return queryset
+
+
+def _price_bucket():
+    whens = []
+    for index, (low, high) in enumerate(PRICE_RANGES):
+        condition = Q()
+        if low is not None:
+            condition &= Q(price__gte=low)
+        if high is not None:
+            condition &= Q(price__lt=high)
+        whens.append(When(condition, then=Value(index)))
+    return Case(*whens, output_field=IntegerField())
+
+
+def price_bucket(price):
+    """Index cenového pásma pro cenu (jako `_price_bucket` v dotazu)."""
+    for index, (low, high) in enumerate(PRICE_RANGES):
+        if (low is None or price >= low) and (high is None or price < high):
+            return index
+    return None
+
+
+def facet_rows(products):
+    """Seskupené řádky (výrobce, cenové pásmo, skladem, hvězdičky, počet) jedním GROUP BY dotazem."""
+    return products.order_by().annotate(
+        price_bucket=_price_bucket(),
+        in_stock=Case(When(stock_availability__gt=0, then=Value(1)), default=Value(0), output_field=IntegerField()),
+        stars=Floor('rating_average'),
+    ).values('producer_id', 'price_bucket', 'in_stock', 'stars').annotate(count=Count('pk'))
+
+
+def compute_facets(products):
+    """
+    Počty pro fasety z jednoho GROUP BY dotazu (a názvy výrobců jedním dalším dotazem).
+
+    Výběr z indexu katalogu (products.catalog_index) dává stejné řádky z polí v paměti.
+    """
+    rows = products.facet_rows() if hasattr(products, 'facet_rows') else facet_rows(products)
+
+    prices = [0] * len(PRICE_RANGES)
+    producers = {}
+    ratings = {stars: 0 for stars in MIN_RATINGS}
+    in_stock = 0
+    for row in rows:
+        count = row['count']
+        prices[row['price_bucket']] += count
+        if row['producer_id'] is not None:
+            producers[row['producer_id']] = producers.get(row['producer_id'], 0) + count
+        in_stock += count if row['in_stock'] else 0
+        for stars in MIN_RATINGS:
+            if (row['stars'] or 0) >= stars:
+                ratings[stars] += count
+
+    names = Producer.objects.filter(pk__in=producers).order_by('producer_sort_key').values_list('pk', 'producer_name')
+    return {
+        'prices': prices,
+        'producers': [(pk, name, producers[pk]) for pk, name in names],
+        'in_stock': in_stock,
+        'ratings': ratings,
+    }
+
+
+def get_facets(products, cache_key):
+    """Počty pro fasety produktů kategorie (bez zvolených filtrů), z cache."""
+    return cache.get_or_set(
+        f'facets:{cache_key}:{site_version()}', lambda: compute_facets(products), FACET_CACHE_TIMEOUT
+    )
+
+
+def _price_label(low, high):
+    if low is None:
+        return f"do {high} Kč"
+    if high is None:
+        return f"od {low} Kč"
+    return f"{low}–{high} Kč"
+
+
+def facet_options(facets, filters, params, physical=True):
+    """
+    Fasety pro šablonu: [{'title', 'options': [{'label', 'count', 'query', 'active'}]}].
+
+    `params` jsou další parametry výpisu (řazení, gender, podstrom), které odkazy zachovají.
+    Zvolená hodnota odkaz vypíná. Služby nemají výrobce ani sklad (`physical=False`).
+    """
+    def option(label, count, values):
+        active = all(filters[name] == value for name, value in values.items())
+        selected = {**filters, **{name: None if active else value for name, value in values.items()}}
+        query = urlencode([(name, value) for name, value in params.items() if value])
+        return {
+            'label': label,
+            'count': count,
+            'active': active,
+            'query': '&'.join(part for part in (query, filter_query(selected)) if part),
+        }
+
+    groups = [{
+        'title': "Cena",
+        'options': [
+            option(_price_label(low, high), count, {
+                'price_min': None if low is None else Decimal(low),
+                'price_max': None if high is None else Decimal(high),
+            })
+            for (low, high), count in zip(PRICE_RANGES, facets['prices']) if count
+        ],
+    }]
+    if physical:
+        groups.append({
+            'title': "Výrobce",
+            'options': [option(name, count, {'producer': pk}) for pk, name, count in facets['producers']],
+        })
+        groups.append({
+            'title': "Dostupnost",
+            'options': [option("Skladem", facets['in_stock'], {'in_stock': True})] if facets['in_stock'] else [],
+        })
+    groups.append({
+        'title': "Hodnocení",
+        'options': [
+            option(f"{stars}★ a více", count, {'min_rating': stars})
+            for stars, count in facets['ratings'].items() if count
+        ],
+    })
+    return [group for group in groups if group['options']]
@@ -0,0 +1,121 @@
+"""
+Strom kategorií v tabulce uzávěru (CategoryClosure).
+
+Pro každou kategorii je v tabulce řádek s každým jejím předkem (a s ní samotnou, hloubka 0).
+Potomci, předci i otázka, zda podstrom obsahuje produkty daného typu, jsou tak jeden
+indexovaný dotaz v libovolné hloubce, bez DISTINCT.
+
+Tabulku udržují signály při uložení a smazání kategorie (products/signals.py),
+po nahrání fixtur ji celou přestaví příkaz rebuild_category_tree.
+"""
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from products.models import Category, CategoryClosure
+
+
+def subtree_ids(category_id):
+    """Poddotaz s id kategorie a všech jejích potomků (pro `__in`)."""
+    return CategoryClosure.objects.filter(ancestor_id=category_id).values('descendant_id')
+
+
+def ancestor_ids(category_id):
+    """Id kategorie a všech jejích předků."""
+    return list(CategoryClosure.objects.filter(descendant_id=category_id).values_list('ancestor_id', flat=True))
+
+
+def descendants(category):
+    """Kategorie a všichni její potomci."""
+    return Category.objects.filter(path_links__ancestor=category)
+
+
+def ancestors(category):
+    """Předci kategorie od kořene po přímého rodiče (např. pro drobečkovou navigaci)."""
+    return Category.objects.filter(
+        subtree_links__descendant=category, subtree_links__depth__gt=0
+    ).order_by('-subtree_links__depth')
+
+
+def with_products(categories, product_type):
+    """Jen kategorie, jejichž podstrom (v libovolné hloubce) obsahuje produkty daného typu."""
+    return categories.filter(Exists(CategoryClosure.objects.filter(
+        ancestor=OuterRef('pk'), descendant__categories__product_type=product_type
+    )))
+
+
+def subtree_product_types():
+    """{id kategorie: typy produktů v jejím podstromu} pro všechny kategorie s produkty, jeden dotaz."""
+    types = {}
+    rows = CategoryClosure.objects.filter(descendant__categories__isnull=False).order_by().values_list(
+        'ancestor_id', 'descendant__categories__product_type'
+    ).distinct()
+    for category_id, product_type in rows:
+        types.setdefault(category_id, set()).add(product_type)
+    return types
+
+
+def _path(category_id):
+    """[(předek, hloubka)] kategorie včetně jí samotné."""
+    return list(CategoryClosure.objects.filter(descendant_id=category_id).values_list('ancestor_id', 'depth'))
+
+
+def _subtree(category_id):
+    """[(potomek, hloubka)] kategorie včetně jí samotné."""
+    return list(CategoryClosure.objects.filter(ancestor_id=category_id).values_list('descendant_id', 'depth'))
+
+
+def _detach(subtree):
+    # Odpojí podstrom od předků jeho kořene, vnitřní vazby podstromu zůstanou.
+    ids = [descendant_id for descendant_id, _ in subtree]
+    CategoryClosure.objects.filter(descendant_id__in=ids).exclude(ancestor_id__in=ids).delete()
+
+
+def insert_category(category):
+    """Vazby nové kategorie: na sebe a na všechny předky rodiče."""
+    path = _path(category.category_parent_id) if category.category_parent_id is not None else []
+    CategoryClosure.objects.bulk_create(
+        [CategoryClosure(ancestor_id=category.pk, descendant_id=category.pk, depth=0)] + [
+            CategoryClosure(ancestor_id=ancestor_id, descendant_id=category.pk, depth=depth + 1)
+            for ancestor_id, depth in path
+        ]
+    )
+
+
+@transaction.atomic
+def move_category(category):
+    """Přepojí kategorii i s celým podstromem pod nového rodiče (nebo mezi hlavní kategorie)."""
+    subtree = _subtree(category.pk)
+    _detach(subtree)
+    if category.category_parent_id is None:
+        return
+    CategoryClosure.objects.bulk_create([
+        CategoryClosure(ancestor_id=ancestor_id, descendant_id=descendant_id, depth=ancestor_depth + depth + 1)
+        for ancestor_id, ancestor_depth in _path(category.category_parent_id)
+        for descendant_id, depth in subtree
+    ])
+
+
+def remove_category(category):
+    """
+    Před smazáním kategorie: její podkategorie se stanou hlavními kategoriemi (SET_NULL),
+    jejich podstromy se proto odpojí od předků mazané kategorie. Vazby na ni samotnou smaže CASCADE.
+    """
+    _detach(_subtree(category.pk))
+
+
+@transaction.atomic
+def rebuild_tree():
+    """Přestaví celou tabulku z `category_parent`. Vrací počet vazeb."""
+    parents = dict(Category.objects.values_list('pk', 'category_parent_id'))
+    links = []
+    for category_id in parents:
+        ancestor_id, depth, seen = category_id, 0, set()
+        # `seen` chrání před cyklem v datech uložených mimo Category.clean().
+        while ancestor_id is not None and ancestor_id not in seen:
+            seen.add(ancestor_id)
+            links.append(CategoryClosure(ancestor_id=ancestor_id, descendant_id=category_id, depth=depth))
+            ancestor_id, depth = parents.get(ancestor_id), depth + 1
+
+    CategoryClosure.objects.all().delete()
+    CategoryClosure.objects.bulk_create(links, batch_size=500)
+    return len(links)
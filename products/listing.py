@@ -0,0 +1,26 @@
+"""
+Úsporná projekce produktů pro výpisy.
+
+Výpisy (kategorie produktů a služeb, stránka výrobce, správa produktů a služeb, hledání
+průchodem tabulek) zobrazují jen název, cenu, obrázek, krátký popis a sklad. Dlouhý popis
+je nejobjemnější sloupec tabulky a čte se jen na stránce detailu.
+
+Seznam sloupců obsahuje i klíče řazení výpisů, aby stránkování kurzorem (products/pagination.py)
+nemuselo odložené sloupce dočítat. Porovnání s načtením celých řádků ukazuje příkaz
+benchmark_listings.
+"""
+
+# Sloupce Product, které výpisy zobrazují nebo podle nich řadí.
+LISTING_FIELDS = (
+    'id', 'product_type', 'product_name', 'product_short_description', 'product_view',
+    'price', 'stock_availability', 'rating_average', 'product_sort_key', 'category_id', 'producer_id',
+)
+# Sloupce kategorie pro výpisy, které produkty seskupují nebo kategorii vypisují.
+LISTING_CATEGORY_FIELDS = ('category__id', 'category__category_name', 'category__category_sort_key')
+
+
+def listing_queryset(queryset, with_category=False):
+    """Produkty z `queryset` jen se sloupci pro výpis (s kategorií jedním JOINem, je-li potřeba)."""
+    if with_category:
+        return queryset.select_related('category').only(*LISTING_FIELDS, *LISTING_CATEGORY_FIELDS)
+    return queryset.only(*LISTING_FIELDS)
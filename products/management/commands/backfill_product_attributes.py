@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from products.attributes import product_gender
+from products.models import Product
+from products.signals import catalog_bulk_changed
+
+
+class Command(BaseCommand):
+    help = "Dopočítá odvozené atributy produktů pro filtrování (např. gender z názvu)."
+
+    # (pole atributu, funkce vracející hodnotu pro produkt)
+    ATTRIBUTES = [
+        ('gender', lambda product: product_gender(product.product_name)),
+    ]
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        fields = [field for field, _ in self.ATTRIBUTES]
+        # bulk_update nenastaví auto_now, změnu stránky (Last-Modified) je nutné zapsat.
+        written = fields + ['updated_at']
+
+        changed = []
+        updated = 0
+        for product in Product.objects.only('product_name', *fields).order_by('pk').iterator(chunk_size=batch_size):
+            values = {field: value(product) for field, value in self.ATTRIBUTES}
+            if any(getattr(product, field) != value for field, value in values.items()):
+                for field, value in values.items():
+                    setattr(product, field, value)
+                product.updated_at = timezone.now()
+                changed.append(product)
+            if len(changed) >= batch_size:
+                Product.objects.bulk_update(changed, written)
+                updated += len(changed)
+                changed = []
+        if changed:
+            Product.objects.bulk_update(changed, written)
+            updated += len(changed)
+        if updated:
+            # bulk_update neposílá signály: stránky, výpisy a index katalogu se zneplatní najednou.
+            catalog_bulk_changed()
+
+        self.stdout.write(self.style.SUCCESS(f"Atributy produktů jsou aktuální (opraveno {updated} záznamů)."))
@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from accounts.models import UserProfile
+from products.collation import czech_sort_key
+from products.models import Category, Producer, Product
+from products.signals import catalog_bulk_changed
+from viewer.navbar import invalidate_navbar
+
+
+class Command(BaseCommand):
+    help = "Přepočítá uložené české řadicí klíče (kategorie, výrobci, produkty, uživatelé)."
+
+    # (model, pole s klíčem, funkce vracející řazený text)
+    TARGETS = [
+        (Category, 'category_sort_key', lambda obj: obj.category_name),
+        (Producer, 'producer_sort_key', lambda obj: obj.producer_name.strip()),
+        (Product, 'product_sort_key', lambda obj: obj.product_name),
+        (UserProfile, 'full_name_sort_key', lambda obj: obj.full_name()),
+    ]
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        repaired = False
+        for model, field, text in self.TARGETS:
+            # bulk_update nenastaví auto_now, změnu (Last-Modified) je nutné zapsat.
+            touch = any(model_field.name == 'updated_at' for model_field in model._meta.concrete_fields)
+            fields = [field, 'updated_at'] if touch else [field]
+            changed = []
+            updated = 0
+            for obj in model.objects.order_by('pk').iterator(chunk_size=batch_size):
+                key = czech_sort_key(text(obj))
+                if bytes(getattr(obj, field)) != key:
+                    setattr(obj, field, key)
+                    if touch:
+                        obj.updated_at = timezone.now()
+                    changed.append(obj)
+                if len(changed) >= batch_size:
+                    model.objects.bulk_update(changed, fields)
+                    updated += len(changed)
+                    changed = []
+            if changed:
+                model.objects.bulk_update(changed, fields)
+                updated += len(changed)
+            repaired = repaired or bool(updated)
+
+            self.stdout.write(f"{model.__name__}: aktualizováno {updated} záznamů.")
+
+        if repaired:
+            # bulk_update neposílá signály: pořadí v menu, výpisech, stránkách a indexu katalogu se obnoví.
+            invalidate_navbar()
+            catalog_bulk_changed()
+
+        self.stdout.write(self.style.SUCCESS("Řadicí klíče jsou aktuální."))
@@ -0,0 +1,76 @@
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from products.listing import LISTING_CATEGORY_FIELDS, LISTING_FIELDS, listing_queryset
+from products.models import Product
+
+
+def _size(value):
+    if value is None:
+        return 0
+    if isinstance(value, (bytes, memoryview)):
+        return len(value)
+    return len(str(value).encode())
+
+
+class Command(BaseCommand):
+    help = (
+        "Porovná načtení stránek výpisu celými řádky Product a úspornou projekcí (products/listing.py): "
+        "řádky, přenesené bajty a alokované objekty Pythonu na stránku."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', type=int, default=5, help="Počet stránek každého výpisu.")
+        parser.add_argument('--per-page', type=int, default=10)
+
+    def listings(self):
+        """(název, QuerySet a sloupce celých řádků, QuerySet a sloupce projekce)"""
+        full_columns = [field.attname for field in Product._meta.concrete_fields]
+        category_columns = ['category__id', 'category__category_name', 'category__category_sort_key']
+        for product_type in ('merchantdise', 'service'):
+            full = Product.objects.filter(product_type=product_type).order_by('product_sort_key', 'pk')
+            yield f"výpis {product_type}", full, full_columns, listing_queryset(full), LISTING_FIELDS
+            yield (
+                f"správa {product_type}",
+                full.select_related('category'), full_columns + category_columns,
+                listing_queryset(full, with_category=True), LISTING_FIELDS + LISTING_CATEGORY_FIELDS,
+            )
+
+    def measure(self, queryset, columns, per_page, pages):
+        """(řádky, bajty hodnot, bloky paměti, bajty paměti) za `pages` stránek."""
+        rows = transferred = blocks = allocated = 0
+        for page in range(pages):
+            window = slice(page * per_page, (page + 1) * per_page)
+            values = list(queryset.values_list(*columns)[window])
+            rows += len(values)
+            transferred += sum(_size(value) for row in values for value in row)
+
+            tracemalloc.start()
+            before = tracemalloc.take_snapshot()
+            objects = list(queryset[window])
+            after = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            for stat in after.compare_to(before, 'filename'):
+                blocks += max(stat.count_diff, 0)
+                allocated += max(stat.size_diff, 0)
+            del objects
+        return rows, transferred, blocks, allocated
+
+    def handle(self, *args, **options):
+        pages, per_page = options['pages'], options['per_page']
+        for name, full, full_columns, lean, lean_columns in self.listings():
+            results = {
+                "celé řádky": self.measure(full, full_columns, per_page, pages),
+                "projekce": self.measure(lean, lean_columns, per_page, pages),
+            }
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            for variant, (rows, transferred, blocks, allocated) in results.items():
+                per_row = transferred // rows if rows else 0
+                self.stdout.write(
+                    f"  {variant:<11} {rows:>6} řádků × {per_row:>6} B = {transferred:>9} B, "
+                    f"{blocks // max(pages, 1):>7} bloků / {allocated // max(pages, 1):>9} B paměti na stránku"
+                )
+            full_bytes, lean_bytes = results["celé řádky"][1], results["projekce"][1]
+            if full_bytes:
+                self.stdout.write(f"  úspora přenosu: {100 - lean_bytes * 100 // full_bytes} %")
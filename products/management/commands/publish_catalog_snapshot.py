@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from products.snapshot import CatalogSnapshot, publish_snapshot
+
+
+class Command(BaseCommand):
+    help = "Zapíše a zveřejní sdílený snímek katalogu pro workery (settings.CATALOG_SNAPSHOT_DIR)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--directory', default=None, help="Adresář snímků (výchozí CATALOG_SNAPSHOT_DIR).")
+        parser.add_argument('--keep', type=int, default=2, help="Kolik posledních verzí ponechat.")
+
+    def handle(self, *args, **options):
+        directory = options['directory'] or getattr(settings, 'CATALOG_SNAPSHOT_DIR', None)
+        if not directory:
+            raise CommandError("Adresář snímků není nastavený (CATALOG_SNAPSHOT_DIR nebo --directory).")
+
+        path, version = publish_snapshot(directory, keep=options['keep'])
+        snapshot = CatalogSnapshot(path)
+        self.stdout.write(self.style.SUCCESS(
+            f"Snímek katalogu {version} je zveřejněný: {len(snapshot.catalog)} produktů, "
+            f"{len(snapshot.tokens)} slov, {snapshot.size} B ({path})."
+        ))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from products.hierarchy import rebuild_tree
+
+
+class Command(BaseCommand):
+    help = "Přestaví tabulku uzávěru stromu kategorií (CategoryClosure) z nadřazených kategorií."
+
+    def handle(self, *args, **options):
+        links = rebuild_tree()
+        self.stdout.write(self.style.SUCCESS(f"Strom kategorií je přestavěn ({links} vazeb)."))
@@ -0,0 +1,84 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from accounts.models import UserProfile
+from products.models import Product, ProductReview, TrainerReview
+from products.ratings import RATING_VALUES
+from products.signals import catalog_bulk_changed
+
+SUMMARY_FIELDS = ['rating_count', 'rating_sum', 'rating_average'] + [
+    f'rating_{stars}_count' for stars in RATING_VALUES
+]
+
+
+class Command(BaseCommand):
+    help = "Přepočítá uložené souhrny hodnocení produktů, služeb a trenérů z recenzí."
+
+    # (model se souhrnem, model recenzí, pole recenze s hodnoceným objektem)
+    TARGETS = [
+        (Product, ProductReview, 'product_id'),
+        (UserProfile, TrainerReview, 'trainer_id'),
+    ]
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        repaired = False
+        for model, review_model, target_field in self.TARGETS:
+            expected = self.summaries(review_model, target_field)
+            empty = self.summary(0, 0, {stars: 0 for stars in RATING_VALUES})
+            # bulk_update nenastaví auto_now, změnu stránky (Last-Modified) je nutné zapsat.
+            fields = SUMMARY_FIELDS + (['updated_at'] if model is Product else [])
+
+            changed = []
+            updated = 0
+            for obj in model.objects.only(*SUMMARY_FIELDS).order_by('pk').iterator(chunk_size=batch_size):
+                summary = expected.get(obj.pk, empty)
+                if any(getattr(obj, field) != value for field, value in summary.items()):
+                    for field, value in summary.items():
+                        setattr(obj, field, value)
+                    if model is Product:
+                        obj.updated_at = timezone.now()
+                    changed.append(obj)
+                if len(changed) >= batch_size:
+                    model.objects.bulk_update(changed, fields)
+                    updated += len(changed)
+                    changed = []
+            if changed:
+                model.objects.bulk_update(changed, fields)
+                updated += len(changed)
+            repaired = repaired or bool(updated)
+
+            self.stdout.write(f"{model.__name__}: opraveno {updated} záznamů.")
+
+        if repaired:
+            # bulk_update neposílá signály: stránky, výpisy a index katalogu se zneplatní najednou.
+            catalog_bulk_changed()
+
+        self.stdout.write(self.style.SUCCESS("Souhrny hodnocení jsou aktuální."))
+
+    def summaries(self, review_model, target_field):
+        rows = review_model.objects.filter(rating__in=RATING_VALUES).order_by().values(target_field).annotate(
+            count=Count('pk'),
+            total=Sum('rating'),
+            **{f'stars_{stars}': Count('pk', filter=Q(rating=stars)) for stars in RATING_VALUES},
+        )
+        return {
+            row[target_field]: self.summary(
+                row['count'], row['total'], {stars: row[f'stars_{stars}'] for stars in RATING_VALUES}
+            )
+            for row in rows
+        }
+
+    @staticmethod
+    def summary(count, total, histogram):
+        return {
+            'rating_count': count,
+            'rating_sum': total,
+            'rating_average': total / count if count else 0.0,
+            **{f'rating_{stars}_count': histogram[stars] for stars in RATING_VALUES},
+        }
@@ -1,8 +1,13 @@
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.db.models import Model, CharField, TextField, URLField, ForeignKey, DecimalField, IntegerField, \
-    DateTimeField, PositiveIntegerField, SET_NULL, CASCADE, SET_DEFAULT
+    DateTimeField, PositiveIntegerField, BinaryField, FloatField, Index, UniqueConstraint, SET_NULL, CASCADE, \
+    SET_DEFAULT
 from django.template.defaultfilters import slugify
 
+from products.attributes import product_gender
+from products.collation import czech_sort_key
+
 
 # from accounts.models import UserProfile
 
@@ -14,6 +19,10 @@ class Category(Model):
     category_parent = ForeignKey(
         'self', on_delete=SET_NULL, null=True, blank=True, related_name='subcategories'
     )
+    # Czech collation key of category_name, maintained in save() (see backfill_sort_keys).
+    category_sort_key = BinaryField(default=b'', db_index=True)
+    # Last change, used for Last-Modified / ETag of catalog pages (products/conditional.py).
+    updated_at = DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         ordering = ['category_name']
@@ -25,16 +34,48 @@ class Category(Model):
     def __str__(self):
         return self.category_name
 
+    def clean(self):
+        super().clean()
+        # A category cannot be moved below itself or one of its own subcategories.
+        if self.pk is not None and self.category_parent_id is not None and CategoryClosure.objects.filter(
+            ancestor_id=self.pk, descendant_id=self.category_parent_id
+        ).exists():
+            raise ValidationError({'category_parent': "Kategorii nelze přesunout pod ni samotnou ani pod její podkategorii."})
+
     def save(self, *args, **kwargs):
         if not self.category_view:
             self.category_view = f'/{slugify(self.category_name)}/'
+        self.category_sort_key = czech_sort_key(self.category_name)
         super().save(*args, **kwargs)
 
 
+class CategoryClosure(Model):
+    """
+    Closure table of the category tree: one row per category and each of its ancestors
+    (including itself with depth 0), maintained by signals (see products/hierarchy.py).
+    """
+    ancestor = ForeignKey(Category, on_delete=CASCADE, related_name='subtree_links')
+    descendant = ForeignKey(Category, on_delete=CASCADE, related_name='path_links')
+    depth = PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(fields=['ancestor', 'descendant'], name='category_closure_unique'),
+        ]
+        indexes = [
+            Index(fields=['descendant', 'depth'], name='category_closure_path_idx'),
+        ]
+
+    def __repr__(self):
+        return f"CategoryClosure(ancestor_id={self.ancestor_id}, descendant_id={self.descendant_id}, depth={self.depth})"
+
+
 class Producer(Model):
     producer_name = CharField(max_length=50, null=False, blank=False, unique=True)
     producer_description = TextField(null=True, blank=True)
     producer_view = URLField(null=True, blank=True)
+    producer_sort_key = BinaryField(default=b'', db_index=True)
+    updated_at = DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         ordering = ['producer_name']
@@ -45,12 +86,44 @@ class Producer(Model):
     def __str__(self):
         return self.producer_name
 
+    def save(self, *args, **kwargs):
+        self.producer_sort_key = czech_sort_key(self.producer_name.strip())
+        super().save(*args, **kwargs)
+
 
-class Product(Model):
+class RatingSummary(Model):
+    """
+    Souhrn hodnocení (počet, součet, průměr a počty hvězdiček 1-5) uložený u hodnoceného objektu.
+
+    Aktualizuje se při uložení a smazání recenze (products/signals.py),
+    případnou odchylku opraví příkaz reconcile_ratings.
+    """
+    rating_count = IntegerField(default=0)
+    rating_sum = IntegerField(default=0)
+    rating_average = FloatField(default=0, db_index=True)
+    rating_1_count = IntegerField(default=0)
+    rating_2_count = IntegerField(default=0)
+    rating_3_count = IntegerField(default=0)
+    rating_4_count = IntegerField(default=0)
+    rating_5_count = IntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+    def rating_histogram(self):
+        """Počty hodnocení podle hvězdiček: {1: ..., 5: ...}."""
+        return {stars: getattr(self, f'rating_{stars}_count') for stars in range(1, 6)}
+
+
+class Product(RatingSummary):
     PRODUCT_TYPES = [
         ("merchantdise", "Merchantdise"),
         ("service", "Service"),
     ]
+    GENDERS = [
+        ("ladies", "Dámské"),
+        ("gentlemans", "Pánské"),
+    ]
 
     product_type = CharField(max_length=12, null=False, blank=False, choices=PRODUCT_TYPES) # max_length == Merchantdise
     product_name = CharField(max_length=100, null=False, blank=False)
@@ -63,9 +136,25 @@ class Product(Model):
     producer = ForeignKey(Producer, default=0, on_delete=SET_DEFAULT, null=True, blank=True, related_name='producers')
     # A value will always be a number (never NULL).
     stock_availability = PositiveIntegerField(default=0, null=False, blank=True)
+    product_sort_key = BinaryField(default=b'', db_index=True)
+    # Derived from product_name in save() (see products/attributes.py and backfill_product_attributes).
+    gender = CharField(max_length=10, blank=True, default='', choices=GENDERS)
+    # Also touched when a review or an approved trainer of the product changes (products/signals.py).
+    updated_at = DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         ordering = ['product_name']
+        # Listing pages filter by category and type and order by name or price.
+        indexes = [
+            Index(fields=['category', 'product_type', 'product_sort_key'], name='product_listing_name_idx'),
+            Index(fields=['category', 'product_type', 'price'], name='product_listing_price_idx'),
+            Index(fields=['category', 'product_type', 'rating_average'], name='product_listing_rating_idx'),
+            Index(fields=['category', 'product_type', 'gender'], name='product_listing_gender_idx'),
+            # Subtree listings (category IN descendants) read these in order and stop after one page.
+            Index(fields=['product_type', 'product_sort_key'], name='product_type_name_idx'),
+            Index(fields=['product_type', 'price'], name='product_type_price_idx'),
+            Index(fields=['product_type', 'rating_average'], name='product_type_rating_idx'),
+        ]
 
     def __repr__(self):
         return f"Product(product_name={self.product_name}, price={self.price})"
@@ -73,6 +162,11 @@ class Product(Model):
     def __str__(self):
         return f"{self.product_name} ({self.price} Kč)"
 
+    def save(self, *args, **kwargs):
+        self.product_sort_key = czech_sort_key(self.product_name)
+        self.gender = product_gender(self.product_name)
+        super().save(*args, **kwargs)
+
     def available_stock(self):
         return max(self.stock_availability, 0)
 
@@ -0,0 +1,140 @@
+"""
+Cache celých stránek detailu produktu, služby a trenéra pro nepřihlášené návštěvníky.
+
+HTML se ukládá podle URL (detail a stránka recenzí `?page=` / `?after=`) a podle verzí:
+verze objektu se zvýší při změně produktu (i skladu), jeho recenzí nebo schválených trenérů
+(products/signals.py), verze celého webu při změně menu, kategorií nebo výrobců.
+Stará HTML se tak už nikdy nenačtou a z cache časem vypadnou sama.
+
+Uložené HTML je pro všechny stejné: stav košíku a přihlášení doplňuje navbar přes
+`/cart/data/navbar/`, místo CSRF tokenu se ukládá zástupný text, který se při každém
+odeslání nahradí tokenem konkrétního návštěvníka.
+"""
+import hashlib
+import time
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+
+SITE_VERSION_KEY = 'page:version:site'
+# Čas poslední změny výpisů (ns): 'site' pro změny menu, jinak id kategorie nebo 'all' pro celý katalog.
+LISTING_MODIFIED_KEY = 'listing:modified:{}'
+CSRF_PLACEHOLDER = 'page-cache-csrf-token'
+# Parametry URL, podle kterých se detail liší (stránkování recenzí).
+PAGE_PARAMS = ('page', 'after')
+# Druh detailu -> druh verze (produkt i služba jsou řádek Product).
+VERSION_KINDS = {'product': 'product', 'service': 'product', 'trainer': 'trainer'}
+
+
+def page_version_key(kind, pk):
+    return f'page:version:{VERSION_KINDS[kind]}:{pk}'
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Verze v cache není, nová se při dalším zobrazení založí z aktuálního času.
+        pass
+
+
+def invalidate_page(kind, pk):
+    """Zneplatní všechny uložené stránky detailu daného objektu."""
+    _bump(page_version_key(kind, pk))
+
+
+def invalidate_pages():
+    """Zneplatní všechny uložené stránky (změna menu, kategorií, výrobců)."""
+    _bump(SITE_VERSION_KEY)
+    touch_all_listings()
+
+
+def touch_all_listings():
+    """Zaznamená změnu všech výpisů (ETag a Last-Modified), stránky detailu v cache zůstanou platné."""
+    cache.set(LISTING_MODIFIED_KEY.format('site'), time.time_ns(), None)
+
+
+def touch_listings(category_ids):
+    """Zaznamená změnu produktu ve výpisech kategorií `category_ids` a celého katalogu."""
+    now = time.time_ns()
+    cache.set_many({LISTING_MODIFIED_KEY.format(scope): now for scope in ['all', *category_ids]}, None)
+
+
+def listing_modified(category_id=None):
+    """Časy změn (ns) menu a výpisu kategorie (s podkategoriemi) nebo celého katalogu."""
+    scope = 'all' if category_id is None else category_id
+    return tuple(get_versions([LISTING_MODIFIED_KEY.format('site'), LISTING_MODIFIED_KEY.format(scope)]))
+
+
+def get_versions(keys):
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, time.time_ns(), None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def site_version():
+    """Verze webu - změní se se změnou menu, tedy i s přidáním, smazáním nebo přesunem produktu."""
+    return get_versions([SITE_VERSION_KEY])[0]
+
+
+def page_versions(kind, pk):
+    """(verze webu, verze objektu) - změní se při každé změně obsahu stránky detailu."""
+    return tuple(get_versions([SITE_VERSION_KEY, page_version_key(kind, pk)]))
+
+
+def page_cache_key(request, kind, pk):
+    site_version, object_version = page_versions(kind, pk)
+    query = urlencode([(name, request.GET[name]) for name in PAGE_PARAMS if name in request.GET])
+    digest = hashlib.md5(query.encode()).hexdigest()
+    return f'page:{kind}:{pk}:{site_version}:{object_version}:{digest}'
+
+
+def is_cacheable(request):
+    # Zprávy (messages) patří jednomu návštěvníkovi, len() je nespotřebuje.
+    return (
+        request.method in ('GET', 'HEAD')
+        and not request.user.is_authenticated
+        and not len(get_messages(request))
+    )
+
+
+def cache_anonymous_page(kind):
+    """Dekorátor detailu: nepřihlášeným vrací HTML z cache, jinak volá view beze změny."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, pk, *args, **kwargs):
+            if not settings.PAGE_CACHE_TIMEOUT or not str(pk).isdigit() or not is_cacheable(request):
+                return view(request, pk, *args, **kwargs)
+
+            key = page_cache_key(request, kind, pk)
+            content = cache.get(key)
+            if content is None:
+                request._page_cache_render = True
+                response = view(request, pk, *args, **kwargs)
+                if response.status_code == 200 and not response.streaming:
+                    cache.set(key, response.content, settings.PAGE_CACHE_TIMEOUT)
+            else:
+                response = HttpResponse(content)
+
+            if not response.streaming:
+                response.content = response.content.replace(
+                    CSRF_PLACEHOLDER.encode(), get_token(request).encode()
+                )
+            return response
+        return wrapper
+    return decorator
+
+
+def page_cache_context(request):
+    """Kontextový procesor: při vykreslování do cache vloží místo CSRF tokenu zástupný text."""
+    if getattr(request, '_page_cache_render', False):
+        return {'csrf_token': CSRF_PLACEHOLDER}
+    return {}
@@ -0,0 +1,143 @@
+import base64
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+# How long a cached total count of a cursor-paginated listing stays valid (seconds).
+CURSOR_COUNT_TIMEOUT = 300
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class CursorPage:
+    """One page of a keyset-paginated listing (iterable like a Django Page)."""
+
+    def __init__(self, object_list, paginator, cursor, next_cursor):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.cursor = cursor
+        self.next_cursor = next_cursor
+
+    def __repr__(self):
+        return f"<CursorPage after={self.cursor!r}>"
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return bool(self.cursor)
+
+
+class CursorPaginator:
+    """
+    Keyset pagination over `queryset` ordered by `ordering` (the last field must be unique, e.g. 'pk').
+
+    Every page is fetched with `WHERE (sort key, id) > (last row) ... LIMIT per_page + 1`,
+    so deep pages cost the same as the first one and no COUNT query is needed.
+    The total count is only computed on demand and cached under `count_cache_key`.
+    """
+    is_cursor = True
+
+    def __init__(self, queryset, per_page, ordering, count_cache_key=None):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = list(ordering)
+        self.count_cache_key = count_cache_key
+
+        opts = queryset.model._meta
+        self.fields = []
+        for name in self.ordering:
+            descending = name.startswith('-')
+            field_name = name.lstrip('-')
+            field = opts.pk if field_name == 'pk' else opts.get_field(field_name)
+            self.fields.append((field, descending))
+
+    @cached_property
+    def count(self):
+        if self.count_cache_key is None:
+            return self.queryset.count()
+        return cache.get_or_set(self.count_cache_key, self.queryset.count, CURSOR_COUNT_TIMEOUT)
+
+    def encode_cursor(self, obj):
+        values = [field.value_to_string(obj) for field, _ in self.fields]
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            if len(values) != len(self.fields):
+                raise InvalidCursor(cursor)
+            return [field.to_python(value) for (field, _), value in zip(self.fields, values)]
+        except (ValueError, TypeError, ValidationError) as e:
+            raise InvalidCursor(cursor) from e
+
+    def _after(self, values):
+        # (a, b, id) > (x, y, z)  ==  a > x OR (a = x AND b > y) OR (a = x AND b = y AND id > z)
+        condition = Q()
+        equal = Q()
+        for (field, descending), value in zip(self.fields, values):
+            lookup = 'lt' if descending else 'gt'
+            condition |= equal & Q(**{f'{field.attname}__{lookup}': value})
+            equal &= Q(**{field.attname: value})
+        return condition
+
+    def get_page(self, cursor=None):
+        queryset = self.queryset.order_by(*self.ordering)
+        if cursor:
+            try:
+                queryset = queryset.filter(self._after(self.decode_cursor(cursor)))
+            except InvalidCursor:
+                cursor = None
+
+        rows = list(queryset[:self.per_page + 1])
+        next_cursor = self.encode_cursor(rows[self.per_page - 1]) if len(rows) > self.per_page else None
+        return CursorPage(rows[:self.per_page], self, cursor, next_cursor)
+
+
+class CachedCountPaginator(Paginator):
+    """Numbered pages whose total count is cached under `count_cache_key` (invalidated by the caller)."""
+
+    def __init__(self, object_list, per_page, count_cache_key, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_cache_key = count_cache_key
+
+    @cached_property
+    def count(self):
+        return cache.get_or_set(self.count_cache_key, self.object_list.count, CURSOR_COUNT_TIMEOUT)
+
+
+def paginate(request, queryset, per_page, ordering, count_cache_key=None, page_param='page', cache_count=False):
+    """
+    Returns one page of `queryset` for the request.
+
+    Classic numbered pages (`?page=`) are the default; keyset pages are used when
+    settings.CURSOR_PAGINATION is enabled or the request carries an `?after=` token.
+    With `cache_count` numbered pages also take the total count from the cache,
+    the caller is then responsible for deleting `count_cache_key` when it changes.
+    """
+    if getattr(settings, 'CURSOR_PAGINATION', False) or 'after' in request.GET:
+        paginator = CursorPaginator(queryset, per_page, ordering, count_cache_key)
+        return paginator.get_page(request.GET.get('after'))
+
+    if cache_count and count_cache_key is not None:
+        paginator = CachedCountPaginator(queryset.order_by(*ordering), per_page, count_cache_key)
+    else:
+        paginator = Paginator(queryset.order_by(*ordering), per_page)
+    return paginator.get_page(request.GET.get(page_param))
@@ -0,0 +1,61 @@
+"""
+Seznam výrobců a produkty výrobce seskupené podle kategorií, z cache.
+
+Oba seznamy se ukládají jako hotové struktury (slovníky pro šablonu), klíč obsahuje verzi
+výrobců a verzi webu. Verzi výrobců zvýší uložení nebo smazání produktu či výrobce
+(products/signals.py), verzi webu změna kategorií. Při prázdné cache je seznam produktů
+jeden dotaz seřazený podle kategorie a názvu v SQL, skupiny se jen odečtou po sobě jdoucí.
+"""
+from itertools import groupby
+
+from django.core.cache import cache
+
+from products.models import Producer, Product
+from products.page_cache import get_versions, site_version
+
+# How long the cached producer directory and grouped producer listings stay valid (seconds).
+PRODUCER_CACHE_TIMEOUT = 3600
+PRODUCER_VERSION_KEY = 'producers:version'
+
+
+def producer_version():
+    return get_versions([PRODUCER_VERSION_KEY])[0]
+
+
+def invalidate_producers():
+    """Zneplatní seznam výrobců i uložené produkty všech výrobců."""
+    try:
+        cache.incr(PRODUCER_VERSION_KEY)
+    except ValueError:
+        pass
+
+
+def _versions():
+    return f'{producer_version()}:{site_version()}'
+
+
+def producer_directory():
+    """[{'pk', 'producer_name'}] všech výrobců v českém řazení."""
+    def load():
+        return [
+            {'pk': pk, 'producer_name': name}
+            for pk, name in Producer.objects.order_by('producer_sort_key', 'pk').values_list('pk', 'producer_name')
+        ]
+    return cache.get_or_set(f'producers:directory:{_versions()}', load, PRODUCER_CACHE_TIMEOUT)
+
+
+def producer_products(producer_id):
+    """[(kategorie, [produkty])] výrobce: kategorie i produkty v českém řazení, jen sloupce pro výpis."""
+    def load():
+        rows = Product.objects.filter(producer_id=producer_id).order_by(
+            'category__category_sort_key', 'category_id', 'product_sort_key', 'pk'
+        ).values('category_id', 'category__category_name', 'id', 'product_name', 'price')
+        groups = []
+        for category_id, items in groupby(rows, key=lambda row: row['category_id']):
+            products = list(items)
+            category = {'pk': category_id, 'category_name': products[0]['category__category_name']}
+            groups.append((category, [
+                {'id': row['id'], 'product_name': row['product_name'], 'price': row['price']} for row in products
+            ]))
+        return groups
+    return cache.get_or_set(f'producers:products:{producer_id}:{_versions()}', load, PRODUCER_CACHE_TIMEOUT)
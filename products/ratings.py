@@ -0,0 +1,56 @@
+from django.db.models import F, FloatField
+from django.db.models.functions import Cast, Coalesce, NullIf
+
+RATING_VALUES = range(1, 6)
+
+
+def clean_rating(value):
+    """Hodnocení jako int, nebo None, pokud chybí nebo není v rozsahu 1–5 (formulář posílá řetězec)."""
+    try:
+        rating = int(value)
+    except (TypeError, ValueError):
+        return None
+    return rating if rating in RATING_VALUES else None
+
+
+def invalid_rating(value):
+    """Vyplněné hodnocení, které není celé číslo od 1 do 5."""
+    return value not in (None, '') and clean_rating(value) is None
+
+
+def apply_rating_change(model, pk, removed=None, added=None):
+    """
+    Promítne změnu jednoho hodnocení do souhrnu (RatingSummary) objektu `model` s klíčem `pk`.
+
+    `removed` je původní hodnocení (smazaná nebo upravená recenze), `added` nové.
+    Vše proběhne jedním UPDATE s F() výrazy, takže souběžné recenze se nepřepíšou.
+    """
+    if removed == added:
+        return
+
+    count = F('rating_count') + (added is not None) - (removed is not None)
+    total = F('rating_sum') + (added or 0) - (removed or 0)
+    updates = {
+        'rating_count': count,
+        'rating_sum': total,
+        'rating_average': Coalesce(Cast(total, FloatField()) / NullIf(count, 0), 0.0),
+    }
+    if removed is not None:
+        updates[f'rating_{removed}_count'] = F(f'rating_{removed}_count') - 1
+    if added is not None:
+        updates[f'rating_{added}_count'] = F(f'rating_{added}_count') + 1
+    model.objects.filter(pk=pk).update(**updates)
+
+
+def star_states(average):
+    """Stav pěti hvězdiček pro průměr zaokrouhlený na půl hvězdičky."""
+    rounded = round(average * 2) / 2
+    states = []
+    for i in RATING_VALUES:
+        if i <= rounded:
+            states.append("filled")
+        elif i - 0.5 == rounded:
+            states.append("half-filled")
+        else:
+            states.append("empty")
+    return rounded, states
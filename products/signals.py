@@ -0,0 +1,205 @@
+from django.db.models.functions import Now
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from accounts.models import UserProfile, TrainersServices
+from products.catalog_index import catalog_index
+from products.detail import invalidate_review_count
+from products.hierarchy import ancestor_ids, insert_category, move_category, remove_category
+from products.models import Category, Producer, Product, ProductReview, TrainerReview
+from products.page_cache import invalidate_page, invalidate_pages, touch_listings
+from products.producers import invalidate_producers
+from products.ratings import apply_rating_change, clean_rating
+
+# Recenze -> (pole s hodnoceným objektem, model se souhrnem hodnocení)
+REVIEW_TARGETS = {
+    ProductReview: ('product_id', Product),
+    TrainerReview: ('trainer_id', UserProfile),
+}
+# Recenze -> druhy detailu, jejichž počet recenzí se ukládá do cache (products/detail.py)
+REVIEW_DETAIL_KINDS = {
+    ProductReview: ('product', 'service'),
+    TrainerReview: ('trainer',),
+}
+
+
+def product_listings_changed(category_id):
+    # Výpisy kategorie a jejích nadřazených kategorií (ETag a Last-Modified, products/conditional.py).
+    touch_listings(ancestor_ids(category_id))
+
+
+def touch_product(pk):
+    # Recenze a schválení trenéři jsou součástí stránky produktu i výpisů (hodnocení, trenéři služby),
+    # změna UPDATE dotazem (bez post_save) proto zapíše i čas změny výpisů (products/conditional.py).
+    Product.objects.filter(pk=pk).update(updated_at=Now())
+    category_id = Product.objects.filter(pk=pk).values_list('category_id', flat=True).first()
+    if category_id is not None:
+        product_listings_changed(category_id)
+
+
+def catalog_bulk_changed():
+    """
+    Hromadný zápis produktů bez signálů (bulk_update v příkazech): zneplatní vše, co jinak udržují
+    signály - stránky v cache, fasety a počty (verze webu), ETag a Last-Modified výpisů,
+    výrobce v cache a index katalogu. Příkazy navíc samy nastaví `updated_at` zapsaných řádků.
+    """
+    invalidate_pages()
+    invalidate_producers()
+    catalog_index.invalidate()
+
+
+def review_target_changed(sender, pk):
+    """Recenze hodnoceného objektu se změnily: stránka detailu v cache i její validátory jsou neplatné."""
+    model = REVIEW_TARGETS[sender][1]
+    if model is Product:
+        touch_product(pk)
+        # Hodnocení se mění UPDATE dotazem (bez post_save), do indexu katalogu se promítne zde.
+        catalog_index.refresh_product(pk)
+    invalidate_page(REVIEW_DETAIL_KINDS[sender][0], pk)
+
+
+@receiver(pre_save, sender=ProductReview)
+@receiver(pre_save, sender=TrainerReview)
+def review_pre_save(sender, instance, raw=False, **kwargs):
+    # Původní hodnocený objekt a hodnocení (i update_or_create ukládá přes save()).
+    instance._previous_rating = None
+    if raw or instance.pk is None:
+        return
+    target_field, _ = REVIEW_TARGETS[sender]
+    instance._previous_rating = sender.objects.filter(pk=instance.pk).values_list(target_field, 'rating').first()
+
+
+@receiver(post_save, sender=ProductReview)
+@receiver(post_save, sender=TrainerReview)
+def review_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    target_field, model = REVIEW_TARGETS[sender]
+    target_id = getattr(instance, target_field)
+    rating = clean_rating(instance.rating)
+
+    previous = getattr(instance, '_previous_rating', None)
+    instance._previous_rating = None
+    if previous is None:
+        apply_rating_change(model, target_id, added=rating)
+        invalidate_review_count(REVIEW_DETAIL_KINDS[sender], target_id)
+    elif previous[0] == target_id:
+        apply_rating_change(model, target_id, removed=clean_rating(previous[1]), added=rating)
+    else:
+        apply_rating_change(model, previous[0], removed=clean_rating(previous[1]))
+        apply_rating_change(model, target_id, added=rating)
+        invalidate_review_count(REVIEW_DETAIL_KINDS[sender], previous[0])
+        invalidate_review_count(REVIEW_DETAIL_KINDS[sender], target_id)
+        review_target_changed(sender, previous[0])
+    # I úprava samotného komentáře mění stránku.
+    review_target_changed(sender, target_id)
+
+
+@receiver(post_delete, sender=ProductReview)
+@receiver(post_delete, sender=TrainerReview)
+def review_deleted(sender, instance, **kwargs):
+    target_field, model = REVIEW_TARGETS[sender]
+    target_id = getattr(instance, target_field)
+    apply_rating_change(model, target_id, removed=clean_rating(instance.rating))
+    invalidate_review_count(REVIEW_DETAIL_KINDS[sender], target_id)
+    review_target_changed(sender, target_id)
+
+
+# Stránky detailu v cache (products/page_cache.py). Změny menu zneplatní všechny stránky
+# přes viewer.navbar.invalidate_navbar().
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def product_page_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # Včetně změny skladu při objednávce.
+    invalidate_page('product', instance.pk)
+    product_listings_changed(instance.category_id)
+    if instance.product_type == 'service':
+        # Název služby je i na stránkách jejích trenérů.
+        for trainer_id in TrainersServices.objects.filter(service_id=instance.pk).values_list('trainer_id', flat=True):
+            invalidate_page('trainer', trainer_id)
+
+
+@receiver(post_save, sender=TrainersServices)
+@receiver(post_delete, sender=TrainersServices)
+def trainers_service_page_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    touch_product(instance.service_id)
+    invalidate_page('service', instance.service_id)
+    invalidate_page('trainer', instance.trainer_id)
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def trainer_page_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate_page('trainer', instance.pk)
+
+
+@receiver(post_save, sender=Producer)
+@receiver(post_delete, sender=Producer)
+def producer_page_changed(sender, raw=False, **kwargs):
+    if not raw:
+        invalidate_pages()
+
+
+# Index katalogu v paměti (products/catalog_index.py).
+
+@receiver(post_save, sender=Product)
+def catalog_index_product_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        catalog_index.refresh_product(instance.pk)
+
+
+@receiver(post_delete, sender=Product)
+def catalog_index_product_deleted(sender, instance, **kwargs):
+    catalog_index.remove_product(instance.pk)
+
+
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Producer)
+def catalog_index_reference_deleted(sender, **kwargs):
+    # Produkty smazané kategorie nebo výrobce se přesunou hromadným UPDATE (bez signálů).
+    catalog_index.invalidate()
+
+
+# Seznam výrobců a produkty výrobců v cache (products/producers.py).
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Producer)
+@receiver(post_delete, sender=Producer)
+def producer_listing_changed(sender, raw=False, **kwargs):
+    if not raw:
+        invalidate_producers()
+
+
+# Tabulka uzávěru stromu kategorií (products/hierarchy.py).
+
+@receiver(pre_save, sender=Category)
+def category_pre_save(sender, instance, raw=False, **kwargs):
+    instance._previous_parent = None
+    if raw or instance.pk is None:
+        return
+    # (rodič,) před uložením, None pro kategorii, která ještě neexistuje.
+    instance._previous_parent = Category.objects.filter(pk=instance.pk).values_list('category_parent_id').first()
+
+
+@receiver(post_save, sender=Category)
+def category_tree_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_parent', None)
+    instance._previous_parent = None
+    if created or previous is None:
+        insert_category(instance)
+    elif previous[0] != instance.category_parent_id:
+        move_category(instance)
+
+
+@receiver(pre_delete, sender=Category)
+def category_tree_deleted(sender, instance, **kwargs):
+    remove_category(instance)
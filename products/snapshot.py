@@ -0,0 +1,409 @@
+"""
+Sdílený snímek katalogu v souboru pro nasazení s mnoha workery (settings.CATALOG_SNAPSHOT_DIR).
+
+Příkaz publish_catalog_snapshot zapíše do adresáře binární soubor jen pro čtení
+`catalog-<verze>.snapshot` se sloupci produktů (stejnými jako index katalogu,
+products/catalog_index.py, včetně seřazených seznamů kategorií pro všechna řazení),
+kategoriemi, výrobci, schválenými trenéry a slovníkem slov bez diakritiky s výskyty pro vyhledávání.
+Hotový soubor se zveřejní přepsáním ukazatele `CURRENT` (os.replace), takže ho workery
+vidí buď celý, nebo vůbec.
+
+Workery soubor mapují přes mmap a čtou sloupce přímo z mapované paměti (memoryview.cast),
+bez kopírování do paměti procesu. Stránky souboru sdílí všechny procesy přes cache
+operačního systému, paměť tak s počtem workerů neroste. Při změně ukazatele se worker
+při dalším použití přepne na novou verzi, starý soubor se uvolní po posledním použití.
+
+Snímek se mezi zveřejněními nemění: změny skladu, cen a hodnocení se do výpisů a hledání
+promítnou až s dalším spuštěním příkazu (např. z cronu). Bez snímku se používá
+index katalogu v paměti procesu a vyhledávací index (viewer/search.py).
+"""
+import bisect
+import heapq
+import mmap
+import os
+import struct
+import threading
+import time
+from array import array
+from itertools import chain
+
+from django.conf import settings
+
+from accounts.models import UserProfile
+from products.models import Category, Producer, Product
+from products.page_cache import touch_all_listings
+from viewer.search import approved_trainers, normalize_for_search, product_result, tokenize, trainer_result
+
+MAGIC = b'PBCATSNP'
+FORMAT_VERSION = 2
+# magic, verze formátu, kontrola pořadí bajtů, verze snímku, počet sekcí
+HEADER = struct.Struct('<8sIqqI')
+# název sekce, typ prvků (kód modulu array, 'B' = bajty), posun, délka v bajtech
+SECTION = struct.Struct('<48s1s7xQQ')
+BYTE_ORDER_CHECK = 0x0102030405060708
+CURRENT_FILE = 'CURRENT'
+# Sloupce produktů: název sekce -> atribut CatalogArrays
+PRODUCT_COLUMNS = {
+    'product.ids': 'ids',
+    'product.categories': 'categories',
+    'product.producers': 'producers',
+    'product.types': 'types',
+    'product.genders': 'genders',
+    'product.prices': 'prices',
+    'product.stock': 'stock',
+    'product.ratings': 'ratings',
+}
+# Výskyt slova: dokument << 1 | slovo je v názvu; dokument = druh << 32 | řádek.
+PRODUCT_DOCUMENT, TRAINER_DOCUMENT = 0, 1
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def _strings_sections(name, values):
+    """Seznam řetězců jako dvě sekce: posuny (q) a data v UTF-8."""
+    offsets = array('q', [0])
+    data = bytearray()
+    for value in values:
+        data += value.encode()
+        offsets.append(len(data))
+    return {f'{name}.offsets': offsets, f'{name}.data': bytes(data)}
+
+
+def _write(path, version, sections):
+    table_size = HEADER.size + SECTION.size * len(sections)
+    offset = table_size
+    table = []
+    for name, data in sections.items():
+        typecode = data.typecode if isinstance(data, array) else 'B'
+        raw = data.tobytes() if isinstance(data, array) else data
+        offset += -offset % 8    # sloupce zarovnané pro memoryview.cast()
+        table.append((name, typecode, offset, raw))
+        offset += len(raw)
+
+    with open(path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, FORMAT_VERSION, BYTE_ORDER_CHECK, version, len(table)))
+        for name, typecode, offset, raw in table:
+            file.write(SECTION.pack(name.encode(), typecode.encode(), offset, len(raw)))
+        for name, typecode, offset, raw in table:
+            file.write(b'\0' * (offset - file.tell()))
+            file.write(raw)
+        file.flush()
+        os.fsync(file.fileno())
+
+
+def _name_rank(keys):
+    """Pořadí každého řádku podle klíčů (normalizovaný název, id) jako array."""
+    keys = list(keys)
+    rank = array('q', bytes(array('q').itemsize * len(keys)))
+    for position, row in enumerate(sorted(range(len(keys)), key=keys.__getitem__)):
+        rank[row] = position
+    return rank
+
+
+def build_sections():
+    """Obsah snímku z databáze: {název sekce: array nebo bytes}."""
+    from products.catalog_index import ORDERINGS, load_arrays
+
+    arrays = load_arrays()
+    sections = {name: getattr(arrays, attribute) for name, attribute in PRODUCT_COLUMNS.items()}
+    # Seřazené seznamy řádků typu a kategorie za sebou (rozsahy v bucket.offsets), pro všechna řazení.
+    buckets = sorted(arrays.buckets)
+    sections['bucket.types'] = array('q', (type_code for type_code, _ in buckets))
+    sections['bucket.categories'] = array('q', (category_id for _, category_id in buckets))
+    sections['bucket.offsets'] = offsets = array('q', [0])
+    for key in buckets:
+        offsets.append(offsets[-1] + len(arrays.buckets[key]['name']))
+    for rank_name in ORDERINGS.values():
+        sections[f'product.rank.{rank_name}'] = arrays.rank(rank_name)
+        sections[f'product.order.{rank_name}'] = array(
+            'q', chain.from_iterable(arrays.buckets[key][rank_name] for key in buckets)
+        )
+
+    # Texty pro výsledky hledání, ve stejném pořadí řádků jako sloupce.
+    texts = {
+        pk: (name, description or '')
+        for pk, name, description in Product.objects.values_list(
+            'pk', 'product_name', 'product_short_description'
+        ).iterator()
+    }
+    texts = [texts.get(pk, ('', '')) for pk in arrays.ids]
+    sections.update(_strings_sections('product.names', (name for name, _ in texts)))
+    sections.update(_strings_sections('product.descriptions', (description for _, description in texts)))
+
+    categories = list(Category.objects.order_by('category_sort_key', 'pk').values_list(
+        'pk', 'category_parent_id', 'category_name'
+    ))
+    sections['category.ids'] = array('q', (pk for pk, _, _ in categories))
+    sections['category.parents'] = array('q', (-1 if parent is None else parent for _, parent, _ in categories))
+    sections.update(_strings_sections('category.names', (name for _, _, name in categories)))
+
+    producers = list(Producer.objects.order_by('producer_sort_key', 'pk').values_list('pk', 'producer_name'))
+    sections['producer.ids'] = array('q', (pk for pk, _ in producers))
+    sections.update(_strings_sections('producer.names', (name.strip() for _, name in producers)))
+
+    trainers = sorted(
+        approved_trainers().only('username', 'first_name', 'last_name', 'trainer_short_description'),
+        key=lambda trainer: (normalize_for_search(f"{trainer.first_name} {trainer.last_name}"), trainer.pk),
+    )
+    sections['trainer.ids'] = array('q', (trainer.pk for trainer in trainers))
+    for field in ('username', 'first_name', 'last_name', 'trainer_short_description'):
+        sections.update(_strings_sections(
+            f'trainer.{field}', (getattr(trainer, field) or '' for trainer in trainers)
+        ))
+
+    # Slovník slov bez diakritiky a jejich výskyty (jako invertovaný index viewer.search.SearchIndex).
+    postings = {}
+
+    def add(document, name, text):
+        name_tokens = set(tokenize(name))
+        for token in name_tokens | set(tokenize(text)):
+            postings.setdefault(token, set()).add(document << 1 | (token in name_tokens))
+
+    for row, (name, description) in enumerate(texts):
+        add(PRODUCT_DOCUMENT << 32 | row, name, description)
+    for row, trainer in enumerate(trainers):
+        add(
+            TRAINER_DOCUMENT << 32 | row,
+            f"{trainer.username} {trainer.first_name} {trainer.last_name}", trainer.trainer_short_description or '',
+        )
+    # Pořadí názvů pro shodné výsledky, stejné jako ve vyhledávacím indexu (viewer.search.SearchIndex).
+    sections['product.search_rank'] = _name_rank(
+        (normalize_for_search(name), pk) for pk, (name, _) in zip(arrays.ids, texts)
+    )
+    sections['trainer.search_rank'] = _name_rank(
+        (normalize_for_search(f"{trainer.username} {trainer.first_name} {trainer.last_name}"), trainer.pk)
+        for trainer in trainers
+    )
+    tokens = sorted(postings)
+    sections.update(_strings_sections('search.tokens', tokens))
+    sections['search.posting_offsets'] = posting_offsets = array('q', [0])
+    sections['search.postings'] = flat = array('q')
+    for token in tokens:
+        flat.extend(sorted(postings[token]))
+        posting_offsets.append(len(flat))
+    return sections
+
+
+def publish_snapshot(directory, keep=2):
+    """
+    Zapíše nový snímek do `directory` a zveřejní ho. Starší soubory nad počet `keep` smaže
+    (workery, které je ještě mají namapované, je dočtou, smazání se jich netýká).
+    Vrací (cestu, verzi).
+    """
+    os.makedirs(directory, exist_ok=True)
+    version = time.time_ns()
+    name = f'catalog-{version}.snapshot'
+    path = os.path.join(directory, name)
+    _write(f'{path}.tmp', version, build_sections())
+    os.replace(f'{path}.tmp', path)
+
+    pointer = os.path.join(directory, CURRENT_FILE)
+    with open(f'{pointer}.tmp', 'w') as file:
+        file.write(name)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(f'{pointer}.tmp', pointer)
+    # Výpisy se čtou ze snímku: jejich ETag a Last-Modified (products/conditional.py) se mění s ním.
+    touch_all_listings()
+
+    snapshots = sorted(entry for entry in os.listdir(directory) if entry.endswith('.snapshot'))
+    for old in snapshots[:-keep] if keep > 0 else []:
+        if old != name:
+            os.remove(os.path.join(directory, old))
+    return path, version
+
+
+class Strings:
+    """Seznam řetězců ze sekcí snímku, čtený bez kopírování (podporuje len(), [] a bisect)."""
+
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        return str(self.data[self.offsets[index]:self.offsets[index + 1]], 'utf-8')
+
+
+class SnapshotCatalog:
+    """Sloupce produktů ze snímku se stejným rozhraním jako CatalogArrays (jen pro čtení)."""
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        for name, attribute in PRODUCT_COLUMNS.items():
+            setattr(self, attribute, snapshot.sections[name])
+        sections = snapshot.sections
+        offsets = sections['bucket.offsets']
+        # (typ, kategorie) -> rozsah v seřazených seznamech product.order.*
+        self.buckets = {
+            (type_code, category_id): (offsets[index], offsets[index + 1])
+            for index, (type_code, category_id) in enumerate(zip(sections['bucket.types'], sections['bucket.categories']))
+        }
+
+    def __len__(self):
+        return len(self.ids)
+
+    def rank(self, name):
+        return self.snapshot.sections[f'product.rank.{name}']
+
+    def order_key(self, name):
+        return None if name == 'name' else self.rank(name).__getitem__
+
+    def bucket(self, type_code, category_id, name):
+        bounds = self.buckets.get((type_code, category_id))
+        if bounds is None:
+            return ()
+        return self.snapshot.sections[f'product.order.{name}'][bounds[0]:bounds[1]]
+
+    def memory_usage(self):
+        # Namapovaný soubor sdílí všechny workery, do paměti procesu se nepočítá.
+        return 0
+
+
+class CatalogSnapshot:
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            self.mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.path = path
+        self.size = len(self.mmap)
+        view = memoryview(self.mmap)
+        magic, format_version, byte_order, self.version, count = HEADER.unpack_from(view)
+        if magic != MAGIC or format_version != FORMAT_VERSION or byte_order != BYTE_ORDER_CHECK:
+            raise SnapshotError(f"Soubor {path} není snímek katalogu ve formátu {FORMAT_VERSION}.")
+
+        self.sections = {}
+        for index in range(count):
+            name, typecode, offset, length = SECTION.unpack_from(view, HEADER.size + index * SECTION.size)
+            self.sections[name.rstrip(b'\0').decode()] = view[offset:offset + length].cast(typecode.decode())
+
+        self.catalog = SnapshotCatalog(self)
+        strings = self.strings
+        self.product_names = strings('product.names')
+        self.product_descriptions = strings('product.descriptions')
+        self.category_names = strings('category.names')
+        self.producer_names = strings('producer.names')
+        self.trainer_fields = {
+            field: strings(f'trainer.{field}')
+            for field in ('username', 'first_name', 'last_name', 'trainer_short_description')
+        }
+        self.tokens = strings('search.tokens')
+
+    def strings(self, name):
+        return Strings(self.sections[f'{name}.offsets'], self.sections[f'{name}.data'])
+
+    def categories(self):
+        """[(id, id rodiče nebo None, název)] seřazené podle českého řazení názvů."""
+        parents = self.sections['category.parents']
+        return [
+            (pk, None if parents[row] < 0 else parents[row], self.category_names[row])
+            for row, pk in enumerate(self.sections['category.ids'])
+        ]
+
+    def producers(self):
+        """[(id, název)] seřazené podle českého řazení názvů."""
+        return list(zip(self.sections['producer.ids'], self.producer_names))
+
+    def _postings(self, term):
+        """{dokument: slovo je v názvu} pro všechna slova začínající na `term`."""
+        tokens, offsets, postings = self.tokens, self.sections['search.posting_offsets'], self.sections['search.postings']
+        documents = {}
+        exact = set()
+        index = bisect.bisect_left(tokens, term)
+        while index < len(tokens):
+            token = tokens[index]
+            if not token.startswith(term):
+                break
+            for posting in postings[offsets[index]:offsets[index + 1]]:
+                document = posting >> 1
+                documents[document] = documents.get(document, False) or bool(posting & 1)
+                if token == term:
+                    exact.add(document)
+            index += 1
+        return documents, exact
+
+    def _result_type(self, document):
+        kind, row = document >> 32, document & 0xFFFFFFFF
+        if kind == TRAINER_DOCUMENT:
+            return 'trainers'
+        return 'services' if self.catalog.types[row] == 2 else 'products'
+
+    def _name_rank(self, document):
+        kind, row = document >> 32, document & 0xFFFFFFFF
+        section = 'trainer.search_rank' if kind == TRAINER_DOCUMENT else 'product.search_rank'
+        return self.sections[section][row]
+
+    def _result(self, document):
+        kind, row = document >> 32, document & 0xFFFFFFFF
+        if kind == TRAINER_DOCUMENT:
+            trainer = UserProfile(
+                pk=self.sections['trainer.ids'][row],
+                **{field: values[row] for field, values in self.trainer_fields.items()},
+            )
+            # Prázdný popis trenéra je v databázi NULL.
+            trainer.trainer_short_description = trainer.trainer_short_description or None
+            return trainer_result(trainer)
+        product = Product(
+            pk=self.catalog.ids[row], product_name=self.product_names[row],
+            product_short_description=self.product_descriptions[row],
+            product_type='service' if self.catalog.types[row] == 2 else 'merchantdise',
+        )
+        return product_result(product)
+
+    def search(self, query, limit=None):
+        """
+        Hledání podle prefixů slov (všechna slova dotazu, AND) nad slovníkem ve snímku.
+
+        Řadí jako viewer.search.SearchIndex: počet slov nalezených v názvu, počet celých shod,
+        potom pořadí názvu. Výsledky (model a URL) se sestaví jen pro `limit` nejlepších dokumentů
+        každého typu. Hledání s překlepy (trigramy) snímek nemá.
+        Vrací {'products': [...], 'services': [...], 'trainers': [...]}.
+        """
+        results = {'products': [], 'services': [], 'trainers': []}
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return results
+
+        matches = [self._postings(term) for term in terms]
+        candidates = set(matches[0][0]).intersection(*(documents for documents, _ in matches[1:]))
+        ranked = {result_type: [] for result_type in results}
+        for document in candidates:
+            ranked[self._result_type(document)].append((
+                -sum(documents[document] for documents, _ in matches),
+                -sum(document in exact for _, exact in matches),
+                self._name_rank(document),
+                document,
+            ))
+        for result_type, keys in ranked.items():
+            best = sorted(keys) if limit is None else heapq.nsmallest(limit, keys)
+            results[result_type] = [self._result(document) for *_, document in best]
+        return results
+
+
+_lock = threading.Lock()
+_current = None         # (identita ukazatele, CatalogSnapshot)
+
+
+def current_snapshot():
+    """Aktuálně zveřejněný snímek, nebo None (snímky vypnuté nebo zatím žádný nevznikl)."""
+    global _current
+    directory = getattr(settings, 'CATALOG_SNAPSHOT_DIR', None)
+    if not directory:
+        return None
+    pointer = os.path.join(directory, CURRENT_FILE)
+    try:
+        stat = os.stat(pointer)
+    except FileNotFoundError:
+        return None
+
+    # os.replace() vytvoří nový soubor ukazatele, změnu pozná stat() bez čtení souboru.
+    identity = (pointer, stat.st_ino, stat.st_mtime_ns)
+    with _lock:
+        if _current is None or _current[0] != identity:
+            with open(pointer) as file:
+                name = file.read().strip()
+            _current = (identity, CatalogSnapshot(os.path.join(directory, name)))
+        return _current[1]
@@ -0,0 +1,109 @@
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from accounts.models import UserProfile
+from products.catalog_index import catalog_index, get_index_version, record_change
+from products.models import Category, Product, ProductReview
+from products.test_facets import FacetTest
+
+
+@override_settings(CATALOG_INDEX=True)
+class CatalogIndexFacetTest(FacetTest):
+    """Fasety a filtry výpisu musí z indexu v paměti dávat stejné výsledky jako z databáze."""
+
+    def setUp(self):
+        catalog_index.reset()
+        super().setUp()
+
+
+@override_settings(CATALOG_INDEX=True)
+class CatalogIndexTest(TestCase):
+    # Stejný katalog jako FacetTest, bez opakování jeho testů.
+    create = FacetTest.create
+
+    def setUp(self):
+        catalog_index.reset()
+        FacetTest.setUp(self)
+
+    def listing(self, sort_by='name', **params):
+        response = self.client.get(self.url, {'sort_by': sort_by, **params})
+        return [product.product_name for product in response.context['products']]
+
+    def test_sorting_matches_database(self):
+        for sort_by in ('name', 'price_asc', 'price_desc', 'rating'):
+            indexed = self.listing(sort_by)
+            with override_settings(CATALOG_INDEX=False):
+                self.assertEqual(indexed, self.listing(sort_by), sort_by)
+
+    def test_changes_are_applied_incrementally(self):
+        self.listing()
+        arrays = catalog_index.arrays
+        version = get_index_version()
+
+        product = Product.objects.get(product_name="Tyčinka")
+        product.price = 5000
+        product.stock_availability = 0
+        product.save()
+        self.assertEqual(self.listing('price_desc')[0], "Tyčinka")
+        self.assertNotIn("Tyčinka", self.listing(in_stock='1'))
+
+        # Hodnocení se mění UPDATE dotazem bez post_save.
+        reviewer = UserProfile.objects.create_user(username="recenzent", password="heslo")
+        ProductReview.objects.create(product=product, reviewer=reviewer, rating=5, comment="Výborné")
+        self.assertEqual(self.listing('rating')[0], "Tyčinka")
+
+        Product.objects.get(product_name="Kreatin").delete()
+        self.assertNotIn("Kreatin", self.listing())
+        # Nic z toho index nepřestavělo ani nevynutilo přestavění v ostatních procesech.
+        self.assertIs(catalog_index.arrays, arrays)
+        self.assertEqual(get_index_version(), version)
+
+    def test_changes_from_other_process_are_applied_row_by_row(self):
+        self.listing()
+        arrays = catalog_index.arrays
+        product = Product.objects.get(product_name="Tyčinka")
+        # Jako uložení v jiném procesu: řádek se změní a zapíše do deníku, tento index o tom neví.
+        Product.objects.filter(pk=product.pk).update(price=5000, stock_availability=0)
+        record_change(product.pk)
+        self.assertEqual(self.listing('price_desc')[0], "Tyčinka")
+        self.assertNotIn("Tyčinka", self.listing(in_stock='1'))
+        self.assertIs(catalog_index.arrays, arrays)
+
+    def test_new_product_rebuilds_index(self):
+        self.listing()
+        self.create("Aminokyseliny", 300, self.acme)
+        self.assertEqual(self.listing()[0], "Aminokyseliny")
+
+    def test_subtree_listing(self):
+        child = Category.objects.create(category_name="Proteiny", category_parent=self.category)
+        Product.objects.filter(product_name="Protein").update(category=child)
+        catalog_index.invalidate()
+        self.assertNotIn("Protein", self.listing())
+        self.assertIn("Protein", self.listing(subtree='1'))
+        # Seřazené seznamy kategorií podstromu se slijí ve stejném pořadí jako z databáze.
+        for sort_by in ('name', 'price_asc', 'price_desc', 'rating'):
+            indexed = self.listing(sort_by, subtree='1')
+            with override_settings(CATALOG_INDEX=False):
+                self.assertEqual(indexed, self.listing(sort_by, subtree='1'), sort_by)
+
+    def test_page_loads_only_displayed_rows(self):
+        for i in range(25):
+            self.create(f"Produkt {i:02}", 100 + i, self.acme)
+        self.listing()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.url, {'page': '2'})
+        self.assertEqual(len(response.context['products']), 10)
+        # Žádný počet ani OFFSET nad produkty, jen načtení zobrazených řádků podle id.
+        sql = [query['sql'] for query in context]
+        self.assertFalse([query for query in sql if '__count' in query or 'OFFSET' in query])
+        self.assertGreater(catalog_index.memory_usage(), 0)
+
+    def test_services_listing(self):
+        Product.objects.create(
+            product_type="service", product_name="Trénink", product_short_description="Popis",
+            product_long_description="Dlouhý popis", price=600, category=self.category, producer=None,
+        )
+        response = self.client.get(reverse('services', args=[self.category.pk]))
+        self.assertEqual([service.product_name for service in response.context['services']], ["Trénink"])
@@ -0,0 +1,110 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils.crypto import get_random_string
+
+from accounts.models import UserProfile
+from products.models import Category, Producer, Product, ProductReview
+
+
+class ConditionalGetTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.parent = Category.objects.create(category_name="Výživa")
+        self.category = Category.objects.create(category_name="Doplňky", category_parent=self.parent)
+        producer = Producer.objects.create(producer_name="Výrobce")
+        self.product = Product.objects.create(
+            product_type="merchantdise",
+            product_name="Protein",
+            product_short_description="Popis",
+            product_long_description="Dlouhý popis",
+            price=500,
+            category=self.category,
+            producer=producer,
+            stock_availability=3,
+        )
+        self.url = reverse('product', args=[self.product.pk])
+        # Vracející se návštěvník už má CSRF cookie z první stránky (je součástí ETagu).
+        self.client.cookies[settings.CSRF_COOKIE_NAME] = get_random_string(32)
+
+    def revalidate(self, url, response):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_detail_not_modified(self):
+        response = self.client.get(self.url)
+        self.assertIn('Last-Modified', response)
+        self.assertIn('no-cache', response['Cache-Control'])
+        self.assertIn('private', response['Cache-Control'])
+
+        not_modified = self.revalidate(self.url, response)
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified.templates, [])
+        self.assertEqual(
+            self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304
+        )
+
+        reviewer = UserProfile.objects.create_user(username="zakaznik", password="password")
+        ProductReview.objects.create(product=self.product, reviewer=reviewer, rating=5)
+        changed = self.revalidate(self.url, response)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], response['ETag'])
+
+    def assert_changed(self, url, response):
+        changed = self.revalidate(url, response)
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(self.revalidate(url, changed).status_code, 304)
+        return changed
+
+    def test_etag_depends_on_user(self):
+        response = self.client.get(self.url)
+        self.client.force_login(UserProfile.objects.create_user(username="zakaznik", password="password"))
+        self.assertEqual(self.revalidate(self.url, response).status_code, 200)
+
+    def test_listing_follows_products(self):
+        url = reverse('products', args=[self.category.pk])
+        response = self.client.get(url)
+        self.assertEqual(self.revalidate(url, response).status_code, 304)
+        # Jiné řazení je jiná stránka.
+        self.assertEqual(
+            self.client.get(url, {'sort_by': 'price_asc'}, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200
+        )
+
+        # Změna ceny, skladu i hodnocení mění výpis kategorie i nadřazené kategorie.
+        parent_url = reverse('products', args=[self.parent.pk])
+        parent = self.client.get(parent_url)
+        self.product.stock_availability = 0
+        self.product.save()
+        response = self.assert_changed(url, response)
+        parent = self.assert_changed(parent_url, parent)
+
+        reviewer = UserProfile.objects.create_user(username="zakaznik", password="password")
+        ProductReview.objects.create(product=self.product, reviewer=reviewer, rating=5)
+        response = self.assert_changed(url, response)
+        self.assert_changed(parent_url, parent)
+
+        self.product.delete()
+        self.assertEqual(self.revalidate(url, response).status_code, 200)
+
+    def test_producer_page_follows_its_products(self):
+        url = reverse('producer', args=[self.product.producer_id])
+        response = self.client.get(url)
+        # Stav stránky je jeden dotaz.
+        with self.assertNumQueries(1):
+            self.assertEqual(self.revalidate(url, response).status_code, 304)
+
+        Producer.objects.create(producer_name="Jiný výrobce")
+        response = self.assert_changed(url, response)
+        self.product.price = 600
+        self.product.save()
+        self.assert_changed(url, response)
+
+    def test_cart_etag_follows_cart(self):
+        url = reverse('cart_data_navbar')
+        response = self.client.get(url)
+        self.assertEqual(self.revalidate(url, response).status_code, 304)
+
+        self.client.post(reverse('add_to_cart', args=[self.product.pk]))
+        changed = self.revalidate(url, response)
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.json()['cart_count'], 1)
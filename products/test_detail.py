@@ -0,0 +1,78 @@
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from accounts.models import UserProfile, TrainersServices
+from products.models import Category, Producer, Product, ProductReview, TrainerReview
+
+
+# Anonymní stránky by jinak šly z cache celé (products/test_page_cache.py).
+@override_settings(PAGE_CACHE_TIMEOUT=0)
+class DetailQueryCountTest(TestCase):
+    """Počet dotazů detailu nesmí růst s počtem recenzí (autoři se načítají spolu s recenzemi)."""
+
+    def setUp(self):
+        cache.clear()
+        parent = Category.objects.create(category_name="Oblečení")
+        category = Category.objects.create(category_name="Trička", category_parent=parent)
+        producer = Producer.objects.create(producer_name="Výrobce")
+        self.product = Product.objects.create(
+            product_type="merchantdise",
+            product_name="Tričko",
+            product_short_description="Popis",
+            product_long_description="Dlouhý popis",
+            price=300,
+            category=category,
+            producer=producer,
+        )
+        self.service = Product.objects.create(
+            product_type="service",
+            product_name="Osobní trénink",
+            product_short_description="Popis",
+            product_long_description="Dlouhý popis",
+            price=500,
+            category=category,
+            producer=None,
+        )
+        self.trainer = UserProfile.objects.create_user(
+            username="trener", password="password", first_name="Jan", last_name="Novák"
+        )
+        self.trainer.groups.add(Group.objects.get_or_create(name='trainer')[0])
+        TrainersServices.objects.create(
+            trainer=self.trainer, service=self.service, trainers_service_description="Popis", is_approved=True
+        )
+        for i in range(4):
+            reviewer = UserProfile.objects.create_user(username=f"zakaznik{i}", password="password")
+            ProductReview.objects.create(product=self.product, reviewer=reviewer, rating=4)
+            ProductReview.objects.create(product=self.service, reviewer=reviewer, rating=5)
+            TrainerReview.objects.create(trainer=self.trainer, reviewer=reviewer, rating=3)
+
+    def assert_detail_queries(self, url, expected):
+        # První zobrazení naplní cache (menu, počet recenzí), další už načítá jen detail a recenze.
+        self.client.get(url)
+        with self.assertNumQueries(expected):
+            response = self.client.get(url)
+        self.assertEqual(len(response.context['page_reviews']), 4)
+        return response
+
+    def test_product_detail(self):
+        # produkt s kategoriemi a výrobcem + stránka recenzí s autory
+        response = self.assert_detail_queries(reverse('product', args=[self.product.pk]), 2)
+        self.assertContains(response, "Oblečení")
+        self.assertContains(response, "zakaznik3")
+
+    def test_service_detail(self):
+        # služba + schválení trenéři + stránka recenzí
+        self.assert_detail_queries(reverse('service', args=[self.service.pk]), 3)
+
+    def test_trainer_detail(self):
+        # trenér + jeho služby + stránka recenzí
+        self.assert_detail_queries(reverse('trainer', args=[self.trainer.pk]), 3)
+
+    def test_review_count_follows_new_reviews(self):
+        url = reverse('product', args=[self.product.pk])
+        self.client.get(url)
+        reviewer = UserProfile.objects.create_user(username="novy", password="password")
+        ProductReview.objects.create(product=self.product, reviewer=reviewer, rating=5)
+        self.assertEqual(self.client.get(url).context['page_reviews'].paginator.count, 5)
@@ -0,0 +1,95 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from products.models import Category, Producer, Product
+
+
+class FacetTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(category_name="Doplňky")
+        self.acme = Producer.objects.create(producer_name="Acme")
+        self.bio = Producer.objects.create(producer_name="Bio")
+        # (název, cena, výrobce, sklad, průměr hodnocení)
+        for name, price, producer, stock, rating in [
+            ("Protein", 450, self.acme, 5, 4.5),
+            ("Kreatin", 800, self.acme, 0, 3.0),
+            ("Tyčinka", 50, self.bio, 10, 0),
+            ("Gainer", 1500, self.bio, 2, 4.0),
+        ]:
+            self.create(name, price, producer, stock, rating)
+        self.url = reverse('products', args=[self.category.pk])
+
+    def create(self, name, price, producer, stock=1, rating=0):
+        Product.objects.create(
+            product_type="merchantdise", product_name=name, product_short_description="Popis",
+            product_long_description="Dlouhý popis", price=price, category=self.category,
+            producer=producer, stock_availability=stock, rating_average=rating,
+        )
+
+    def names(self, response):
+        return sorted(product.product_name for product in response.context['products'])
+
+    def facets(self, response):
+        return {
+            group['title']: [(option['label'], option['count']) for option in group['options']]
+            for group in response.context['facets']
+        }
+
+    def test_facet_counts(self):
+        self.assertEqual(self.facets(self.client.get(self.url)), {
+            "Cena": [("do 500 Kč", 2), ("500–1000 Kč", 1), ("1000–2000 Kč", 1)],
+            "Výrobce": [("Acme", 2), ("Bio", 2)],
+            "Dostupnost": [("Skladem", 3)],
+            "Hodnocení": [("4★ a více", 2), ("3★ a více", 3), ("2★ a více", 3), ("1★ a více", 3)],
+        })
+
+    def test_filters_narrow_listing(self):
+        response = self.client.get(self.url, {'producer': self.acme.pk, 'in_stock': '1'})
+        self.assertEqual(self.names(response), ["Protein"])
+
+        response = self.client.get(self.url, {'price_min': '500', 'price_max': '2000', 'sort_by': 'price_asc'})
+        self.assertEqual(self.names(response), ["Gainer", "Kreatin"])
+        # Řazení a stránkování zachovají zvolené filtry.
+        self.assertContains(response, "sort_by=price_desc&price_min=500&amp;price_max=2000")
+
+        # Zvolená hodnota je označená a její odkaz filtr vypne.
+        response = self.client.get(self.url, {'price_min': '500', 'price_max': '1000'})
+        self.assertEqual(self.names(response), ["Kreatin"])
+        selected = [
+            option for group in response.context['facets'] for option in group['options'] if option['active']
+        ]
+        self.assertEqual([(option['label'], option['query']) for option in selected], [("500–1000 Kč", "sort_by=name")])
+
+        response = self.client.get(self.url, {'min_rating': '4', 'price_min': 'nesmysl'})
+        self.assertEqual(self.names(response), ["Gainer", "Protein"])
+
+    def test_invalid_producer_is_ignored(self):
+        everything = self.names(self.client.get(self.url))
+        for producer in ('9' * 30, '-1', '0', '²', 'acme'):
+            response = self.client.get(self.url, {'producer': producer})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(self.names(response), everything, producer)
+
+    def test_query_budget_does_not_grow_with_catalog(self):
+        def queries():
+            self.client.get(self.url, {'producer': self.bio.pk})
+            with CaptureQueriesContext(connection) as context:
+                self.client.get(self.url, {'producer': self.bio.pk})
+            return len(context)
+
+        before = queries()
+        for i in range(30):
+            self.create(f"Produkt {i}", 100 + i * 50, Producer.objects.create(producer_name=f"Výrobce {i}"))
+        self.assertEqual(queries(), before)
+
+    def test_services_have_price_and_rating_facets(self):
+        Product.objects.create(
+            product_type="service", product_name="Trénink", product_short_description="Popis",
+            product_long_description="Dlouhý popis", price=600, category=self.category, producer=None,
+        )
+        response = self.client.get(reverse('services', args=[self.category.pk]))
+        self.assertEqual(self.facets(response), {"Cena": [("500–1000 Kč", 1)]})
@@ -0,0 +1,69 @@
+from io import StringIO
+
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from products.hierarchy import ancestors, descendants, with_products
+from products.models import Category, CategoryClosure, Product
+
+
+class CategoryClosureTest(TestCase):
+    def setUp(self):
+        # Oblečení > Sport > Běh > Trail
+        self.clothes = Category.objects.create(category_name="Oblečení")
+        self.sport = Category.objects.create(category_name="Sport", category_parent=self.clothes)
+        self.running = Category.objects.create(category_name="Běh", category_parent=self.sport)
+        self.trail = Category.objects.create(category_name="Trail", category_parent=self.running)
+        self.food = Category.objects.create(category_name="Výživa")
+
+    def links(self):
+        return set(CategoryClosure.objects.values_list('ancestor_id', 'descendant_id', 'depth'))
+
+    def names(self, categories):
+        return [category.category_name for category in categories]
+
+    def test_descendants_and_ancestors_at_any_depth(self):
+        self.assertEqual(set(self.names(descendants(self.sport))), {"Sport", "Běh", "Trail"})
+        with self.assertNumQueries(1):
+            self.assertEqual(self.names(ancestors(self.trail)), ["Oblečení", "Sport", "Běh"])
+        self.assertEqual(self.names(ancestors(self.clothes)), [])
+
+    def test_subtree_with_products(self):
+        Product.objects.create(
+            product_type="merchantdise", product_name="Boty", product_short_description="Popis",
+            product_long_description="Dlouhý popis", price=2000, category=self.trail, producer=None,
+        )
+        roots = with_products(Category.objects.filter(category_parent=None), 'merchantdise')
+        self.assertEqual(self.names(roots), ["Oblečení"])
+        self.assertFalse(with_products(Category.objects.filter(pk=self.food.pk), 'merchantdise').exists())
+
+        # Hlavní kategorie s produktem až ve čtvrté úrovni je ve výpisu.
+        self.assertContains(self.client.get(reverse('products')), "Oblečení")
+
+    def test_move_subtree(self):
+        self.sport.category_parent = self.food
+        self.sport.save()
+        self.assertEqual(self.names(ancestors(self.trail)), ["Výživa", "Sport", "Běh"])
+        self.assertEqual(set(self.names(descendants(self.clothes))), {"Oblečení"})
+
+        self.sport.category_parent = None
+        self.sport.save()
+        self.assertEqual(self.names(ancestors(self.trail)), ["Sport", "Běh"])
+
+        before = self.links()
+        call_command('rebuild_category_tree', stdout=StringIO())
+        self.assertEqual(self.links(), before)
+
+    def test_delete_makes_children_main_categories(self):
+        self.sport.delete()
+        self.running.refresh_from_db()
+        self.assertIsNone(self.running.category_parent)
+        self.assertEqual(self.names(ancestors(self.trail)), ["Běh"])
+        self.assertEqual(set(self.names(descendants(self.clothes))), {"Oblečení"})
+
+    def test_cannot_move_below_own_subcategory(self):
+        self.sport.category_parent = self.trail
+        with self.assertRaises(ValidationError):
+            self.sport.full_clean()
@@ -0,0 +1,231 @@
+import base64
+import json
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from accounts.models import UserProfile
+from products.models import Category, Producer, Product, ProductReview
+
+
+class ProductListingTest(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(category_name="Oblečení")
+        self.producer = Producer.objects.create(producer_name="Výrobce")
+        names = [
+            "Čepice dámské", "Ceváky pánské", "Chrániče", "Hůlky", "Šátek dámské", "Sandály",
+            "Zip mikina pánské", "Žíněnka", "Rukavice", "Řemínek", "Batoh", "Ábr",
+        ]
+        for price, name in enumerate(names, start=1):
+            Product.objects.create(
+                product_type="merchantdise",
+                product_name=name,
+                product_short_description="Krátký popis",
+                product_long_description="Dlouhý popis",
+                price=price * 10,
+                category=self.category,
+                producer=self.producer,
+                stock_availability=1,
+            )
+
+    def names(self, response):
+        return [product.product_name for product in response.context['products']]
+
+    def test_name_sort_is_czech_and_paginated(self):
+        first = self.names(self.client.get(reverse('products', args=[self.category.pk])))
+        second = self.names(self.client.get(reverse('products', args=[self.category.pk]), {'page': 2}))
+
+        self.assertEqual(first, [
+            "Ábr", "Batoh", "Ceváky pánské", "Čepice dámské", "Hůlky", "Chrániče",
+            "Rukavice", "Řemínek", "Sandály", "Šátek dámské",
+        ])
+        self.assertEqual(second, ["Zip mikina pánské", "Žíněnka"])
+
+    def test_gender_filter_with_price_sort(self):
+        response = self.client.get(
+            reverse('products', args=[self.category.pk]), {'gender': 'ladies', 'sort_by': 'price_desc'}
+        )
+
+        self.assertEqual(self.names(response), ["Šátek dámské", "Čepice dámské"])
+        self.assertEqual(response.context['gender_availability'], {'ladies': True, 'gentlemans': True})
+
+    def test_gender_attribute_is_derived_from_name(self):
+        self.assertEqual(Product.objects.filter(gender='ladies').count(), 2)
+        self.assertEqual(Product.objects.filter(gender='gentlemans').count(), 2)
+
+        # Produkty uložené mimo save() (fixtury) doplní příkaz.
+        Product.objects.update(gender='')
+        call_command('backfill_product_attributes', stdout=StringIO())
+        self.assertEqual(
+            set(Product.objects.exclude(gender='').values_list('product_name', flat=True)),
+            {"Čepice dámské", "Šátek dámské", "Ceváky pánské", "Zip mikina pánské"},
+        )
+
+    def test_cursor_pagination_follows_after_token(self):
+        url = reverse('products', args=[self.category.pk])
+        first = self.client.get(url, {'after': '', 'sort_by': 'price_asc'})
+        page = first.context['products']
+
+        self.assertEqual(len(page), 10)
+        self.assertTrue(page.has_next())
+        self.assertContains(first, f"?after={page.next_cursor}&sort_by=price_asc")
+
+        second = self.client.get(url, {'after': page.next_cursor, 'sort_by': 'price_asc'})
+        self.assertEqual(self.names(second), ["Batoh", "Ábr"])
+        self.assertFalse(second.context['products'].has_next())
+
+    def test_cursor_count_follows_product_changes(self):
+        url = reverse('products', args=[self.category.pk])
+        self.assertEqual(self.client.get(url, {'after': ''}).context['products'].paginator.count, 12)
+        Product.objects.create(
+            product_type="merchantdise", product_name="Dres", product_short_description="Popis",
+            product_long_description="Dlouhý popis", price=100, category=self.category, producer=self.producer,
+        )
+        self.assertEqual(self.client.get(url, {'after': ''}).context['products'].paginator.count, 13)
+
+        # Počet s filtrem skladem se mění i se skladem.
+        self.assertEqual(self.client.get(url, {'after': '', 'in_stock': '1'}).context['products'].paginator.count, 12)
+        batoh = Product.objects.get(product_name="Batoh")
+        batoh.stock_availability = 0
+        batoh.save()
+        self.assertEqual(self.client.get(url, {'after': '', 'in_stock': '1'}).context['products'].paginator.count, 11)
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        response = self.client.get(reverse('products', args=[self.category.pk]), {'after': 'nesmysl'})
+
+        self.assertEqual(self.names(response)[0], "Ábr")
+
+    def test_cursor_with_wrong_value_types_falls_back_to_first_page(self):
+        # Platný JSON, ale hodnoty neodpovídají typům polí (cena, id).
+        cursor = base64.urlsafe_b64encode(json.dumps(["abc", "1"]).encode()).decode().rstrip('=')
+        response = self.client.get(
+            reverse('products', args=[self.category.pk]), {'after': cursor, 'sort_by': 'price_asc'}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.names(response)[0], "Čepice dámské")
+
+
+class ListingProjectionTest(TestCase):
+    """Výpisy nenačítají dlouhý popis (products/listing.py)."""
+    setUp = ProductListingTest.setUp
+
+    def assertLean(self, products):
+        products = list(products)
+        self.assertTrue(products)
+        for product in products:
+            self.assertIn('product_long_description', product.get_deferred_fields())
+
+    def test_listings_defer_long_description(self):
+        self.assertLean(self.client.get(reverse('products', args=[self.category.pk])).context['products'])
+        self.assertLean(self.client.get(reverse('products', args=[self.category.pk]), {'after': ''}).context['products'])
+
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(reverse('producer', args=[self.producer.pk]))
+        self.assertFalse([query for query in context if 'product_long_description' in query['sql']])
+
+        admin = UserProfile.objects.create_user(username="spravce", password="heslo", is_staff=True)
+        self.client.force_login(admin)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('manage_products'))
+        self.assertLean(response.context['products'])
+        self.assertFalse([query for query in context if 'product_long_description' in query['sql']])
+
+    def test_cursor_pages_need_no_deferred_loads(self):
+        url = reverse('products', args=[self.category.pk])
+        self.client.get(url, {'after': ''})
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(url, {'after': ''})
+        self.assertFalse([query for query in context if 'product_long_description' in query['sql']])
+
+    def test_benchmark_reports_savings(self):
+        out = StringIO()
+        call_command('benchmark_listings', pages=1, stdout=out)
+        self.assertIn("výpis merchantdise", out.getvalue())
+        self.assertIn("úspora přenosu", out.getvalue())
+
+
+class SubtreeListingTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        # Oblečení (1 produkt) > Trička (2 produkty) > Funkční (2 produkty)
+        self.clothes = Category.objects.create(category_name="Oblečení")
+        shirts = Category.objects.create(category_name="Trička", category_parent=self.clothes)
+        functional = Category.objects.create(category_name="Funkční", category_parent=shirts)
+        for name, price, category in [
+            ("Mikina pánské", 900, self.clothes),
+            ("Tričko dámské", 300, shirts),
+            ("Tričko pánské", 350, shirts),
+            ("Funkční tričko dámské", 500, functional),
+            ("Funkční tílko", 400, functional),
+        ]:
+            Product.objects.create(
+                product_type="merchantdise", product_name=name, product_short_description="Popis",
+                product_long_description="Dlouhý popis", price=price, category=category, producer=None,
+            )
+        self.url = reverse('products', args=[self.clothes.pk])
+
+    def names(self, response):
+        return [product.product_name for product in response.context['products']]
+
+    def test_subtree_lists_all_descendants_with_sort_and_filter(self):
+        self.assertEqual(self.names(self.client.get(self.url)), ["Mikina pánské"])
+
+        response = self.client.get(self.url, {'subtree': '1', 'sort_by': 'price_asc'})
+        self.assertEqual(self.names(response), [
+            "Tričko dámské", "Tričko pánské", "Funkční tílko", "Funkční tričko dámské", "Mikina pánské",
+        ])
+        self.assertContains(response, "sort_by=price_desc&subtree=1")
+
+        response = self.client.get(self.url, {'subtree': '1', 'gender': 'ladies', 'sort_by': 'price_desc'})
+        self.assertEqual(self.names(response), ["Funkční tričko dámské", "Tričko dámské"])
+
+    def test_subtree_count_follows_new_products(self):
+        self.assertEqual(self.client.get(self.url, {'subtree': '1'}).context['products'].paginator.count, 5)
+        Product.objects.create(
+            product_type="merchantdise", product_name="Ponožky", product_short_description="Popis",
+            product_long_description="Dlouhý popis", price=100,
+            category=Category.objects.get(category_name="Funkční"), producer=None,
+        )
+        self.assertEqual(self.client.get(self.url, {'subtree': '1'}).context['products'].paginator.count, 6)
+
+
+class ReviewCursorPaginationTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(category_name="Doplňky")
+        producer = Producer.objects.create(producer_name="Výrobce")
+        self.product = Product.objects.create(
+            product_type="merchantdise",
+            product_name="Protein",
+            product_short_description="Krátký popis",
+            product_long_description="Dlouhý popis",
+            price=500,
+            category=category,
+            producer=producer,
+        )
+        for i in range(7):
+            reviewer = UserProfile.objects.create_user(username=f"user{i}", password="password")
+            ProductReview.objects.create(product=self.product, reviewer=reviewer, rating=5, comment=f"Komentář {i}")
+
+    def test_reviews_cursor_pages_cover_all_reviews(self):
+        url = reverse('product', args=[self.product.pk])
+        first = self.client.get(url, {'after': ''}).context['page_reviews']
+        second = self.client.get(url, {'after': first.next_cursor}).context['page_reviews']
+
+        ids = [review.pk for review in first] + [review.pk for review in second]
+        self.assertEqual(len(ids), 7)
+        self.assertEqual(set(ids), set(self.product.product_reviews.values_list('pk', flat=True)))
+        self.assertEqual(first.paginator.count, 7)
+
+    def test_review_cursor_with_wrong_value_types_falls_back_to_first_page(self):
+        cursor = base64.urlsafe_b64encode(json.dumps(["bad", "x"]).encode()).decode().rstrip('=')
+        response = self.client.get(reverse('product', args=[self.product.pk]), {'after': cursor})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['page_reviews']), 5)
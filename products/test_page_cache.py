@@ -0,0 +1,100 @@
+import re
+
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from accounts.models import UserProfile, TrainersServices
+from products.models import Category, Producer, Product, ProductReview
+from products.page_cache import CSRF_PLACEHOLDER
+
+
+class AnonymousPageCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(category_name="Doplňky")
+        self.producer = Producer.objects.create(producer_name="Výrobce")
+        self.product = Product.objects.create(
+            product_type="merchantdise",
+            product_name="Protein",
+            product_short_description="Popis",
+            product_long_description="Dlouhý popis",
+            price=500,
+            category=category,
+            producer=self.producer,
+            stock_availability=3,
+        )
+        self.service = Product.objects.create(
+            product_type="service",
+            product_name="Osobní trénink",
+            product_short_description="Popis",
+            product_long_description="Dlouhý popis",
+            price=800,
+            category=category,
+            producer=None,
+        )
+        self.trainer = UserProfile.objects.create_user(
+            username="trener", password="password", first_name="Jan", last_name="Novák"
+        )
+        self.trainer.groups.add(Group.objects.get_or_create(name='trainer')[0])
+        self.url = reverse('product', args=[self.product.pk])
+
+    def assert_cached(self, url):
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_second_anonymous_visit_is_served_from_cache(self):
+        self.client.get(self.url)
+        response = self.assert_cached(self.url)
+        self.assertContains(response, "Skladem: 3 kusů")
+        self.assertNotContains(response, CSRF_PLACEHOLDER)
+
+        # Jiná stránka recenzí je jiná položka cache.
+        self.assertIsNotNone(self.client.get(self.url, {'page': 2}).context)
+
+    def test_changes_invalidate_page(self):
+        self.client.get(self.url)
+        self.product.stock_availability = 1
+        self.product.save()
+        self.assertContains(self.client.get(self.url), "Skladem: 1 kusů")
+
+        reviewer = UserProfile.objects.create_user(username="zakaznik", password="password")
+        ProductReview.objects.create(product=self.product, reviewer=reviewer, rating=4, comment="Výborný")
+        self.assertContains(self.client.get(self.url), "Výborný")
+        self.assert_cached(self.url)
+
+        self.producer.producer_name = "Nový výrobce"
+        self.producer.save()
+        self.assertContains(self.client.get(self.url), "Nový výrobce")
+
+    def test_approved_trainer_invalidates_service_and_trainer(self):
+        service_url = reverse('service', args=[self.service.pk])
+        trainer_url = reverse('trainer', args=[self.trainer.pk])
+        self.client.get(service_url)
+        self.client.get(trainer_url)
+
+        TrainersServices.objects.create(
+            trainer=self.trainer, service=self.service, trainers_service_description="Popis", is_approved=True
+        )
+        self.assertContains(self.client.get(service_url), "Jan Novák")
+        self.assertContains(self.client.get(trainer_url), "Osobní trénink")
+
+    def test_logged_in_user_is_not_served_cached_page(self):
+        self.client.get(self.url)
+        self.client.force_login(self.trainer)
+        response = self.client.get(self.url)
+        self.assertIsNotNone(response.context)
+        self.assertContains(response, 'name="comment"')
+
+    def test_cached_page_carries_visitors_csrf_token(self):
+        self.client.get(self.url)
+        visitor = Client(enforce_csrf_checks=True)
+        html = visitor.get(self.url).content.decode()
+        token = re.search(r'name="csrfmiddlewaretoken" value="([^"]+)"', html).group(1)
+
+        response = visitor.post(reverse('add_to_cart', args=[self.product.pk]), {'csrfmiddlewaretoken': token})
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(str(self.product.pk), visitor.session['cart'])
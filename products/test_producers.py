@@ -0,0 +1,63 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from products.models import Category, Producer, Product
+
+
+class ProducerPageTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.acme = Producer.objects.create(producer_name="Acme")
+        Producer.objects.create(producer_name="Činky s.r.o.")
+        Producer.objects.create(producer_name="Bio")
+        self.supplements = Category.objects.create(category_name="Doplňky")
+        self.clothes = Category.objects.create(category_name="Čepice")
+        for name, category in [
+            ("Protein", self.supplements), ("Kreatin", self.supplements), ("Kšiltovka", self.clothes),
+        ]:
+            self.create(name, category)
+        self.url = reverse('producer', args=[self.acme.pk])
+
+    def create(self, name, category):
+        return Product.objects.create(
+            product_type="merchantdise", product_name=name, product_short_description="Popis",
+            product_long_description="Dlouhý popis", price=100, category=category, producer=self.acme,
+        )
+
+    def grouped(self, response):
+        return [
+            (category['category_name'], [product['product_name'] for product in products])
+            for category, products in response.context['grouped_products']
+        ]
+
+    def test_grouped_in_czech_order(self):
+        response = self.client.get(self.url)
+        self.assertEqual(self.grouped(response), [("Čepice", ["Kšiltovka"]), ("Doplňky", ["Kreatin", "Protein"])])
+        self.assertEqual(
+            [producer['producer_name'] for producer in response.context['all_producers']],
+            ["Acme", "Bio", "Činky s.r.o."],
+        )
+        self.assertContains(response, reverse('products', args=[self.clothes.pk]))
+
+    def test_served_from_cache_until_change(self):
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(self.url)
+        self.assertFalse([query for query in context if 'ORDER BY' in query['sql']])
+
+        self.create("Gainer", self.supplements)
+        Producer.objects.create(producer_name="Atlet")
+        response = self.client.get(self.url)
+        self.assertEqual(self.grouped(response)[1], ("Doplňky", ["Gainer", "Kreatin", "Protein"]))
+        self.assertEqual(response.context['all_producers'][1]['producer_name'], "Atlet")
+
+        Product.objects.get(product_name="Kšiltovka").delete()
+        self.assertEqual([name for name, _ in self.grouped(self.client.get(self.url))], ["Doplňky"])
+
+        # Přejmenování kategorie mění verzi webu.
+        self.supplements.category_name = "Výživa"
+        self.supplements.save()
+        self.assertEqual([name for name, _ in self.grouped(self.client.get(self.url))], ["Výživa"])
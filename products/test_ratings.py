@@ -0,0 +1,95 @@
+from io import StringIO
+
+from django.contrib.auth.models import Group
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from accounts.models import UserProfile
+from products.models import Category, Producer, Product, ProductReview, TrainerReview
+from products.page_cache import listing_modified, site_version
+
+
+class RatingSummaryTest(TestCase):
+    def setUp(self):
+        category = Category.objects.create(category_name="Doplňky")
+        producer = Producer.objects.create(producer_name="Výrobce")
+        self.product = Product.objects.create(
+            product_type="merchantdise",
+            product_name="Protein",
+            product_short_description="Popis",
+            product_long_description="Dlouhý popis",
+            price=500,
+            category=category,
+            producer=producer,
+        )
+        self.user = UserProfile.objects.create_user(username="zakaznik", password="password")
+        self.staff = UserProfile.objects.create_user(username="admin", password="password", is_staff=True)
+
+    def summary(self, obj):
+        obj.refresh_from_db()
+        return obj.rating_count, obj.rating_sum, obj.rating_average, obj.rating_histogram()
+
+    def test_review_views_update_summary(self):
+        self.client.force_login(self.user)
+        url = reverse('add_product_review', args=[self.product.pk])
+        self.client.post(url, {'rating': '4', 'comment': "Dobrý"})
+        ProductReview.objects.create(product=self.product, reviewer=self.staff, rating=5)
+        self.assertEqual(self.summary(self.product), (2, 9, 4.5, {1: 0, 2: 0, 3: 0, 4: 1, 5: 1}))
+
+        # update_or_create upraví existující recenzi
+        self.client.post(url, {'rating': '2', 'comment': "Nic moc"})
+        self.assertEqual(self.summary(self.product), (2, 7, 3.5, {1: 0, 2: 1, 3: 0, 4: 0, 5: 1}))
+
+        self.client.force_login(self.staff)
+        review = ProductReview.objects.get(reviewer=self.user)
+        self.client.get(reverse('delete_product_review', args=[review.pk]))
+        self.assertEqual(self.summary(self.product), (1, 5, 5.0, {1: 0, 2: 0, 3: 0, 4: 0, 5: 1}))
+
+        response = self.client.get(reverse('product', args=[self.product.pk]))
+        self.assertEqual(response.context['average_rating'], 5.0)
+
+    def test_trainer_summary_and_reconcile(self):
+        trainer = UserProfile.objects.create_user(username="trener", password="password")
+        trainer.groups.add(Group.objects.get_or_create(name='trainer')[0])
+        review = TrainerReview.objects.create(trainer=trainer, reviewer=self.user, rating=3)
+        TrainerReview.objects.create(trainer=trainer, reviewer=self.staff, rating=None)
+        self.assertEqual(self.summary(trainer)[:3], (1, 3, 3.0))
+
+        review.delete()
+        self.assertEqual(self.summary(trainer)[:3], (0, 0, 0.0))
+
+        # Recenze uložená bez signálů (jako z fixtur) se projeví až po reconcile_ratings.
+        TrainerReview.objects.bulk_create([TrainerReview(trainer=trainer, reviewer=self.user, rating=4)])
+        UserProfile.objects.filter(pk=self.user.pk).update(rating_count=7)
+        call_command('reconcile_ratings', stdout=StringIO())
+        self.assertEqual(self.summary(trainer), (1, 4, 4.0, {1: 0, 2: 0, 3: 0, 4: 1, 5: 0}))
+        self.assertEqual(self.summary(self.user)[0], 0)
+
+    def test_reconcile_invalidates_cached_pages(self):
+        ProductReview.objects.bulk_create([ProductReview(product=self.product, reviewer=self.user, rating=4)])
+        updated_at = Product.objects.get(pk=self.product.pk).updated_at
+        versions = site_version(), listing_modified(self.product.category_id)
+        call_command('reconcile_ratings', stdout=StringIO())
+        self.assertEqual(self.summary(self.product)[:3], (1, 4, 4.0))
+        self.assertGreater(self.product.updated_at, updated_at)
+        self.assertNotEqual((site_version(), listing_modified(self.product.category_id)), versions)
+
+        # Bez opravy se nic nezneplatní.
+        versions = site_version(), listing_modified(self.product.category_id)
+        call_command('reconcile_ratings', stdout=StringIO())
+        self.assertEqual((site_version(), listing_modified(self.product.category_id)), versions)
+
+    def test_rating_outside_range_is_rejected(self):
+        self.client.force_login(self.user)
+        url = reverse('add_product_review', args=[self.product.pk])
+        for rating in ('0', '7', 'abc'):
+            response = self.client.post(url, {'rating': rating, 'comment': "Chyba"}, follow=True)
+            self.assertRedirects(response, reverse('product', args=[self.product.pk]))
+            self.assertContains(response, "Hodnocení musí být celé číslo od 1 do 5.")
+        self.assertFalse(ProductReview.objects.exists())
+        self.assertEqual(self.summary(self.product), (0, 0, 0.0, {1: 0, 2: 0, 3: 0, 4: 0, 5: 0}))
+
+        # Hodnocení mimo rozsah uložené mimo formulář se do souhrnu nepromítne.
+        ProductReview.objects.create(product=self.product, reviewer=self.staff, rating=9)
+        self.assertEqual(self.summary(self.product)[:3], (0, 0, 0.0))
@@ -0,0 +1,114 @@
+import os
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth.models import Group
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils.crypto import get_random_string
+
+from accounts.models import TrainersServices, UserProfile
+from products.catalog_index import catalog_index
+from products.models import Category, Producer, Product
+from products.snapshot import CURRENT_FILE, CatalogSnapshot, SnapshotError, current_snapshot, publish_snapshot
+from viewer.search import search_cache, search_catalog
+
+
+class CatalogSnapshotTest(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        settings_override = override_settings(CATALOG_SNAPSHOT_DIR=self.directory)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        catalog_index.reset()
+        search_cache.clear()
+
+        self.category = Category.objects.create(category_name="Doplňky")
+        self.producer = Producer.objects.create(producer_name="Acme")
+        for name, price, stock in [("Syrovátkový protein", 900, 5), ("Kreatin", 400, 0), ("Tyčinka", 50, 10)]:
+            self.create(name, price, stock)
+        trainer = UserProfile.objects.create_user(
+            username="trener", password="heslo", first_name="Jan", last_name="Novák"
+        )
+        trainer.groups.add(Group.objects.get_or_create(name='trainer')[0])
+        service = self.create("Osobní trénink", 500, 0, product_type='service')
+        TrainersServices.objects.create(
+            trainer=trainer, service=service, trainers_service_description="Popis", is_approved=True
+        )
+        self.url = reverse('products', args=[self.category.pk])
+
+    def create(self, name, price, stock, product_type='merchantdise'):
+        return Product.objects.create(
+            product_type=product_type, product_name=name, product_short_description="Proteinový doplněk",
+            product_long_description="Dlouhý popis", price=price, category=self.category,
+            producer=self.producer if product_type == 'merchantdise' else None, stock_availability=stock,
+        )
+
+    def listing(self, **params):
+        response = self.client.get(self.url, params)
+        return [product.product_name for product in response.context['products']]
+
+    def test_snapshot_contents(self):
+        path, version = publish_snapshot(self.directory)
+        snapshot = CatalogSnapshot(path)
+        self.assertEqual(snapshot.version, version)
+        self.assertEqual(list(snapshot.product_names), ["Kreatin", "Osobní trénink", "Syrovátkový protein", "Tyčinka"])
+        self.assertEqual(snapshot.producers(), [(self.producer.pk, "Acme")])
+        self.assertEqual(snapshot.categories(), [(self.category.pk, None, "Doplňky")])
+        self.assertIn("protein", snapshot.tokens)
+
+    def test_listing_reads_published_snapshot(self):
+        call_command('publish_catalog_snapshot', stdout=StringIO())
+        self.assertEqual(self.listing(sort_by='price_asc'), ["Tyčinka", "Kreatin", "Syrovátkový protein"])
+        self.assertEqual(self.listing(in_stock='1'), ["Syrovátkový protein", "Tyčinka"])
+        # Proces si vlastní index nestavěl.
+        self.assertIsNone(catalog_index.arrays)
+
+        # Snímek se nemění, dokud se nezveřejní nová verze; pak se na ni workery přepnou.
+        Product.objects.filter(product_name="Kreatin").update(stock_availability=3)
+        self.assertEqual(self.listing(in_stock='1'), ["Syrovátkový protein", "Tyčinka"])
+        old = current_snapshot()
+        publish_snapshot(self.directory)
+        self.assertNotEqual(current_snapshot().version, old.version)
+        self.assertEqual(self.listing(in_stock='1'), ["Kreatin", "Syrovátkový protein", "Tyčinka"])
+
+    @override_settings(SEARCH_BACKEND='snapshot', SEARCH_FUZZY_THRESHOLD=None)
+    def test_search_matches_index(self):
+        # Snímek hledá jen podle prefixů (bez překlepů); dokud není zveřejněný, hledá se ve vlastním indexu.
+        before = search_catalog("protein")
+        publish_snapshot(self.directory)
+        for query in ("protein", "PROT dopl", "novak", "trenink", "xyz", ""):
+            for limit in (None, 1):
+                with override_settings(SEARCH_BACKEND='index'):
+                    expected = search_catalog(query, limit=limit)
+                self.assertEqual(search_catalog(query, limit=limit), expected, (query, limit))
+        self.assertEqual(search_catalog("protein"), before)
+        self.assertEqual(search_catalog("doplnek", limit=1)['products'][0]['name'], "Kreatin")
+
+    def test_publishing_changes_listing_validators(self):
+        publish_snapshot(self.directory)
+        self.client.cookies[settings.CSRF_COOKIE_NAME] = get_random_string(32)
+        response = self.client.get(self.url)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        Product.objects.filter(product_name="Kreatin").update(stock_availability=3)
+        publish_snapshot(self.directory)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    def test_old_versions_are_pruned(self):
+        for _ in range(3):
+            publish_snapshot(self.directory, keep=2)
+        files = sorted(os.listdir(self.directory))
+        self.assertEqual(len([name for name in files if name.endswith('.snapshot')]), 2)
+        with open(os.path.join(self.directory, CURRENT_FILE)) as file:
+            self.assertEqual(file.read(), [name for name in files if name.endswith('.snapshot')][-1])
+
+    def test_invalid_file_is_rejected(self):
+        path = os.path.join(self.directory, 'broken.snapshot')
+        with open(path, 'wb') as file:
+            file.write(b'\0' * 64)
+        with self.assertRaises(SnapshotError):
+            CatalogSnapshot(path)
@@ -0,0 +1,36 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from accounts.models import UserProfile
+from products.models import Category, Producer
+
+import czech_sort
+
+
+class SortKeyTest(TestCase):
+    names = ["Řemínky", "Chrániče", "Hrazdy", "Činky", "Cyklistika", "Zátěž", "Ábry"]
+
+    def test_categories_ordered_by_stored_key(self):
+        for name in self.names:
+            Category.objects.create(category_name=name)
+
+        ordered = list(Category.objects.order_by('category_sort_key').values_list('category_name', flat=True))
+        self.assertEqual(ordered, czech_sort.sorted(self.names))
+
+    def test_trainer_full_name_key(self):
+        UserProfile.objects.create_user(username="a", password="password", first_name="Šárka", last_name="Malá")
+        UserProfile.objects.create_user(username="b", password="password", first_name="Sára", last_name="Nová")
+
+        ordered = [user.full_name() for user in UserProfile.objects.order_by('full_name_sort_key')]
+        self.assertEqual(ordered, ["Sára Nová", "Šárka Malá"])
+
+    def test_backfill_repairs_keys(self):
+        producer = Producer.objects.create(producer_name="Činky s.r.o.")
+        Producer.objects.filter(pk=producer.pk).update(producer_sort_key=b'')
+
+        call_command('backfill_sort_keys', stdout=StringIO())
+
+        producer.refresh_from_db()
+        self.assertEqual(bytes(producer.producer_sort_key), czech_sort.bytes_key("Činky s.r.o."))
@@ -1,31 +1,36 @@
-from itertools import groupby
-from operator import attrgetter
-
-from django import template
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
-from django.db import connection
-from django.db.models import Q, Avg
 
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.models import Group
 from django.urls import reverse
 
 from products.models import Category, Producer, Product, TrainerReview, ProductReview
+from products.attributes import attribute_counts
+from products.catalog_index import catalog_index, use_index
+from products.facets import apply_filters, facet_options, filter_query, get_facets, parse_filters
+from products.hierarchy import ancestors, subtree_ids, with_products
+from products.listing import listing_queryset
+from products.producers import producer_directory, producer_products
+from products.pagination import paginate
+from products.ratings import invalid_rating
+from products.detail import load_detail
+from products.page_cache import cache_anonymous_page, listing_modified
+from products.conditional import conditional_page, listing_state, producer_state, product_detail_state, \
+    trainer_detail_state
 from accounts.models import UserProfile, TrainersServices
 
-import czech_sort
-
 
+@conditional_page(listing_state('merchantdise'))
 def products(request, pk=None):
     # Getting parameters from URL.
     sort_by = request.GET.get('sort_by', 'name')
     gender_filter = request.GET.get('gender', None)
-    page_number = request.GET.get('page', 1)
+    # Products of all subcategories too (?subtree=1).
+    subtree = request.GET.get('subtree') == '1'
 
     # Input validation.
-    valid_sort_by = ['name', 'price_asc', 'price_desc']
+    valid_sort_by = ['name', 'price_asc', 'price_desc', 'rating']
     if sort_by not in valid_sort_by:
         sort_by = 'name'
     valid_gender_filter = ['ladies', 'gentlemans', None]
@@ -33,18 +38,11 @@ def products(request, pk=None):
         gender_filter = None
 
     if pk is None:
-        # Main categories with merchantdise product type products filter.
-        main_categories = Category.objects.filter(
-            category_parent=None
-        ).filter(
-            Q(categories__product_type='merchantdise') | Q(subcategories__categories__product_type='merchantdise')
-        ).distinct()
-
-        # Czech sort for main categories
-        main_categories = sorted(
-            main_categories,
-            key=lambda category: czech_sort.key(category.category_name)
-        )
+        # Main categories with merchantdise products anywhere in their subtree (closure table).
+        # Czech sort for main categories (stored collation key).
+        main_categories = with_products(
+            Category.objects.filter(category_parent=None), 'merchantdise'
+        ).order_by('category_sort_key')
 
         context = {
             'main_categories': main_categories,
@@ -58,90 +56,106 @@ def products(request, pk=None):
 
     else:
         # Getting current category by primary key or return 404.
-        category = get_object_or_404(Category, pk=pk)
-
-        # Subcategories with merchantdise product type products filter.
-        subcategories = category.subcategories.filter(
-            Q(categories__product_type='merchantdise') | Q(subcategories__categories__product_type='merchantdise')
-        ).distinct()
-
-        # Czech sort for subcategories
-        subcategories = sorted(
-            subcategories,
-            key=lambda subcategory: czech_sort.key(subcategory.category_name)
-        )
-
-        # Filtering products by category.
-        products_list = Product.objects.filter(
-            category=category,
-            product_type='merchantdise'
-        ).select_related('category')
-
-        # Checking the availability of filtering by gender.
+        category = get_object_or_404(Category.objects.select_related('category_parent'), pk=pk)
+
+        # Subcategories with merchantdise products anywhere in their subtree.
+        # Czech sort for subcategories (stored collation key).
+        subcategories = with_products(category.subcategories.all(), 'merchantdise').order_by('category_sort_key')
+
+        # Filtering products by category, or by the whole subtree in the "show all" mode
+        # (one query through the closure table, at any depth).
+        if use_index(request):
+            # In-memory catalog index: filtering, sorting and counts without touching the products table,
+            # only the rows of the displayed page are loaded.
+            category_ids = subtree_ids(category.pk).values_list('descendant_id', flat=True) if subtree else [category.pk]
+            products_list = catalog_index.select('merchantdise', category_ids)
+        elif subtree:
+            products_list = listing_queryset(Product.objects.filter(
+                category_id__in=subtree_ids(category.pk),
+                product_type='merchantdise'
+            ))
+        else:
+            # Only the listing columns (no long description).
+            products_list = listing_queryset(Product.objects.filter(
+                category=category,
+                product_type='merchantdise'
+            ))
+
+        # Facets (price, producer, stock, rating): counts for the whole listing from one grouped
+        # query, cached per category; the selected filters narrow the listing below.
+        filters = parse_filters(request)
+        facets = get_facets(products_list, f'merchantdise:{category.pk}:{int(subtree)}')
+
+        # Checking the availability of filtering by gender (indexed attribute, one grouped query).
+        gender_counts = attribute_counts(products_list, 'gender')
         gender_availability = {
-            'ladies': products_list.filter(product_name__icontains='dámské').exists(),
-            'gentlemans': products_list.filter(product_name__icontains='pánské').exists(),
+            'ladies': gender_counts.get('ladies', 0) > 0,
+            'gentlemans': gender_counts.get('gentlemans', 0) > 0,
         }
 
         # Dynamic filtering by gender for products from the sportswear main category.
-        if gender_filter == 'ladies':
-            products_list = products_list.filter(product_name__icontains='dámské')
-        elif gender_filter == 'gentlemans':
-            products_list = products_list.filter(product_name__icontains='pánské')
+        if gender_filter is not None:
+            products_list = products_list.filter(gender=gender_filter)
+        products_list = apply_filters(products_list, filters)
 
-        # Products sorting.
+        # Products sorting (Czech sort by stored collation key, pk keeps pages stable).
         if sort_by == 'price_asc':
-            products_list = products_list.order_by('price')
+            ordering = ['price', 'pk']
         elif sort_by == 'price_desc':
-            products_list = products_list.order_by('-price')
+            ordering = ['-price', 'pk']
+        elif sort_by == 'rating':
+            ordering = ['-rating_average', 'pk']
         else:
-            products_list = list(products_list)  # Convert queryset to list for Czech sorting
-            products_list = sorted(
-                products_list,
-                key=lambda product: czech_sort.key(product.product_name)
+            ordering = ['product_sort_key', 'pk']
+
+        # Pagination (numbered pages, or keyset pages with ?after=).
+        # Cached counts are keyed by the listing change times of the category (and its subtree),
+        # which change whenever a product there is added, removed, moved or edited.
+        count_version = ':'.join(map(str, listing_modified(category.pk)))
+        if subtree:
+            page_obj = paginate(
+                request, products_list, 10, ordering,
+                count_cache_key=(
+                    f'products:count:subtree:{category.pk}:{gender_filter}:{filter_query(filters)}:{count_version}'
+                ),
+                cache_count=True
+            )
+        else:
+            page_obj = paginate(
+                request, products_list, 10, ordering,    # 10 products per 1 page
+                count_cache_key=(
+                    f'products:count:{category.pk}:{gender_filter}:{filter_query(filters)}:{count_version}'
+                )
             )
-
-        # Pagination.
-        paginator = Paginator(products_list, 10)    # 10 products per 1 page
-        page_obj = paginator.get_page(page_number)
 
         context = {
             'main_categories': None,
             'category': category,
+            # Breadcrumbs from the main category down, one query at any depth.
+            'category_ancestors': list(ancestors(category)),
             'subcategories': subcategories,
             'products': page_obj,
             'sort_by': sort_by,
             'gender_filter': gender_filter,
             'gender_availability': gender_availability,
+            'subtree': subtree,
+            'facets': facet_options(
+                facets, filters, {'sort_by': sort_by, 'gender': gender_filter, 'subtree': '1' if subtree else None}
+            ),
+            'facet_query': filter_query(filters),
         }
 
     return render(request, 'products.html', context)
 
 
+@conditional_page(product_detail_state('product'))
+@cache_anonymous_page('product')
 def product(request, pk):
-    product_detail = get_object_or_404(Product, pk=pk)
+    detail = load_detail(request, 'product', pk)
+    product_detail = detail['object']
 
     stock = product_detail.available_stock()
 
-    print(f"DEBUG: Product ID {product_detail.id}, Stock Availability: {stock}")
-
-    reviews = ProductReview.objects.filter(product=product_detail)
-    average_rating = reviews.aggregate(Avg('rating'))['rating__avg']
-    rounded_rating = round(average_rating * 2) / 2 if average_rating else 0
-
-    star_states = []
-    for i in range(1, 6):
-        if i <= rounded_rating:
-            star_states.append("filled")
-        elif i - 0.5 == rounded_rating:
-            star_states.append("half-filled")
-        else:
-            star_states.append("empty")
-
-    paginator = Paginator(reviews, 5)
-    page_number = request.GET.get('page')
-    page_reviews = paginator.get_page(page_number)
-
     if stock > 0:
         stock_message = f"Skladem: {stock} kusů"
         can_add_to_cart = True
@@ -154,38 +168,20 @@ def product(request, pk):
         'available_stock': stock,
         'stock_message': stock_message,
         'can_add_to_cart': can_add_to_cart,
-        'average_rating': rounded_rating,
-        'star_states': star_states,
-        'page_reviews': page_reviews,
+        'average_rating': detail['average_rating'],
+        'star_states': detail['star_states'],
+        'page_reviews': detail['page_reviews'],
     }
     return render(request, "product.html", context)
 
+@conditional_page(producer_state)
 def producer(request, pk):
     producer_detail = get_object_or_404(Producer, id=pk)
 
-    # Seřazení produktů podle kategorie a následně podle názvu produktu
-    products = Product.objects.filter(producer=producer_detail).select_related('category')
-
-    # Czech sort for categories and products
-    products = sorted(
-        products,
-        key=lambda product: (
-            czech_sort.key(product.category.category_name) if product.category else "",
-            czech_sort.key(product.product_name)
-        )
-    )
-
-    # Skupinové seskupení produktů podle kategorií
-    grouped_products = {}
-    for category, items in groupby(products, key=attrgetter('category')):
-        grouped_products[category] = list(items)
-
-    # Získání všech výrobců pro seznam a odstranění mezer z názvů
-    all_producers = Producer.objects.all()
-    all_producers = sorted(
-        all_producers,
-        key=lambda producer: czech_sort.key(producer.producer_name.strip())
-    )
+    # Produkty seskupené podle kategorií a seznam všech výrobců jako hotové struktury z cache
+    # (při prázdné cache řazení i seskupení jedním dotazem v SQL).
+    grouped_products = producer_products(producer_detail.pk)
+    all_producers = producer_directory()
 
     context = {
         'producer': producer_detail,
@@ -195,23 +191,21 @@ def producer(request, pk):
     return render(request, 'producer.html', context)
 
 
+@conditional_page(listing_state('service'))
 def services(request, pk=None):
     # Getting parameters from URL.
     sort_by = request.GET.get('sort_by', 'name')
-    page_number = request.GET.get('page', 1)
 
     # Input validation.
-    valid_sort_by = ['name', 'price_asc', 'price_desc']
+    valid_sort_by = ['name', 'price_asc', 'price_desc', 'rating']
     if sort_by not in valid_sort_by:
         sort_by = 'name'
 
     if pk is None:
-        # Main categories with service product type filter.
-        main_categories = Category.objects.filter(
-            category_parent=None
-        ).filter(
-            Q(categories__product_type='service') | Q(subcategories__categories__product_type='service')
-        ).distinct()
+        # Main categories with services anywhere in their subtree (closure table).
+        main_categories = with_products(
+            Category.objects.filter(category_parent=None), 'service'
+        ).order_by('category_sort_key')
 
         context = {
             'main_categories': main_categories,
@@ -222,30 +216,41 @@ def services(request, pk=None):
         }
     else:
         # Getting current category by primary key or return 404.
-        category = get_object_or_404(Category, pk=pk)
+        category = get_object_or_404(Category.objects.select_related('category_parent'), pk=pk)
 
-        # Subcategories with service product type filter.
-        subcategories = category.subcategories.filter(
-            Q(categories__product_type='service') | Q(subcategories__categories__product_type='service')
-        ).distinct()
+        # Subcategories with services anywhere in their subtree.
+        subcategories = with_products(category.subcategories.all(), 'service').order_by('category_sort_key')
+
+        # Filtering services by category (from the in-memory catalog index when enabled).
+        if use_index(request):
+            services_list = catalog_index.select('service', [category.pk])
+        else:
+            services_list = listing_queryset(Product.objects.filter(
+                category=category,
+                product_type='service'
+            ))
 
-        # Filtering services by category.
-        services_list = Product.objects.filter(
-            category=category,
-            product_type='service'
-        ).select_related('category')
+        # Facets (price, rating) from one cached grouped query, then the selected filters.
+        filters = parse_filters(request)
+        facets = get_facets(services_list, f'service:{category.pk}')
+        services_list = apply_filters(services_list, filters)
 
         # Services sorting.
         if sort_by == 'price_asc':
-            services_list = services_list.order_by('price')
+            ordering = ['price', 'pk']
         elif sort_by == 'price_desc':
-            services_list = services_list.order_by('-price')
+            ordering = ['-price', 'pk']
+        elif sort_by == 'rating':
+            ordering = ['-rating_average', 'pk']
         else:
-            services_list = services_list.order_by('product_name')
+            ordering = ['product_sort_key', 'pk']
 
-        # Pagination.
-        paginator = Paginator(services_list, 10)    # 10 services per 1 page
-        page_obj = paginator.get_page(page_number)
+        # Pagination (cached counts follow the listing change times, as for products).
+        count_version = ':'.join(map(str, listing_modified(category.pk)))
+        page_obj = paginate(
+            request, services_list, 10, ordering,    # 10 services per 1 page
+            count_cache_key=f'services:count:{category.pk}:{filter_query(filters)}:{count_version}'
+        )
 
         # Creating a map of approved trainers services for quick lookup.
         approved_trainers_map = {
@@ -262,45 +267,35 @@ def services(request, pk=None):
         context = {
             'main_categories': None,
             'category': category,
+            # Breadcrumbs from the main category down, one query at any depth.
+            'category_ancestors': list(ancestors(category)),
             'subcategories': subcategories,
             'services': page_obj,
             'sort_by': sort_by,
+            'facets': facet_options(facets, filters, {'sort_by': sort_by}, physical=False),
+            'facet_query': filter_query(filters),
         }
 
     return render(request, 'services.html', context)
 
 
+@conditional_page(product_detail_state('service'))
+@cache_anonymous_page('service')
 def service(request, pk):
-    service_detail = get_object_or_404(Product, pk=pk, product_type='service')
+    detail = load_detail(request, 'service', pk)
+    service_detail = detail['object']
 
     approved_trainers_services = TrainersServices.objects.filter(
         service=service_detail,
         is_approved=True
     ).select_related('trainer')
 
-    reviews = ProductReview.objects.filter(product=service_detail)
-    average_rating = reviews.aggregate(Avg('rating'))['rating__avg']
-    rounded_rating = round(average_rating * 2) / 2 if average_rating else 0
-
-    star_states = []
-    for i in range(1, 6):
-        if i <= rounded_rating:
-            star_states.append("filled")
-        elif i - 0.5 == rounded_rating:
-            star_states.append("half-filled")
-        else:
-            star_states.append("empty")
-
-    paginator = Paginator(reviews, 5)
-    page_number = request.GET.get('page')
-    page_reviews = paginator.get_page(page_number)
-
     context = {
         'service': service_detail,
         'approved_trainers_services': approved_trainers_services,
-        'average_rating': rounded_rating,
-        'star_states': star_states,
-        'page_reviews': page_reviews,
+        'average_rating': detail['average_rating'],
+        'star_states': detail['star_states'],
+        'page_reviews': detail['page_reviews'],
         'user': request.user,
     }
     return render(request, "service.html", context)
@@ -310,51 +305,32 @@ def trainers(request):
     trainer_group = Group.objects.filter(name='trainer').first()
     if trainer_group:
         # Načtení schválených trenérů (s alespoň jednou schválenou službou)
+        # Řazení trenérů podle české abecedy pomocí uloženého řadicího klíče
         approved_trainers = UserProfile.objects.filter(
             groups=trainer_group,
             services__is_approved=True
-        ).distinct()
-
-        # Řazení trenérů podle české abecedy pomocí czech_sort
-        approved_trainers = sorted(
-            approved_trainers,
-            key=lambda trainer: czech_sort.key(trainer.full_name())
-        )
+        ).distinct().order_by('full_name_sort_key')
     else:
         approved_trainers = []  # Pokud skupina neexistuje, seznam bude prázdný
 
     return render(request, 'trainers.html', {'approved_trainers': approved_trainers})
 
+@conditional_page(trainer_detail_state)
+@cache_anonymous_page('trainer')
 def trainer(request, pk):
-    trainer_detail = get_object_or_404(UserProfile, id=pk)
+    detail = load_detail(request, 'trainer', pk)
+    trainer_detail = detail['object']
 
     approved_services = TrainersServices.objects.filter(
         trainer=trainer_detail, is_approved=True
     ).select_related('service')
 
-    reviews = TrainerReview.objects.filter(trainer=trainer_detail)
-    average_rating = reviews.aggregate(Avg('rating'))['rating__avg']
-    rounded_rating = round(average_rating * 2) / 2 if average_rating else 0
-
-    star_states = []
-    for i in range(1, 6):
-        if i <= rounded_rating:
-            star_states.append("filled")
-        elif i - 0.5 == rounded_rating:
-            star_states.append("half-filled")
-        else:
-            star_states.append("empty")
-
-    paginator = Paginator(reviews, 5)
-    page_number = request.GET.get('page')
-    page_reviews = paginator.get_page(page_number)
-
     context = {
         'trainer': trainer_detail,
         'approved_services': approved_services,
-        'average_rating': rounded_rating,
-        'star_states': star_states,
-        'page_reviews': page_reviews,
+        'average_rating': detail['average_rating'],
+        'star_states': detail['star_states'],
+        'page_reviews': detail['page_reviews'],
     }
     return render(request, "trainer.html", context)
 
@@ -364,6 +340,9 @@ def add_trainer_review(request, pk):
     if request.method == "POST":
         rating = request.POST.get('rating')
         comment = request.POST.get('comment')
+        if invalid_rating(rating):
+            messages.error(request, "Hodnocení musí být celé číslo od 1 do 5.")
+            return redirect(reverse('trainer', args=[pk]))
 
         review, created = TrainerReview.objects.update_or_create(
             trainer=trainer,
@@ -386,6 +365,9 @@ def add_product_review(request, pk):
     if request.method == "POST":
         rating = request.POST.get('rating')
         comment = request.POST.get('comment')
+        if invalid_rating(rating):
+            messages.error(request, "Hodnocení musí být celé číslo od 1 do 5.")
+            return redirect(reverse('product', args=[pk]))
 
         review, created = ProductReview.objects.update_or_create(
             product=product,
@@ -410,6 +392,9 @@ def add_service_review(request, pk):
         rating = request.POST.get('rating')
         comment = request.POST.get('comment')
         trainer_id = request.POST.get('trainer')
+        if invalid_rating(rating):
+            messages.error(request, "Hodnocení musí být celé číslo od 1 do 5.")
+            return redirect(reverse('service', args=[pk]))
 
         trainer = get_object_or_404(UserProfile, pk=trainer_id, groups__name='trainer')
 
@@ -433,7 +418,3 @@ def add_service_review(request, pk):
             messages.info(request, "Vaše hodnocení bylo aktualizováno.")
 
         return redirect(reverse('service', args=[pk]))
-
-def calculate_average_rating(queryset):
-    average_rating = queryset.aggregate(Avg('rating'))['rating__avg']
-    return round(average_rating, 1) if average_rating else 0
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ViewerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'viewer'
+
+    def ready(self):
+        import viewer.signals  # noqa: F401
@@ -0,0 +1,165 @@
+"""
+Data z externích služeb pro domovskou stránku (počasí).
+
+Odpovědi se drží v cache způsobem stale-while-revalidate: po dobu platnosti se vrací
+z cache, po jejím vypršení se ještě vrací stará hodnota a na pozadí se načte nová.
+Požadavky jdou přes sdíleného klienta (viewer/http_client.py) s timeouty a jističem,
+při výpadku služby se zobrazí náhradní hodnota.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from urllib.parse import quote
+
+from django.core.cache import cache
+from django.utils.text import slugify
+
+from viewer.http_client import ExternalServiceError, get_client
+
+logger = logging.getLogger(__name__)
+
+# Jak dlouho se nezdařené načtení nezkouší znovu synchronně (sekundy).
+FAILURE_TTL = 60
+# Zámek, aby stejnou hodnotu na pozadí neobnovovalo více požadavků najednou.
+REFRESH_LOCK_TIMEOUT = 30
+# Nejdelší čekání na všechna data pro domovskou stránku (sekundy).
+HOME_DEADLINE = 3
+# Počet vláken pro souběžné dotazy (sdílená všemi požadavky workeru).
+MAX_WORKERS = 8
+
+
+class StaleWhileRevalidate:
+    """
+    Cache hodnot z externí služby.
+
+    `fresh_for` - jak dlouho je hodnota aktuální, `keep_for` - jak dlouho se smí vracet
+    zastaralá hodnota, než se musí načíst znovu. `fetch` vrací hodnotu nebo None při chybě.
+    """
+
+    def __init__(self, prefix, fresh_for, keep_for, fallback=None):
+        self.prefix = prefix
+        self.fresh_for = fresh_for
+        self.keep_for = keep_for
+        self.fallback = fallback
+
+    def _cache_key(self, key):
+        return f'external:{self.prefix}:{key}'
+
+    def _store(self, key, value, fresh_for=None):
+        # Chyba se uloží jako None na krátkou dobu, aby se nedostupná služba nevolala při každém požadavku.
+        if fresh_for is None:
+            fresh_for = self.fresh_for if value is not None else FAILURE_TTL
+        cache.set(self._cache_key(key), (value, time.time() + fresh_for), self.keep_for)
+
+    def get(self, key, fetch):
+        entry = cache.get(self._cache_key(key))
+        if entry is None:
+            value = fetch()
+            self._store(key, value)
+        else:
+            value, fresh_until = entry
+            if time.time() >= fresh_until:
+                self._revalidate(key, fetch)
+        return self.fallback if value is None else value
+
+    def _revalidate(self, key, fetch):
+        lock_key = self._cache_key(key) + ':refresh'
+        if not cache.add(lock_key, True, REFRESH_LOCK_TIMEOUT):
+            return
+        threading.Thread(target=self._refresh, args=(key, fetch, lock_key), daemon=True).start()
+
+    def _refresh(self, key, fetch, lock_key):
+        try:
+            value = fetch()
+            entry = cache.get(self._cache_key(key))
+            if value is None and entry is not None and entry[0] is not None:
+                # Při výpadku zůstává v cache poslední známá hodnota, obnova se zkusí znovu za FAILURE_TTL.
+                self._store(key, entry[0], FAILURE_TTL)
+            else:
+                self._store(key, value)
+        finally:
+            cache.delete(lock_key)
+
+
+executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='external')
+
+
+def run_concurrently(calls, deadline):
+    """
+    Spustí volání [(funkce, *argumenty), ...] souběžně a vrátí jejich výsledky ve stejném pořadí.
+
+    Volání, které do `deadline` sekund neskončí (nebo skončí výjimkou), má výsledek None;
+    doběhne na pozadí a jeho výsledek se uloží do cache pro další požadavky.
+    """
+    futures = [executor.submit(*call) for call in calls]
+    wait(futures, timeout=deadline)
+    results = []
+    for future in futures:
+        if future.done() and future.exception() is None:
+            results.append(future.result())
+        else:
+            if future.done():
+                logger.error(f"Chyba při načítání externích dat: {future.exception()}")
+            results.append(None)
+    return results
+
+
+weather_reports = StaleWhileRevalidate('weather', fresh_for=10 * 60, keep_for=6 * 60 * 60)
+
+
+def translate_weather_description(description):
+    translations = {
+        "Sunny": "slunečno",
+        "Cloudy": "zataženo",
+        "Partly cloudy": "částečně zataženo",
+        "Mist": "mlha",
+        "Rain": "déšť",
+        "Snow": "sníh",
+        "Thunderstorm": "bouřka",
+        "Fog": "mlha",
+        "Clear": "jasno",
+        "Overcast": "převážně zataženo",
+        "Light rain": "slabý déšť",
+        "Heavy rain": "silný déšť",
+        "Light snow": "slabé sněžení",
+        "Heavy snow": "silné sněžení",
+        "Showers": "přeháňky",
+        "Drizzle": "mrholení",
+        "Light drizzle": "slabé mrholení",
+        "Heavy drizzle": "silné mrholení",
+        "Hail": "kroupy",
+        "Sleet": "déšť se sněhem",
+        "Blizzard": "vánice",
+        "Freezing rain": "mrznoucí déšť",
+        "Windy": "větrno",
+        "Breezy": "mírný vítr",
+        "Gale": "bouřlivý vítr",
+        "Hurricane": "hurikán",
+        "Tornado": "tornádo",
+    }
+    return translations.get(description, description)
+
+
+def fetch_weather(city):
+    try:
+        data = get_client('weather').get_json(f"/{quote(city)}", params={'format': 'j1'})
+        current_condition = data['current_condition'][0]
+        return {
+            'city': city,
+            'temperature': current_condition['temp_C'],
+            'description': translate_weather_description(current_condition['weatherDesc'][0]['value']),
+            'humidity': current_condition['humidity'],
+        }
+    except (ExternalServiceError, LookupError, TypeError) as e:
+        logger.warning(f"Chyba při získávání počasí: {e}")
+    return None
+
+
+def get_weather(city):
+    """Počasí pro město (cache podle normalizovaného názvu), None pokud není dostupné."""
+    weather = weather_reports.get(slugify(city), lambda: fetch_weather(city))
+    if weather is None:
+        return None
+    return {**weather, 'city': city}
+
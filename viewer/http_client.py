@@ -0,0 +1,159 @@
+"""
+Sdílený klient pro odchozí HTTP požadavky na externí služby (settings.EXTERNAL_SERVICES).
+
+Každá služba má vlastní adresu, timeout a počet opakování s prodlevou. Spojení se drží
+ve sdíleném requests.Session. Po opakovaných chybách jistič (circuit breaker) službu
+na chvíli přestane volat. S settings.EXTERNAL_STUB = True se místo sítě vrací data
+ze souborů ve viewer/stubs/ (např. pro zátěžové testy bez přístupu k internetu).
+"""
+import threading
+import time
+from pathlib import Path
+
+import requests
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from requests.adapters import BaseAdapter, HTTPAdapter
+from urllib3.util.retry import Retry
+
+STUBS_DIR = Path(__file__).resolve().parent / 'stubs'
+
+# Hodnoty pro klíče, které služba v settings.EXTERNAL_SERVICES neuvádí.
+DEFAULTS = {
+    'timeout': (2, 3),          # (připojení, čtení) v sekundách
+    'retries': 1,
+    'backoff': 0.5,             # prodleva mezi opakováními: backoff * 2 ** (pokus - 1)
+    'failure_threshold': 3,     # počet chyb za sebou, po kterém se jistič rozpojí
+    'cooldown': 60,             # jak dlouho se rozpojená služba nevolá (sekundy)
+    'pool_size': 10,
+}
+
+
+class ExternalServiceError(Exception):
+    pass
+
+
+class CircuitOpenError(ExternalServiceError):
+    pass
+
+
+class CircuitBreaker:
+    """
+    Po `threshold` chybách za sebou se rozpojí; po uplynutí `cooldown` sekund propustí
+    jediné zkušební volání (ostatní dál odmítá). Úspěch jistič spojí, chyba ho znovu rozpojí.
+    """
+
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.lock = threading.Lock()
+        self.failures = 0
+        self.opened_at = None
+        self.probe_started = None
+
+    def allow(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            now = time.monotonic()
+            if self.probe_started is not None:
+                # Zkušební volání už běží; pokud se výsledku nedočkalo, může to zkusit další.
+                if now - self.probe_started < self.cooldown:
+                    return False
+            elif now - self.opened_at < self.cooldown:
+                return False
+            self.probe_started = now
+            return True
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probe_started = None
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.probe_started is not None or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+                self.probe_started = None
+
+
+class StubAdapter(BaseAdapter):
+    """Transport, který na každý požadavek odpoví obsahem viewer/stubs/<služba>.json."""
+
+    def __init__(self, service):
+        super().__init__()
+        self.service = service
+
+    def send(self, request, **kwargs):
+        delay = getattr(settings, 'EXTERNAL_STUB_DELAY', 0)
+        if delay:
+            time.sleep(delay)
+        response = requests.Response()
+        response.status_code = 200
+        response._content = (STUBS_DIR / f'{self.service}.json').read_bytes()
+        response.headers['Content-Type'] = 'application/json'
+        response.encoding = 'utf-8'
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+class ServiceClient:
+    def __init__(self, name, config):
+        self.name = name
+        self.config = {**DEFAULTS, **config}
+        self.base_url = self.config['base_url'].rstrip('/')
+        self.breaker = CircuitBreaker(self.config['failure_threshold'], self.config['cooldown'])
+
+        self.session = requests.Session()
+        if getattr(settings, 'EXTERNAL_STUB', False):
+            adapter = StubAdapter(name)
+        else:
+            retry = Retry(
+                total=self.config['retries'],
+                backoff_factor=self.config['backoff'],
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=('GET',),
+            )
+            size = self.config['pool_size']
+            adapter = HTTPAdapter(pool_connections=size, pool_maxsize=size, max_retries=retry)
+        self.session.mount(self.base_url, adapter)
+
+    def get_json(self, path, params=None):
+        """GET na `base_url + path`, vrací dekódovaný JSON nebo vyvolá ExternalServiceError."""
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"Služba {self.name} je dočasně vypnutá po opakovaných chybách.")
+        try:
+            response = self.session.get(f"{self.base_url}{path}", params=params, timeout=self.config['timeout'])
+            response.raise_for_status()
+            data = response.json()
+        except (requests.RequestException, ValueError) as e:
+            self.breaker.record_failure()
+            raise ExternalServiceError(f"{self.name}: {e}") from e
+        self.breaker.record_success()
+        return data
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(name):
+    with _clients_lock:
+        client = _clients.get(name)
+        if client is None:
+            client = _clients[name] = ServiceClient(name, settings.EXTERNAL_SERVICES[name])
+        return client
+
+
+@receiver(setting_changed)
+def reset_clients(setting, **kwargs):
+    if setting.startswith('EXTERNAL_'):
+        with _clients_lock:
+            _clients.clear()
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from viewer import search_fts
+from viewer.search import bump_catalog_version
+
+
+class Command(BaseCommand):
+    help = "Přestaví vyhledávací tabulku SQLite FTS5 (produkty, služby, schválení trenéři)."
+
+    def handle(self, *args, **kwargs):
+        if not search_fts.is_available():
+            # Nesmí zastavit setup_database na jiné databázi, hledá se pak indexem v paměti.
+            self.stdout.write(self.style.WARNING("Vyhledávání FTS5 je dostupné jen s databází SQLite, přeskakuji."))
+            return
+
+        count = search_fts.rebuild()
+        bump_catalog_version()
+        self.stdout.write(self.style.SUCCESS(f"Vyhledávací index byl přestavěn ({count} záznamů)."))
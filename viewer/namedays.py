@@ -0,0 +1,40 @@
+"""
+Český občanský kalendář jmenin (viewer/data/namedays_cz.json).
+
+Kalendář se načte jednou do n-tice o 366 položkách podle pořadí dne v přestupném roce,
+jmeniny pro datum jsou pak jen indexem do ní.
+"""
+import json
+from datetime import date
+from functools import cache
+from pathlib import Path
+
+from django.utils import timezone
+
+DATA_FILE = Path(__file__).resolve().parent / 'data' / 'namedays_cz.json'
+
+# Přestupný rok, aby měl i 29. únor vlastní místo.
+_LEAP_YEAR_START = date(2000, 1, 1).toordinal()
+
+
+def _day_index(day):
+    return date(2000, day.month, day.day).toordinal() - _LEAP_YEAR_START
+
+
+@cache
+def calendar():
+    with open(DATA_FILE, encoding='utf-8') as file:
+        names = json.load(file)
+
+    days = [None] * 366
+    for key, name in names.items():
+        month, day = (int(part) for part in key.split('-'))
+        days[_day_index(date(2000, month, day))] = name
+    return tuple(days)
+
+
+def get_name_day(day=None):
+    """Kdo má svátek v daný den (výchozí je dnešek)."""
+    if day is None:
+        day = timezone.localdate()
+    return calendar()[_day_index(day)]
@@ -0,0 +1,86 @@
+from django.core.cache import cache
+
+from accounts.models import UserProfile
+from products.hierarchy import subtree_product_types
+from products.models import Category
+from products.page_cache import invalidate_pages
+
+
+NAVBAR_CACHE_KEY = 'navbar:menus'
+# How long the cached navbar stays valid (seconds). The delete in invalidate_navbar() reaches other
+# workers only through a shared cache (settings.CACHES); the timeout bounds how stale it can get otherwise.
+NAVBAR_CACHE_TIMEOUT = 300
+
+
+def _category_menu(categories, subtree_types, product_type, only_filled_subcategories):
+    """
+    Sestaví menu hlavních kategorií, které (v libovolné hloubce podstromu, jako výpisy
+    přes products.hierarchy.with_products) obsahují produkty daného typu.
+    Kategorie musí být seřazené podle české abecedy.
+    """
+    children = {}
+    for category in categories:
+        if category['category_parent_id'] is not None:
+            children.setdefault(category['category_parent_id'], []).append(category)
+
+    menu = []
+    for category in categories:
+        if category['category_parent_id'] is not None:
+            continue
+        if product_type not in subtree_types.get(category['pk'], ()):
+            continue
+
+        subcategories = children.get(category['pk'], [])
+        if only_filled_subcategories:
+            subcategories = [s for s in subcategories if product_type in subtree_types.get(s['pk'], ())]
+
+        menu.append({
+            'pk': category['pk'],
+            'category_name': category['category_name'],
+            'sorted_subcategories': [
+                {'pk': s['pk'], 'category_name': s['category_name']} for s in subcategories
+            ],
+        })
+
+    return menu
+
+
+def build_navbar():
+    """Načte a seřadí položky menu (produkty, služby, trenéři) jako prostá data."""
+    categories = list(
+        Category.objects.order_by('category_sort_key').values('pk', 'category_name', 'category_parent_id')
+    )
+
+    # Typy produktů v podstromu každé kategorie (tabulka uzávěru stromu), jeden dotaz.
+    subtree_types = subtree_product_types()
+
+    trainers = UserProfile.objects.filter(
+        groups__name='trainer',
+        services__is_approved=True
+    ).order_by('full_name_sort_key').values('pk', 'first_name', 'last_name', 'full_name_sort_key').distinct()
+
+    approved_trainers = [
+        {'pk': trainer['pk'], 'full_name': f"{trainer['first_name']} {trainer['last_name']}"}
+        for trainer in trainers
+    ]
+
+    return {
+        'products_categories': _category_menu(categories, subtree_types, 'merchantdise', True),
+        'services_categories': _category_menu(categories, subtree_types, 'service', False),
+        'approved_trainers': approved_trainers,
+    }
+
+
+def get_navbar():
+    """Vrací menu z cache, při prázdné cache ho sestaví a uloží."""
+    navbar = cache.get(NAVBAR_CACHE_KEY)
+    if navbar is None:
+        navbar = build_navbar()
+        cache.set(NAVBAR_CACHE_KEY, navbar, NAVBAR_CACHE_TIMEOUT)
+    return navbar
+
+
+def invalidate_navbar():
+    cache.delete(NAVBAR_CACHE_KEY)
+    # Menu je součástí stránek detailu uložených v cache.
+    invalidate_pages()
@@ -0,0 +1,660 @@
+import bisect
+import heapq
+import logging
+import re
+import sys
+import threading
+import time
+import unicodedata
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError
+from django.urls import reverse
+
+from accounts.models import UserProfile
+from products.listing import listing_queryset
+from products.models import Product
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r'\w+')
+# Prefixy delší než tato hranice se dohledávají filtrováním slovníku.
+MAX_PREFIX_LENGTH = 20
+
+RESULT_TYPES = ('products', 'services', 'trainers')
+
+# Verze katalogu v cache, zvyšuje se při každé změně, která ovlivní výsledky hledání.
+# Mezi procesy se sdílí jen se společnou cache (REDIS_URL v settings), jinak má každý proces svou.
+CATALOG_VERSION_KEY = 'search:catalog_version'
+# Po kolika dotazech do cache výsledků se zaloguje její úspěšnost.
+CACHE_STATS_LOG_INTERVAL = 1000
+
+
+# Tabulka pro str.translate(), která odstraní všechny nesamostatné znaky (diakritiku, kategorie 'Mn').
+_STRIP_MARKS = dict.fromkeys(
+    code for code in range(sys.maxunicode + 1) if unicodedata.category(chr(code)) == 'Mn'
+)
+
+
+def normalize_for_search(text):
+    return unicodedata.normalize('NFD', text.lower()).translate(_STRIP_MARKS)
+
+
+def tokenize(text):
+    """Rozdělí text bez diakritiky a malými písmeny na slova."""
+    return TOKEN_RE.findall(normalize_for_search(text or ''))
+
+
+def trigrams(token):
+    """Trigramy slova doplněného mezerami (jako pg_trgm): "pro" -> {"  p", " pr", "pro", "ro "}."""
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def get_catalog_version():
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        # Počáteční hodnota z času: po vypadnutí klíče z cache se nepoužije znovu stará verze.
+        cache.add(CATALOG_VERSION_KEY, time.time_ns(), None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def bump_catalog_version():
+    try:
+        return cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        return get_catalog_version()
+
+
+def product_result(product):
+    url_name = 'service' if product.product_type == 'service' else 'product'
+    return {
+        'id': product.id,
+        'name': product.product_name,
+        'description': product.product_short_description,
+        'url': reverse(url_name, args=[product.id]),
+    }
+
+
+def trainer_result(trainer):
+    return {
+        'username': trainer.username,
+        'name': f"{trainer.first_name} {trainer.last_name}",
+        'description': trainer.trainer_short_description,
+        'url': reverse('user_profile', args=[trainer.username]),
+    }
+
+
+def suggestion(doc_id, result):
+    """Položka našeptávače: jen id, název a odkaz."""
+    return {'id': doc_id, 'name': result['name'], 'url': result['url']}
+
+
+def approved_trainers():
+    return UserProfile.objects.filter(groups__name='trainer', services__is_approved=True).distinct()
+
+
+class SearchIndex:
+    """
+    Invertovaný index slov bez diakritiky.
+
+    Každé slovo dotazu se hledá jako prefix slova v dokumentu, všechna slova dotazu
+    musí být nalezena (AND). Výsledky jsou seřazené podle počtu slov nalezených v názvu,
+    potom podle počtu celých (ne jen prefixových) shod a nakonec podle názvu.
+    """
+
+    def __init__(self):
+        self.documents = {}         # doc_id -> (payload, sort_name, tokens)
+        self.name_postings = {}     # slovo -> {doc_id}
+        self.text_postings = {}
+        self.prefixes = {}          # prefix -> {slovo}
+        self.token_counts = {}      # slovo -> počet dokumentů, které ho obsahují
+        self.trigrams = {}          # trigram -> {slovo z názvu}
+        self.trigram_counts = {}    # slovo z názvu -> počet jeho trigramů
+
+    def __len__(self):
+        return len(self.documents)
+
+    def add(self, doc_id, payload, name, text=''):
+        self.remove(doc_id)
+        name_tokens = set(tokenize(name))
+        text_tokens = set(tokenize(text)) - name_tokens
+
+        for token in name_tokens:
+            if token not in self.name_postings:
+                self._add_trigrams(token)
+        for postings, tokens in ((self.name_postings, name_tokens), (self.text_postings, text_tokens)):
+            for token in tokens:
+                postings.setdefault(token, set()).add(doc_id)
+                self._add_token(token)
+
+        self.documents[doc_id] = (payload, normalize_for_search(name), (name_tokens, text_tokens))
+
+    def remove(self, doc_id):
+        document = self.documents.pop(doc_id, None)
+        if document is None:
+            return
+        name_tokens, text_tokens = document[2]
+        for postings, tokens in ((self.name_postings, name_tokens), (self.text_postings, text_tokens)):
+            for token in tokens:
+                docs = postings[token]
+                docs.discard(doc_id)
+                if not docs:
+                    del postings[token]
+                    if postings is self.name_postings:
+                        self._remove_trigrams(token)
+                self._remove_token(token)
+
+    def _add_token(self, token):
+        count = self.token_counts.get(token, 0)
+        if count == 0:
+            for i in range(1, min(len(token), MAX_PREFIX_LENGTH) + 1):
+                self.prefixes.setdefault(token[:i], set()).add(token)
+        self.token_counts[token] = count + 1
+
+    def _remove_token(self, token):
+        count = self.token_counts[token] - 1
+        if count:
+            self.token_counts[token] = count
+            return
+        del self.token_counts[token]
+        for i in range(1, min(len(token), MAX_PREFIX_LENGTH) + 1):
+            tokens = self.prefixes[token[:i]]
+            tokens.discard(token)
+            if not tokens:
+                del self.prefixes[token[:i]]
+
+    def _add_trigrams(self, token):
+        token_trigrams = trigrams(token)
+        for trigram in token_trigrams:
+            self.trigrams.setdefault(trigram, set()).add(token)
+        self.trigram_counts[token] = len(token_trigrams)
+
+    def _remove_trigrams(self, token):
+        del self.trigram_counts[token]
+        for trigram in trigrams(token):
+            tokens = self.trigrams[trigram]
+            tokens.discard(token)
+            if not tokens:
+                del self.trigrams[trigram]
+
+    def similar_tokens(self, term, threshold):
+        """Slova z názvů, jejichž trigramová podobnost (Jaccard) s `term` je alespoň `threshold`."""
+        term_trigrams = trigrams(term)
+        shared = Counter()
+        for trigram in term_trigrams:
+            shared.update(self.trigrams.get(trigram, ()))
+
+        similar = {}
+        for token, count in shared.items():
+            similarity = count / (len(term_trigrams) + self.trigram_counts[token] - count)
+            if similarity >= threshold:
+                similar[token] = similarity
+        return similar
+
+    def _expand(self, term):
+        tokens = self.prefixes.get(term[:MAX_PREFIX_LENGTH], ())
+        if len(term) > MAX_PREFIX_LENGTH:
+            tokens = [token for token in tokens if token.startswith(term)]
+        return tokens
+
+    def search(self, query, limit=None):
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+
+        matches = []
+        for term in terms:
+            tokens = self._expand(term)
+            name_docs = set().union(*(self.name_postings.get(token, ()) for token in tokens))
+            text_docs = set().union(*(self.text_postings.get(token, ()) for token in tokens))
+            if not name_docs and not text_docs:
+                return []
+            matches.append((term, name_docs, text_docs))
+
+        # Průnik začíná nejmenší množinou.
+        matches.sort(key=lambda match: len(match[1]) + len(match[2]))
+        candidates = matches[0][1] | matches[0][2]
+        for _, name_docs, text_docs in matches[1:]:
+            candidates = {doc_id for doc_id in candidates if doc_id in name_docs or doc_id in text_docs}
+
+        exact = [
+            self.name_postings.get(term, set()) | self.text_postings.get(term, set())
+            for term, _, _ in matches
+        ]
+        documents = self.documents
+
+        # Dokumenty se všemi slovy v názvu předběhnou ostatní, stačí tedy seřadit jen je.
+        # Pokud je navíc dost dokumentů se všemi slovy celými, liší se už jen názvem.
+        if limit is not None and len(candidates) > limit:
+            in_name = candidates.intersection(*(name_docs for _, name_docs, _ in matches))
+            if len(in_name) >= limit:
+                candidates = in_name
+                best = in_name.intersection(*exact)
+                if len(best) >= limit:
+                    ranked = heapq.nsmallest(limit, ((documents[doc_id][1], doc_id) for doc_id in best))
+                    return [documents[doc_id][0] for _, doc_id in ranked]
+
+        ranked = []
+        for doc_id in candidates:
+            name_hits = 0
+            for _, name_docs, _ in matches:
+                if doc_id in name_docs:
+                    name_hits += 1
+            exact_hits = 0
+            for exact_docs in exact:
+                if doc_id in exact_docs:
+                    exact_hits += 1
+            ranked.append((-name_hits, -exact_hits, documents[doc_id][1], doc_id))
+
+        if limit is None:
+            ranked.sort()
+        else:
+            ranked = heapq.nsmallest(limit, ranked)
+        return [documents[doc_id][0] for _, _, _, doc_id in ranked]
+
+    def fuzzy_search(self, query, limit=None, threshold=0.3):
+        """
+        Hledání s překlepy v názvech ("protien" -> "protein").
+
+        Každé slovo dotazu musí odpovídat některému slovu názvu buď jako prefix (podobnost 1),
+        nebo trigramovou podobností alespoň `threshold`. Řadí se podle součtu podobností a názvu.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+
+        scores = None
+        for term in terms:
+            similar = self.similar_tokens(term, threshold)
+            for token in self._expand(term):
+                if token in self.name_postings:
+                    similar[token] = 1.0
+
+            term_scores = {}
+            for token, similarity in similar.items():
+                for doc_id in self.name_postings[token]:
+                    if similarity > term_scores.get(doc_id, 0):
+                        term_scores[doc_id] = similarity
+
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {
+                    doc_id: score + term_scores[doc_id]
+                    for doc_id, score in scores.items() if doc_id in term_scores
+                }
+            if not scores:
+                return []
+
+        documents = self.documents
+        ranked = [(-score, documents[doc_id][1], doc_id) for doc_id, score in scores.items()]
+        if limit is None:
+            ranked.sort()
+        else:
+            ranked = heapq.nsmallest(limit, ranked)
+        return [documents[doc_id][0] for _, _, doc_id in ranked]
+
+
+class PrefixIndex:
+    """
+    Seřazené pole klíčů pro našeptávač.
+
+    Klíčem je název bez diakritiky od začátku každého jeho slova ("syrovatkovy protein",
+    "protein"), takže dotaz se hledá jako prefix libovolného slova názvu. Rozsah klíčů
+    s daným prefixem se najde půlením intervalu a čte se jen do naplnění limitu.
+    """
+
+    def __init__(self):
+        self.entries = []       # seřazené dvojice (klíč, doc_id)
+        self.documents = {}     # doc_id -> (payload, klíče)
+
+    def __len__(self):
+        return len(self.documents)
+
+    @staticmethod
+    def keys(name):
+        tokens = tokenize(name)
+        return {' '.join(tokens[i:]) for i in range(len(tokens))}
+
+    @classmethod
+    def from_documents(cls, documents):
+        """Sestaví index z dvojic (doc_id, payload, name) jedním seřazením."""
+        index = cls()
+        for doc_id, payload, name in documents:
+            keys = index.keys(name)
+            index.documents[doc_id] = (payload, keys)
+            index.entries.extend((key, doc_id) for key in keys)
+        index.entries.sort()
+        return index
+
+    def add(self, doc_id, payload, name):
+        self.remove(doc_id)
+        keys = self.keys(name)
+        self.documents[doc_id] = (payload, keys)
+        for key in keys:
+            bisect.insort(self.entries, (key, doc_id))
+
+    def remove(self, doc_id):
+        document = self.documents.pop(doc_id, None)
+        if document is None:
+            return
+        for key in document[1]:
+            position = bisect.bisect_left(self.entries, (key, doc_id))
+            del self.entries[position]
+
+    def suggest(self, query, limit):
+        prefix = ' '.join(tokenize(query))
+        if not prefix or limit < 1:
+            return []
+
+        entries = self.entries
+        results = []
+        seen = set()
+        for position in range(bisect.bisect_left(entries, (prefix,)), len(entries)):
+            key, doc_id = entries[position]
+            if not key.startswith(prefix):
+                break
+            if doc_id in seen:
+                continue
+            seen.add(doc_id)
+            results.append(self.documents[doc_id][0])
+            if len(results) == limit:
+                break
+        return results
+
+
+class CatalogSearch:
+    """
+    Indexy produktů, služeb a schválených trenérů v paměti procesu.
+
+    Pro každý typ drží invertovaný index pro vyhledávání a prefixový index pro našeptávač.
+    Sestaví se při prvním použití (nebo při startu workeru, viz perfectbody/wsgi.py)
+    a průběžně se aktualizují ze signálů (viewer/signals.py).
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.indexes = None
+        self.suggesters = None
+        self.version = None
+
+    @property
+    def is_built(self):
+        return self.indexes is not None
+
+    def build(self, version=None):
+        if version is None:
+            version = get_catalog_version()
+        documents = {result_type: [] for result_type in RESULT_TYPES}
+        products = Product.objects.only('id', 'product_type', 'product_name', 'product_short_description')
+        for product in products.iterator():
+            result_type, document = self._product_document(product)
+            documents[result_type].append(document)
+        for trainer in approved_trainers().iterator():
+            documents['trainers'].append(self._trainer_document(trainer))
+
+        indexes = {}
+        suggesters = {}
+        for result_type, type_documents in documents.items():
+            indexes[result_type] = SearchIndex()
+            for doc_id, result, name, text in type_documents:
+                indexes[result_type].add(doc_id, result, name, text)
+            suggesters[result_type] = PrefixIndex.from_documents(
+                (doc_id, suggestion(doc_id, result), name) for doc_id, result, name, _ in type_documents
+            )
+
+        with self.lock:
+            self.indexes = indexes
+            self.suggesters = suggesters
+            self.version = version
+
+    def ensure_built(self):
+        # Index se přestaví i po změně katalogu v jiném procesu (verze v cache se liší),
+        # pokud procesy sdílejí cache (settings.CACHES); lokální cache procesu změny jiných procesů nevidí.
+        version = get_catalog_version()
+        with self.lock:
+            if self.indexes is None or self.version != version:
+                self.build(version)
+
+    def warm_up(self):
+        try:
+            self.ensure_built()
+        except DatabaseError as e:
+            logger.warning(f"Vyhledávací index nelze sestavit: {e}")
+
+    def reset(self):
+        with self.lock:
+            self.indexes = None
+            self.suggesters = None
+            self.version = None
+
+    def _apply_change(self):
+        """Zvýší verzi katalogu. Vrací True, pokud je index aktuální a změnu lze do něj promítnout."""
+        version = bump_catalog_version()
+        if self.indexes is None or version != self.version + 1:
+            return False
+        self.version = version
+        return True
+
+    @staticmethod
+    def _product_document(product):
+        result_type = 'services' if product.product_type == 'service' else 'products'
+        return result_type, (
+            product.id, product_result(product), product.product_name, product.product_short_description
+        )
+
+    @staticmethod
+    def _trainer_document(trainer):
+        return (
+            trainer.id, trainer_result(trainer),
+            f"{trainer.username} {trainer.first_name} {trainer.last_name}",
+            trainer.trainer_short_description
+        )
+
+    def _add(self, result_type, document):
+        doc_id, result, name, text = document
+        self.indexes[result_type].add(doc_id, result, name, text)
+        self.suggesters[result_type].add(doc_id, suggestion(doc_id, result), name)
+
+    def _remove(self, result_type, doc_id):
+        self.indexes[result_type].remove(doc_id)
+        self.suggesters[result_type].remove(doc_id)
+
+    def update_product(self, product):
+        with self.lock:
+            if not self._apply_change():
+                return
+            self._remove('products', product.id)
+            self._remove('services', product.id)
+            self._add(*self._product_document(product))
+
+    def remove_product(self, product_id):
+        with self.lock:
+            if not self._apply_change():
+                return
+            self._remove('products', product_id)
+            self._remove('services', product_id)
+
+    def update_trainer(self, trainer_id):
+        with self.lock:
+            if not self._apply_change():
+                return
+            trainer = approved_trainers().filter(pk=trainer_id).first()
+            if trainer is None:
+                self._remove('trainers', trainer_id)
+            else:
+                self._add('trainers', self._trainer_document(trainer))
+
+    def remove_trainer(self, trainer_id):
+        with self.lock:
+            if self._apply_change():
+                self._remove('trainers', trainer_id)
+
+    def search(self, query, limit=None):
+        """Výsledky podle prefixů slov; typ bez výsledků se dohledá s tolerancí překlepů."""
+        self.ensure_built()
+        threshold = settings.SEARCH_FUZZY_THRESHOLD
+        with self.lock:
+            results = {}
+            for result_type in RESULT_TYPES:
+                index = self.indexes[result_type]
+                results[result_type] = index.search(query, limit)
+                if not results[result_type] and threshold is not None:
+                    results[result_type] = index.fuzzy_search(query, limit, threshold)
+            return results
+
+    def suggest(self, query, limit):
+        self.ensure_built()
+        with self.lock:
+            return {
+                result_type: self.suggesters[result_type].suggest(query, limit)
+                for result_type in RESULT_TYPES
+            }
+
+
+catalog_search = CatalogSearch()
+
+
+class SearchResultCache:
+    """
+    LRU cache výsledků vyhledávání v paměti procesu.
+
+    Klíčem je dotaz po normalize_for_search() spolu s backendem, limitem a verzí katalogu,
+    po změně katalogu se tedy staré výsledky už nepoužijí (a postupně vypadnou).
+    Velikost a platnost určují settings.SEARCH_CACHE_SIZE (0 = vypnuto) a SEARCH_CACHE_TIMEOUT.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()    # klíč -> (čas vypršení, výsledky)
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self.entries),
+                'max_size': settings.SEARCH_CACHE_SIZE,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def get_or_compute(self, key, compute):
+        max_size = settings.SEARCH_CACHE_SIZE
+        if max_size <= 0:
+            return compute()
+
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] > now:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                self._log_stats()
+                return entry[1]
+            self.misses += 1
+            self._log_stats()
+
+        results = compute()
+        with self.lock:
+            self.entries[key] = (now + settings.SEARCH_CACHE_TIMEOUT, results)
+            self.entries.move_to_end(key)
+            while len(self.entries) > max_size:
+                self.entries.popitem(last=False)
+        return results
+
+    def _log_stats(self):
+        lookups = self.hits + self.misses
+        if lookups % CACHE_STATS_LOG_INTERVAL == 0:
+            logger.info(
+                f"Cache vyhledávání: {self.hits} zásahů, {self.misses} minutí, "
+                f"{len(self.entries)}/{settings.SEARCH_CACHE_SIZE} položek"
+            )
+
+
+search_cache = SearchResultCache()
+
+
+def scan_search(query, limit=None):
+    """Původní vyhledávání: průchod všemi záznamy a hledání podřetězce."""
+    normalized_query = normalize_for_search(query)
+
+    def matches(*texts):
+        return any(normalized_query in normalize_for_search(text or "") for text in texts)
+
+    products = [
+        product_result(product)
+        for product in listing_queryset(Product.objects.filter(product_type='merchantdise'))
+        if matches(product.product_name, product.product_short_description)
+    ]
+    services = [
+        product_result(service)
+        for service in listing_queryset(Product.objects.filter(product_type='service'))
+        if matches(service.product_name, service.product_short_description)
+    ]
+    trainers = [
+        trainer_result(trainer)
+        for trainer in approved_trainers()
+        if matches(trainer.username, trainer.first_name, trainer.last_name, trainer.trainer_short_description)
+    ]
+    return {
+        'products': products[:limit],
+        'services': services[:limit],
+        'trainers': trainers[:limit],
+    }
+
+
+def search_catalog(query, limit=None):
+    """
+    Vyhledá produkty, služby a trenéry pro dotaz.
+
+    Backend určuje settings.SEARCH_BACKEND ('index' = index v paměti, 'fts' = tabulka SQLite FTS5,
+    'snapshot' = sdílený snímek katalogu, products/snapshot.py, 'scan' = průchod tabulkami).
+    Vrací slovník {'products': [...], 'services': [...], 'trainers': [...]}.
+    Výsledky se ukládají do search_cache.
+    """
+    backend = search_backend()
+    version = get_catalog_version()
+    if backend == 'snapshot':
+        # Snímek se mění jen zveřejněním nové verze, ne s verzí katalogu.
+        from products.snapshot import current_snapshot
+        version = current_snapshot().version
+    key = (version, backend, normalize_for_search(query), limit)
+    return search_cache.get_or_compute(key, lambda: _search(backend, query, limit))
+
+
+def _search(backend, query, limit):
+    if backend == 'scan':
+        return scan_search(query, limit)
+    if backend == 'fts':
+        from viewer import search_fts
+        return search_fts.search(query, limit)
+    if backend == 'snapshot':
+        from products.snapshot import current_snapshot
+        return current_snapshot().search(query, limit)
+    return catalog_search.search(query, limit)
+
+
+def search_backend():
+    backend = getattr(settings, 'SEARCH_BACKEND', 'index')
+    if backend == 'fts':
+        from viewer import search_fts
+        if not search_fts.is_available():
+            return 'index'
+    if backend == 'snapshot':
+        from products.snapshot import current_snapshot
+        if current_snapshot() is None:
+            return 'index'
+    return backend
@@ -0,0 +1,154 @@
+"""
+Vyhledávání přes SQLite FTS5 (settings.SEARCH_BACKEND = 'fts').
+
+Tabulka je sdílená všemi workery, udržuje se signály (viewer/signals.py)
+a celá se dá přestavět příkazem `python manage.py rebuild_search_index`.
+"""
+from django.db import connection
+from django.urls import reverse
+
+from products.models import Product
+from viewer.search import RESULT_TYPES, approved_trainers, tokenize
+
+TABLE = 'viewer_search_fts'
+
+# rowid = 2 * pk pro produkty a služby, 2 * pk + 1 pro trenéry
+PRODUCT_ROWID = 0
+TRAINER_ROWID = 1
+
+# Váhy sloupců pro bm25(): username, name, description
+COLUMN_WEIGHTS = (5.0, 10.0, 1.0)
+
+
+def is_available():
+    return connection.vendor == 'sqlite'
+
+
+def _create_table(cursor):
+    cursor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5("
+        "kind UNINDEXED, object_id UNINDEXED, username, name, description, "
+        "tokenize = 'unicode61 remove_diacritics 2')"
+    )
+
+
+def _table_exists(cursor):
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [TABLE])
+    return cursor.fetchone() is not None
+
+
+def _product_row(product):
+    kind = 'services' if product.product_type == 'service' else 'products'
+    return (
+        product.pk * 2 + PRODUCT_ROWID, kind, product.pk, '',
+        product.product_name, product.product_short_description or '',
+    )
+
+
+def _trainer_row(trainer):
+    return (
+        trainer.pk * 2 + TRAINER_ROWID, 'trainers', trainer.pk, trainer.username,
+        f"{trainer.first_name} {trainer.last_name}", trainer.trainer_short_description or '',
+    )
+
+
+def _insert(cursor, rows):
+    cursor.executemany(
+        f"INSERT INTO {TABLE} (rowid, kind, object_id, username, name, description) "
+        "VALUES (%s, %s, %s, %s, %s, %s)",
+        rows
+    )
+
+
+def rebuild():
+    """Přestaví celou tabulku. Vrací počet zaindexovaných záznamů."""
+    products = Product.objects.only('id', 'product_type', 'product_name', 'product_short_description')
+    rows = [_product_row(product) for product in products.iterator()]
+    rows += [_trainer_row(trainer) for trainer in approved_trainers().iterator()]
+
+    with connection.cursor() as cursor:
+        _create_table(cursor)
+        cursor.execute(f"DELETE FROM {TABLE}")
+        _insert(cursor, rows)
+    return len(rows)
+
+
+def _ensure_table(cursor):
+    if not _table_exists(cursor):
+        rebuild()
+
+
+def _delete(cursor, rowid):
+    cursor.execute(f"DELETE FROM {TABLE} WHERE rowid = %s", [rowid])
+
+
+def index_product(product):
+    with connection.cursor() as cursor:
+        if not _table_exists(cursor):
+            return
+        _delete(cursor, product.pk * 2 + PRODUCT_ROWID)
+        _insert(cursor, [_product_row(product)])
+
+
+def remove_product(product_id):
+    with connection.cursor() as cursor:
+        if _table_exists(cursor):
+            _delete(cursor, product_id * 2 + PRODUCT_ROWID)
+
+
+def index_trainer(trainer_id):
+    with connection.cursor() as cursor:
+        if not _table_exists(cursor):
+            return
+        _delete(cursor, trainer_id * 2 + TRAINER_ROWID)
+        trainer = approved_trainers().filter(pk=trainer_id).first()
+        if trainer is not None:
+            _insert(cursor, [_trainer_row(trainer)])
+
+
+def remove_trainer(trainer_id):
+    with connection.cursor() as cursor:
+        if _table_exists(cursor):
+            _delete(cursor, trainer_id * 2 + TRAINER_ROWID)
+
+
+def match_expression(query):
+    """Každé slovo dotazu jako prefix, všechna slova musí být nalezena."""
+    return ' '.join(f'"{token}"*' for token in tokenize(query))
+
+
+def _result(kind, object_id, username, name, description):
+    if kind == 'trainers':
+        return {
+            'username': username,
+            'name': name,
+            'description': description,
+            'url': reverse('user_profile', args=[username]),
+        }
+    return {
+        'id': object_id,
+        'name': name,
+        'description': description,
+        'url': reverse('service' if kind == 'services' else 'product', args=[object_id]),
+    }
+
+
+def search(query, limit=None):
+    results = {result_type: [] for result_type in RESULT_TYPES}
+    expression = match_expression(query)
+    if not expression:
+        return results
+
+    weights = ', '.join(str(weight) for weight in COLUMN_WEIGHTS)
+    with connection.cursor() as cursor:
+        _ensure_table(cursor)
+        for kind in RESULT_TYPES:
+            cursor.execute(
+                f"SELECT kind, object_id, username, name, description FROM {TABLE} "
+                f"WHERE {TABLE} MATCH %s AND kind = %s "
+                f"ORDER BY bm25({TABLE}, 0, 0, {weights}), name "
+                "LIMIT %s",
+                [expression, kind, -1 if limit is None else limit]
+            )
+            results[kind] = [_result(*row) for row in cursor.fetchall()]
+    return results
@@ -0,0 +1,173 @@
+from django.db.models.signals import post_save, post_delete, pre_save, m2m_changed
+from django.dispatch import receiver
+
+from accounts.models import UserProfile, TrainersServices
+from products.models import Category, Product
+from viewer.navbar import invalidate_navbar
+from viewer import search_fts
+from viewer.search import bump_catalog_version, catalog_search
+
+
+# Menu v navigaci se přestaví jen při změnách, které ho skutečně ovlivní
+# (změna skladu při objednávce cache nezneplatní).
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def category_changed(sender, **kwargs):
+    invalidate_navbar()
+
+
+@receiver(pre_save, sender=Product)
+def product_pre_save(sender, instance, **kwargs):
+    if instance.pk is None:
+        return
+    previous = Product.objects.filter(pk=instance.pk).values_list(
+        'product_type', 'category_id', 'product_name', 'product_short_description'
+    ).first()
+    if previous is None:
+        instance._navbar_changed = instance._search_changed = True
+        return
+    product_type, category_id, product_name, short_description = previous
+    if (product_type, category_id) != (instance.product_type, instance.category_id):
+        instance._navbar_changed = True
+    if (product_type, product_name, short_description) != (
+        instance.product_type, instance.product_name, instance.product_short_description
+    ):
+        instance._search_changed = True
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, created, **kwargs):
+    if created or getattr(instance, '_navbar_changed', False):
+        instance._navbar_changed = False
+        invalidate_navbar()
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, **kwargs):
+    invalidate_navbar()
+
+
+@receiver(pre_save, sender=TrainersServices)
+def trainers_service_pre_save(sender, instance, **kwargs):
+    if instance.pk is None:
+        instance._navbar_changed = instance.is_approved
+        return
+    previous = TrainersServices.objects.filter(pk=instance.pk).values_list('is_approved', flat=True).first()
+    instance._navbar_changed = previous != instance.is_approved
+
+
+@receiver(post_save, sender=TrainersServices)
+def trainers_service_saved(sender, instance, **kwargs):
+    if getattr(instance, '_navbar_changed', False):
+        instance._navbar_changed = False
+        invalidate_navbar()
+
+
+@receiver(post_delete, sender=TrainersServices)
+def trainers_service_deleted(sender, instance, **kwargs):
+    if instance.is_approved:
+        invalidate_navbar()
+
+
+# Pole trenéra zobrazená v menu (jméno) a ve výsledcích hledání.
+TRAINER_FIELDS = ('username', 'first_name', 'last_name', 'trainer_short_description')
+
+
+@receiver(pre_save, sender=UserProfile)
+def user_pre_save(sender, instance, update_fields=None, **kwargs):
+    # Menu ani hledání neovlivní ostatní uživatelé a jiná pole (např. přihlášení ukládá jen last_login).
+    if instance.pk is None:
+        return
+    if update_fields is not None and not set(TRAINER_FIELDS) & set(update_fields):
+        return
+    previous = UserProfile.objects.filter(pk=instance.pk, groups__name='trainer').values_list(*TRAINER_FIELDS).first()
+    if previous is None:
+        return
+    if previous[1:3] != (instance.first_name, instance.last_name):
+        instance._navbar_changed = True
+    if previous != tuple(getattr(instance, field) for field in TRAINER_FIELDS):
+        instance._search_changed = True
+
+
+@receiver(post_save, sender=UserProfile)
+def user_saved(sender, instance, **kwargs):
+    if getattr(instance, '_navbar_changed', False):
+        instance._navbar_changed = False
+        invalidate_navbar()
+
+
+@receiver(m2m_changed, sender=UserProfile.groups.through)
+def user_groups_changed(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_navbar()
+
+
+# Průběžná aktualizace vyhledávacího indexu (viewer.search) a tabulky FTS (viewer.search_fts).
+
+def _fts_enabled():
+    # Tabulka FTS se udržuje, kdykoli existuje (funkce search_fts bez ní nic nedělají), i když se
+    # zrovna hledá jinak: po přepnutí SEARCH_BACKEND na 'fts' tak neobsahuje zastaralá data.
+    return search_fts.is_available()
+
+
+def _update_trainer(trainer_id):
+    catalog_search.update_trainer(trainer_id)
+    if _fts_enabled():
+        search_fts.index_trainer(trainer_id)
+
+
+@receiver(post_save, sender=Product)
+def search_product_saved(sender, instance, created, **kwargs):
+    # Změna skladu (objednávky) výsledky hledání neovlivní.
+    if not created and not getattr(instance, '_search_changed', False):
+        return
+    instance._search_changed = False
+    catalog_search.update_product(instance)
+    if _fts_enabled():
+        search_fts.index_product(instance)
+
+
+@receiver(post_delete, sender=Product)
+def search_product_deleted(sender, instance, **kwargs):
+    catalog_search.remove_product(instance.pk)
+    if _fts_enabled():
+        search_fts.remove_product(instance.pk)
+
+
+@receiver(post_save, sender=TrainersServices)
+@receiver(post_delete, sender=TrainersServices)
+def search_trainers_service_changed(sender, instance, **kwargs):
+    _update_trainer(instance.trainer_id)
+
+
+@receiver(post_save, sender=UserProfile)
+def search_user_saved(sender, instance, **kwargs):
+    # Změny trenérů zjistí user_pre_save, ostatní uložení profilu výsledky hledání neovlivní.
+    if not getattr(instance, '_search_changed', False):
+        return
+    instance._search_changed = False
+    _update_trainer(instance.pk)
+
+
+@receiver(post_delete, sender=UserProfile)
+def search_user_deleted(sender, instance, **kwargs):
+    catalog_search.remove_trainer(instance.pk)
+    if _fts_enabled():
+        search_fts.remove_trainer(instance.pk)
+
+
+@receiver(m2m_changed, sender=UserProfile.groups.through)
+def search_user_groups_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        _update_trainer(instance.pk)
+    elif pk_set:
+        for user_id in pk_set:
+            _update_trainer(user_id)
+    else:
+        catalog_search.reset()
+        bump_catalog_version()
+        if _fts_enabled():
+            search_fts.rebuild()
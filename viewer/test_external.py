@@ -0,0 +1,96 @@
+import threading
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from viewer.external import StaleWhileRevalidate, get_weather, run_concurrently
+
+
+class SynchronousThread:
+    """Náhrada threading.Thread, která obnovu spustí hned (kvůli deterministickým testům)."""
+
+    def __init__(self, target, args=(), daemon=None):
+        self.target = target
+        self.args = args
+
+    def start(self):
+        self.target(*self.args)
+
+
+class StaleWhileRevalidateTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.values = StaleWhileRevalidate('test', fresh_for=60, keep_for=600, fallback="záloha")
+        self.calls = []
+
+    def fetch(self, value):
+        def fetch():
+            self.calls.append(value)
+            return value
+        return fetch
+
+    def expire(self, key):
+        value, _ = cache.get(self.values._cache_key(key))
+        cache.set(self.values._cache_key(key), (value, 0), 600)
+
+    def test_fresh_value_served_from_cache(self):
+        self.assertEqual(self.values.get('klic', self.fetch("a")), "a")
+        self.assertEqual(self.values.get('klic', self.fetch("b")), "a")
+        self.assertEqual(self.calls, ["a"])
+
+    @patch('viewer.external.threading.Thread', SynchronousThread)
+    def test_stale_value_served_while_refreshing(self):
+        self.values.get('klic', self.fetch("a"))
+        self.expire('klic')
+        self.assertEqual(self.values.get('klic', self.fetch("b")), "a")
+        self.assertEqual(self.values.get('klic', self.fetch("c")), "b")
+
+    @patch('viewer.external.threading.Thread', SynchronousThread)
+    def test_failed_refresh_keeps_last_value(self):
+        self.values.get('klic', self.fetch("a"))
+        self.expire('klic')
+        self.values.get('klic', self.fetch(None))
+        self.assertEqual(self.values.get('klic', self.fetch("b")), "a")
+
+    def test_fallback_and_failure_not_retried_immediately(self):
+        self.assertEqual(self.values.get('klic', self.fetch(None)), "záloha")
+        self.assertEqual(self.values.get('klic', self.fetch("a")), "záloha")
+        self.assertEqual(self.calls, [None])
+
+    def test_weather_cached_per_normalized_city(self):
+        weather = {'city': "Ústí", 'temperature': "5", 'description': "jasno", 'humidity': "80"}
+        with patch('viewer.external.fetch_weather', return_value=weather) as fetch_weather:
+            self.assertEqual(get_weather("Ústí")['city'], "Ústí")
+            self.assertEqual(get_weather("usti")['city'], "usti")
+        fetch_weather.assert_called_once()
+
+
+class ConcurrentFetchTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_results_in_order_and_deadline(self):
+        release = threading.Event()
+        results = run_concurrently([(release.wait, 5), (str.upper, "a"), (int, "x")], deadline=0.2)
+        release.set()
+        # Pomalé volání přesáhlo deadline, chybné skončilo výjimkou.
+        self.assertEqual(results, [None, "A", None])
+
+    def test_home_fetches_cities_concurrently(self):
+        started = []
+        all_started = threading.Event()
+
+        def fetch_weather(city):
+            # Každé volání čeká, až začnou všechna ostatní: postupně by se nestihla do deadline.
+            started.append(city)
+            if len(started) == 3:
+                all_started.set()
+            all_started.wait(2)
+            return {'city': city, 'temperature': "5", 'description': "jasno", 'humidity': "80"}
+
+        with patch('viewer.external.fetch_weather', fetch_weather):
+            response = self.client.get(reverse('home'))
+
+        self.assertEqual([w['city'] for w in response.context['weather_data']], ['Brno', 'Praha', 'Ostrava'])
@@ -0,0 +1,67 @@
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from viewer.external import get_weather
+from viewer.http_client import CircuitBreaker, CircuitOpenError, ExternalServiceError, get_client
+
+
+class CircuitBreakerTest(TestCase):
+    def test_opens_after_threshold_and_half_opens_after_cooldown(self):
+        breaker = CircuitBreaker(threshold=2, cooldown=60)
+        with patch('viewer.http_client.time.monotonic', return_value=100):
+            breaker.record_failure()
+            self.assertTrue(breaker.allow())
+            breaker.record_failure()
+            self.assertFalse(breaker.allow())
+
+        with patch('viewer.http_client.time.monotonic', return_value=161):
+            self.assertTrue(breaker.allow())
+            # Zkušební volání selhalo, jistič se hned rozpojí znovu.
+            breaker.record_failure()
+            self.assertFalse(breaker.allow())
+            breaker.record_success()
+            self.assertTrue(breaker.allow())
+
+    def test_half_open_lets_single_probe_through(self):
+        breaker = CircuitBreaker(threshold=1, cooldown=60)
+        with patch('viewer.http_client.time.monotonic', return_value=100):
+            breaker.record_failure()
+        with patch('viewer.http_client.time.monotonic', return_value=161):
+            # Dvě souběžná volání po uplynutí doby: projde jen zkušební.
+            self.assertTrue(breaker.allow())
+            self.assertFalse(breaker.allow())
+            breaker.record_failure()
+            self.assertFalse(breaker.allow())
+        with patch('viewer.http_client.time.monotonic', return_value=222):
+            self.assertTrue(breaker.allow())
+            self.assertFalse(breaker.allow())
+            breaker.record_success()
+            self.assertTrue(breaker.allow())
+            self.assertTrue(breaker.allow())
+
+
+@override_settings(EXTERNAL_SERVICES={
+    'weather': {'base_url': 'http://127.0.0.1:9', 'retries': 0, 'failure_threshold': 2},
+})
+class ServiceClientTest(TestCase):
+    def test_unreachable_service_trips_breaker(self):
+        client = get_client('weather')
+        for _ in range(2):
+            with self.assertRaises(ExternalServiceError):
+                client.get_json('/Brno')
+        with patch.object(client.session, 'get') as session_get:
+            with self.assertRaises(CircuitOpenError):
+                client.get_json('/Brno')
+        session_get.assert_not_called()
+
+
+@override_settings(EXTERNAL_STUB=True)
+class StubModeTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_weather_served_from_stubs(self):
+        weather = get_weather("Brno")
+        self.assertEqual((weather['city'], weather['description']), ("Brno", "částečně zataženo"))
@@ -0,0 +1,17 @@
+from datetime import date
+
+from django.test import TestCase
+
+from viewer.namedays import calendar, get_name_day
+
+
+class NameDayTest(TestCase):
+    def test_calendar_covers_every_day(self):
+        self.assertEqual(len(calendar()), 366)
+        self.assertNotIn(None, calendar())
+
+    def test_lookup(self):
+        self.assertEqual(get_name_day(date(2024, 1, 2)), "Karina")
+        self.assertEqual(get_name_day(date(2024, 2, 29)), "Horymír")
+        self.assertEqual(get_name_day(date(2025, 3, 1)), "Bedřich")
+        self.assertEqual(get_name_day(date(2025, 12, 31)), "Silvestr")
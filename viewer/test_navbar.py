@@ -0,0 +1,87 @@
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.test import TestCase
+
+from accounts.models import UserProfile, TrainersServices
+from products.models import Category, Product, Producer
+from viewer.navbar import get_navbar
+
+
+class NavbarCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(category_name="Oblečení")
+        self.subcategory = Category.objects.create(category_name="Čepice", category_parent=self.category)
+        self.empty_subcategory = Category.objects.create(category_name="Boty", category_parent=self.category)
+        self.producer = Producer.objects.create(producer_name="Výrobce")
+        self.product = Product.objects.create(
+            product_type="merchantdise",
+            product_name="Zimní čepice",
+            product_short_description="Krátký popis",
+            product_long_description="Dlouhý popis",
+            price=100,
+            category=self.subcategory,
+            producer=self.producer,
+            stock_availability=5,
+        )
+
+    def test_menu_is_built_once(self):
+        navbar = get_navbar()
+        self.assertEqual([c['category_name'] for c in navbar['products_categories']], ["Oblečení"])
+        self.assertEqual(
+            [s['category_name'] for s in navbar['products_categories'][0]['sorted_subcategories']],
+            ["Čepice"]
+        )
+        with self.assertNumQueries(0):
+            get_navbar()
+
+    def test_category_change_invalidates_menu(self):
+        get_navbar()
+        self.subcategory.category_name = "Kšiltovky"
+        self.subcategory.save()
+        navbar = get_navbar()
+        self.assertEqual(navbar['products_categories'][0]['sorted_subcategories'][0]['category_name'], "Kšiltovky")
+
+    def test_stock_change_keeps_menu(self):
+        get_navbar()
+        self.product.stock_availability = 1
+        self.product.save()
+        with self.assertNumQueries(0):
+            get_navbar()
+
+    def test_products_deeper_in_tree_count(self):
+        # Produkt ve třetí úrovni stromu zobrazí hlavní kategorii i podkategorii, jako výpisy podstromu.
+        shoes = Category.objects.create(category_name="Obuv")
+        sneakers = Category.objects.create(category_name="Tenisky", category_parent=shoes)
+        running = Category.objects.create(category_name="Běžecké", category_parent=sneakers)
+        self.product.category = running
+        self.product.save()
+        navbar = get_navbar()
+        self.assertEqual([c['category_name'] for c in navbar['products_categories']], ["Obuv"])
+        self.assertEqual(
+            [s['category_name'] for s in navbar['products_categories'][0]['sorted_subcategories']], ["Tenisky"]
+        )
+
+    def test_approved_trainer_appears(self):
+        trainer = UserProfile.objects.create_user(
+            username="trener", password="password", first_name="Jan", last_name="Novák"
+        )
+        trainer.groups.add(Group.objects.get_or_create(name='trainer')[0])
+        service = Product.objects.create(
+            product_type="service",
+            product_name="Trénink",
+            product_short_description="Krátký popis",
+            product_long_description="Dlouhý popis",
+            price=500,
+            category=self.category,
+            producer=None,
+        )
+        trainers_service = TrainersServices.objects.create(
+            trainer=trainer, service=service, trainers_service_description="Popis"
+        )
+        self.assertEqual(get_navbar()['approved_trainers'], [])
+
+        trainers_service.is_approved = True
+        trainers_service.save()
+        self.assertEqual(get_navbar()['approved_trainers'], [{'pk': trainer.pk, 'full_name': "Jan Novák"}])
+        self.assertEqual([c['category_name'] for c in get_navbar()['services_categories']], ["Oblečení"])
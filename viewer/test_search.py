@@ -0,0 +1,279 @@
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth.models import Group
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from accounts.models import UserProfile, TrainersServices
+from products.models import Category, Product, Producer
+from viewer.search import PrefixIndex, SearchIndex, SearchResultCache, bump_catalog_version, catalog_search, \
+    get_catalog_version, search_cache
+
+
+class SearchIndexTest(TestCase):
+    def setUp(self):
+        self.index = SearchIndex()
+        self.index.add(1, 'protein', "Syrovátkový protein", "Čokoládová příchuť")
+        self.index.add(2, 'tycinka', "Proteinová tyčinka", "Oříšková")
+        self.index.add(3, 'cinka', "Jednoruční činka", "Pro trénink v posilovně")
+
+    def test_prefix_and_diacritics(self):
+        self.assertEqual(self.index.search("cinka"), ['cinka'])
+        self.assertEqual(self.index.search("ČOKOL"), ['protein'])
+
+    def test_all_terms_must_match(self):
+        self.assertEqual(self.index.search("protein tyc"), ['tycinka'])
+        self.assertEqual(self.index.search("protein posilovna"), [])
+
+    def test_name_match_ranks_first_and_limit(self):
+        self.index.add(4, 'trenink', "Trénink", "")
+        self.assertEqual(self.index.search("trenink"), ['trenink', 'cinka'])
+        self.assertEqual(self.index.search("pro"), ['tycinka', 'protein', 'cinka'])
+        self.assertEqual(self.index.search("pro", limit=1), ['tycinka'])
+
+    def test_remove_prunes_vocabulary(self):
+        self.index.remove(3)
+        self.assertEqual(self.index.search("cinka"), [])
+        self.assertNotIn('jednorucni', self.index.token_counts)
+        self.assertNotIn('jedn', self.index.prefixes)
+        self.assertNotIn('jednorucni', self.index.trigram_counts)
+        self.assertNotIn('ucn', self.index.trigrams)
+
+    def test_fuzzy_search(self):
+        self.assertEqual(self.index.search("protien"), [])
+        self.assertEqual(self.index.fuzzy_search("protien"), ['protein'])
+        self.assertEqual(self.index.fuzzy_search("syrov protien"), ['protein'])
+        self.assertEqual(self.index.fuzzy_search("tycynka"), ['tycinka'])
+        self.assertEqual(self.index.fuzzy_search("tycynka", threshold=0.5), [])
+        self.assertEqual(self.index.fuzzy_search("xyz"), [])
+
+
+class PrefixIndexTest(TestCase):
+    def setUp(self):
+        self.index = PrefixIndex.from_documents([
+            (1, 'protein', "Syrovátkový protein"),
+            (2, 'tycinka', "Proteinová tyčinka"),
+            (3, 'cinka', "Jednoruční činka"),
+        ])
+
+    def test_prefix_of_any_word(self):
+        self.assertEqual(self.index.suggest("pro", 10), ['protein', 'tycinka'])
+        self.assertEqual(self.index.suggest("CINK", 10), ['cinka'])
+        self.assertEqual(self.index.suggest("syrovatkovy pr", 10), ['protein'])
+        self.assertEqual(self.index.suggest("pro", 1), ['protein'])
+
+    def test_add_and_remove(self):
+        self.index.add(4, 'proteinovy', "Proteinový nápoj")
+        self.index.remove(1)
+        self.assertEqual(self.index.suggest("protein", 10), ['tycinka', 'proteinovy'])
+        self.assertEqual(self.index.suggest("syrov", 10), [])
+        self.assertEqual(len(self.index.entries), 6)
+
+
+class SearchResultCacheTest(TestCase):
+    @override_settings(SEARCH_CACHE_SIZE=2)
+    def test_lru_eviction_and_counters(self):
+        results = SearchResultCache()
+        for key in ('a', 'b', 'a', 'c', 'b'):
+            results.get_or_compute(key, lambda: key.upper())
+        # 'b' vypadla jako nejdéle nepoužitá při vložení 'c'
+        self.assertEqual(list(results.entries), ['c', 'b'])
+        stats = results.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['size']), (1, 4, 2))
+
+
+class SearchViewTest(TestCase):
+    def setUp(self):
+        catalog_search.reset()
+        search_cache.clear()
+        self.category = Category.objects.create(category_name="Doplňky")
+        self.producer = Producer.objects.create(producer_name="Výrobce")
+        self.product = Product.objects.create(
+            product_type="merchantdise",
+            product_name="Syrovátkový protein",
+            product_short_description="Čokoládová příchuť",
+            product_long_description="Dlouhý popis",
+            price=500,
+            category=self.category,
+            producer=self.producer,
+        )
+
+    def tearDown(self):
+        catalog_search.reset()
+        search_cache.clear()
+
+    def ajax_search(self, query, **params):
+        response = self.client.get(
+            reverse('search'), {'q': query, **params}, headers={'X-Requested-With': 'XMLHttpRequest'}
+        )
+        return response.json()['results']
+
+    def test_index_follows_catalog_changes(self):
+        self.assertEqual([p['name'] for p in self.ajax_search("protein")['products']], ["Syrovátkový protein"])
+
+        self.product.product_name = "Kreatin"
+        self.product.save()
+        self.assertEqual(self.ajax_search("protein")['products'], [])
+        self.assertEqual(len(self.ajax_search("kreatin")['products']), 1)
+
+        self.product.delete()
+        self.assertEqual(self.ajax_search("kreatin")['products'], [])
+
+    def test_typo_tolerance(self):
+        self.assertEqual([p['name'] for p in self.ajax_search("protien")['products']], ["Syrovátkový protein"])
+
+    def test_results_cached_until_catalog_changes(self):
+        self.client.get(reverse('search'), {'q': "protein"})
+        self.ajax_search("PROTEIN ", limit=50)
+        self.assertEqual(search_cache.stats()['hits'], 1)
+
+        self.product.stock_availability = 5
+        self.product.save()
+        self.ajax_search("protein", limit=50)
+        self.assertEqual(search_cache.stats()['hits'], 2)
+
+        self.product.product_name = "Kreatin"
+        self.product.save()
+        self.assertEqual(self.ajax_search("protein")['products'], [])
+
+    def test_index_rebuilt_after_change_in_other_process(self):
+        self.ajax_search("protein")
+        Product.objects.filter(pk=self.product.pk).update(product_name="Kreatin")
+        bump_catalog_version()
+        self.assertEqual(len(self.ajax_search("kreatin")['products']), 1)
+
+    def test_trainer_indexed_after_approval(self):
+        trainer = UserProfile.objects.create_user(
+            username="trener", password="password", first_name="Jan", last_name="Novák"
+        )
+        trainer.groups.add(Group.objects.get_or_create(name='trainer')[0])
+        service = Product.objects.create(
+            product_type="service",
+            product_name="Osobní trénink",
+            product_short_description="Trénink s trenérem",
+            product_long_description="Dlouhý popis",
+            price=500,
+            category=self.category,
+            producer=None,
+        )
+        trainers_service = TrainersServices.objects.create(
+            trainer=trainer, service=service, trainers_service_description="Popis"
+        )
+        self.assertEqual(self.ajax_search("novak")['trainers'], [])
+        self.assertEqual(self.ajax_search("trenink")['services'][0]['url'], reverse('service', args=[service.pk]))
+
+        trainers_service.is_approved = True
+        trainers_service.save()
+        self.assertEqual(self.ajax_search("novak")['trainers'][0]['username'], "trener")
+
+        # Uložení bez změny polí trenéra ani uložení jiného uživatele verzi katalogu nezvýší.
+        version = get_catalog_version()
+        trainer.email = "trener@example.com"
+        trainer.save()
+        customer = UserProfile.objects.create_user(username="zakaznik", password="password")
+        customer.first_name = "Petr"
+        customer.save()
+        self.assertEqual(get_catalog_version(), version)
+
+        trainer.last_name = "Dvořák"
+        trainer.save()
+        self.assertEqual(self.ajax_search("dvorak")['trainers'][0]['username'], "trener")
+
+    def test_limit_is_applied(self):
+        for i in range(3):
+            Product.objects.create(
+                product_type="merchantdise",
+                product_name=f"Protein {i}",
+                product_short_description="Popis",
+                product_long_description="Dlouhý popis",
+                price=100,
+                category=self.category,
+                producer=self.producer,
+            )
+        self.assertEqual(len(self.ajax_search("protein", limit=2)['products']), 2)
+
+        response = self.client.get(reverse('search'), {'q': "protein"})
+        self.assertEqual(len(response.context['products']), 4)
+
+    def test_suggest_returns_capped_compact_results(self):
+        for i in range(3):
+            Product.objects.create(
+                product_type="merchantdise",
+                product_name=f"Protein {i}",
+                product_short_description="Popis",
+                product_long_description="Dlouhý popis",
+                price=100,
+                category=self.category,
+                producer=self.producer,
+            )
+        response = self.client.get(reverse('search_suggest'), {'q': "prot", 'limit': 2})
+        self.assertIn('max-age', response['Cache-Control'])
+        products = response.json()['results']['products']
+        self.assertEqual([p['name'] for p in products], ["Syrovátkový protein", "Protein 0"])
+        self.assertEqual(set(products[0]), {'id', 'name', 'url'})
+
+        response = self.client.get(reverse('search_suggest'), {'q': "syrov", 'limit': 1000})
+        self.assertEqual(response.json()['results']['products'][0]['id'], self.product.pk)
+
+
+@override_settings(SEARCH_BACKEND='fts')
+class FtsSearchTest(TestCase):
+    def setUp(self):
+        category = Category.objects.create(category_name="Doplňky")
+        self.producer = Producer.objects.create(producer_name="Výrobce")
+        self.product = Product.objects.create(
+            product_type="merchantdise",
+            product_name="Čokoládový protein",
+            product_short_description="Syrovátka",
+            product_long_description="Dlouhý popis",
+            price=500,
+            category=category,
+            producer=self.producer,
+        )
+        self.other = Product.objects.create(
+            product_type="merchantdise",
+            product_name="Tyčinka",
+            product_short_description="S příchutí čokolády",
+            product_long_description="Dlouhý popis",
+            price=50,
+            category=category,
+            producer=self.producer,
+        )
+
+    def search(self, query):
+        response = self.client.get(
+            reverse('search'), {'q': query}, headers={'X-Requested-With': 'XMLHttpRequest'}
+        )
+        return [result['name'] for result in response.json()['results']['products']]
+
+    def test_accent_folding_and_ranking(self):
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.search("cokolad"), ["Čokoládový protein", "Tyčinka"])
+        self.assertEqual(self.search("čokol syrov"), ["Čokoládový protein"])
+
+    def test_table_follows_catalog_changes(self):
+        self.assertEqual(self.search("protein"), ["Čokoládový protein"])
+
+        self.product.product_name = "Kreatin"
+        self.product.save()
+        self.assertEqual(self.search("protein"), [])
+        self.assertEqual(self.search("kreatin"), ["Kreatin"])
+
+        self.product.delete()
+        self.assertEqual(self.search("kreatin"), [])
+
+    def test_table_is_maintained_with_other_backend(self):
+        call_command('rebuild_search_index', stdout=StringIO())
+        with override_settings(SEARCH_BACKEND='index'):
+            self.product.product_name = "Kreatin"
+            self.product.save()
+        self.assertEqual(self.search("protein"), [])
+        self.assertEqual(self.search("kreatin"), ["Kreatin"])
+
+    def test_rebuild_skips_other_databases(self):
+        output = StringIO()
+        with patch('viewer.search_fts.is_available', return_value=False):
+            call_command('rebuild_search_index', stdout=output)
+        self.assertIn("přeskakuji", output.getvalue())
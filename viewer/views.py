@@ -1,106 +1,50 @@
+import hashlib
 import json
 import logging
 
-import requests
-import unicodedata
+from django.conf import settings
 from django.urls import reverse
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
+from django.views.decorators.cache import cache_control
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import etag
 
 from products.models import Product
 from accounts.models import UserProfile, TrainersServices, Address
 from django.http import JsonResponse
+from django.utils.cache import patch_cache_control
+from viewer.external import HOME_DEADLINE, get_weather, run_concurrently
+from viewer.namedays import get_name_day
+from viewer.search import search_catalog, catalog_search, RESULT_TYPES
 
 
 def clean_city_name(city):
     return ''.join(c for c in city if not c.isdigit()).strip()
 
-def translate_weather_description(description):
-    translations = {
-        "Sunny": "slunečno",
-        "Cloudy": "zataženo",
-        "Partly cloudy": "částečně zataženo",
-        "Mist": "mlha",
-        "Rain": "déšť",
-        "Snow": "sníh",
-        "Thunderstorm": "bouřka",
-        "Fog": "mlha",
-        "Clear": "jasno",
-        "Overcast": "převážně zataženo",
-        "Light rain": "slabý déšť",
-        "Heavy rain": "silný déšť",
-        "Light snow": "slabé sněžení",
-        "Heavy snow": "silné sněžení",
-        "Showers": "přeháňky",
-        "Drizzle": "mrholení",
-        "Light drizzle": "slabé mrholení",
-        "Heavy drizzle": "silné mrholení",
-        "Hail": "kroupy",
-        "Sleet": "déšť se sněhem",
-        "Blizzard": "vánice",
-        "Freezing rain": "mrznoucí déšť",
-        "Windy": "větrno",
-        "Breezy": "mírný vítr",
-        "Gale": "bouřlivý vítr",
-        "Hurricane": "hurikán",
-        "Tornado": "tornádo",
-    }
-    return translations.get(description, description)
-
-def get_weather(city):
-    try:
-        url = f"https://wttr.in/{city}?format=j1"
-        response = requests.get(url)
-        if response.status_code == 200:
-            data = response.json()
-            current_condition = data['current_condition'][0]
-            return {
-                'city': city,
-                'temperature': current_condition['temp_C'],
-                'description': translate_weather_description(current_condition['weatherDesc'][0]['value']),
-                'humidity': current_condition['humidity'],
-            }
-    except Exception as e:
-        print(f"Chyba při získávání počasí: {e}")
-    return None
-
 def home(request):
-    name_day = get_name_day()
-
     default_cities = ['Brno', 'Praha', 'Ostrava']
-    weather_data = []
 
+    user_city = None
     if request.user.is_authenticated:
         address = Address.objects.filter(user=request.user).order_by('-id').first()
         if address:
             user_city = clean_city_name(address.city)
-            weather = get_weather(user_city)
-            if weather:
-                weather_data.append(weather)
 
-    if not weather_data:
-        for city in default_cities:
-            weather = get_weather(city)
-            if weather:
-                weather_data.append(weather)
+    # Počasí pro všechna města se načítá souběžně, výchozí města pro případ,
+    # že počasí pro město uživatele není dostupné.
+    cities = ([user_city] if user_city else []) + default_cities
+    weather = run_concurrently([(get_weather, city) for city in cities], HOME_DEADLINE)
 
-    return render(request, 'home.html', {'name_day': name_day, 'weather_data': weather_data})
+    if user_city and weather[0]:
+        weather_data = [weather[0]]
+    else:
+        weather_data = [report for report in weather[-len(default_cities):] if report]
 
-def get_name_day():
-    try:
-        response = requests.get('https://nameday.abalin.net/api/V1/today?country=cz')
-        if response.status_code == 200:
-            data = response.json()
-            if 'nameday' in data and 'cz' in data['nameday']:
-                return data['nameday']['cz']
-            else:
-                return "Není dostupné"
-        else:
-            return "API nedostupné"
-    except Exception as e:
-        print(f"Chyba při získávání jmenin: {e}")
-        return "Chyba"
+    return render(request, 'home.html', {
+        'name_day': get_name_day(),
+        'weather_data': weather_data,
+    })
 
 logger = logging.getLogger(__name__)
 
@@ -292,31 +236,11 @@ def user_profile_view(request, username):
     })
 
 
-def get_name_day():
-    try:
-        response = requests.get('https://nameday.abalin.net/api/V1/today?country=cz')
-        if response.status_code == 200:
-            data = response.json()
-            if 'nameday' in data and 'cz' in data['nameday']:
-                return data['nameday']['cz']
-            else:
-                return "Není dostupné"
-        else:
-            return "API nedostupné"
-    except Exception as e:
-        return f"Chyba: {e}"
-
-
-def normalize_for_search(text):
-    return ''.join(
-        c for c in unicodedata.normalize('NFD', text.lower())
-        if unicodedata.category(c) != 'Mn'
-    )
-
 def search(request):
     query = request.GET.get('q', '').strip()
+    is_ajax = request.headers.get('X-Requested-With') == 'XMLHttpRequest'
     if not query:
-        if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        if is_ajax:
             return JsonResponse({'success': True, 'results': []})
         return render(request, 'search_results.html', {
             'query': query,
@@ -325,74 +249,52 @@ def search(request):
             'trainers': [],
         })
 
-    normalized_query = normalize_for_search(query)
-
-    # Vyhledávání produktů
-    products = [
-        {
-            'id': product.id,
-            'name': product.product_name,
-            'description': product.product_short_description,
-            'url': reverse('product', args=[product.id])
-        }
-        for product in Product.objects.filter(product_type='merchantdise')
-        if normalized_query in normalize_for_search(product.product_name)
-           or normalized_query in normalize_for_search(product.product_short_description or "")
-    ]
-
-    # Vyhledávání služeb
-    services = [
-        {
-            'id': service.id,
-            'name': service.product_name,
-            'description': service.product_short_description,
-            'url': reverse('service', args=[service.id])
-        }
-        for service in Product.objects.filter(product_type='service')
-        if normalized_query in normalize_for_search(service.product_name)
-           or normalized_query in normalize_for_search(service.product_short_description or "")
-    ]
-
-    # Vyhledávání trenérů se schválenými službami
-    trainers = UserProfile.objects.filter(
-        groups__name='trainer',
-        services__is_approved=True
-    ).distinct()
+    # Počet výsledků pro každý typ (našeptávač v navigaci zobrazuje méně položek).
+    max_limit = settings.SEARCH_RESULTS_LIMIT
+    try:
+        limit = int(request.GET.get('limit', 10 if is_ajax else max_limit))
+    except ValueError:
+        limit = max_limit
+    limit = min(max(limit, 1), max_limit)
 
-    filtered_trainers = [
-        {
-            'username': trainer.username,
-            'name': f"{trainer.first_name} {trainer.last_name}",
-            'description': trainer.trainer_short_description,
-            'url': reverse('user_profile', args=[trainer.username])
-        }
-        for trainer in trainers
-        if (
-            normalized_query in normalize_for_search(trainer.username)
-            or normalized_query in normalize_for_search(trainer.first_name)
-            or normalized_query in normalize_for_search(trainer.last_name)
-            or normalized_query in normalize_for_search(trainer.trainer_short_description or "")
-        )
-    ]
+    results = search_catalog(query, limit)
 
-    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+    if is_ajax:
         return JsonResponse({
             'success': True,
-            'results': {
-                'products': products,
-                'services': services,
-                'trainers': filtered_trainers,
-            }
+            'results': results,
         })
 
     return render(request, 'search_results.html', {
         'query': query,
-        'products': products,
-        'services': services,
-        'trainers': filtered_trainers,
+        'products': results['products'],
+        'services': results['services'],
+        'trainers': results['trainers'],
     })
 
 
+def search_suggest(request):
+    """Našeptávač v navigaci: několik položek každého typu (id, název, odkaz) podle prefixu."""
+    query = request.GET.get('q', '').strip()[:settings.SEARCH_SUGGEST_MAX_QUERY_LENGTH]
+
+    max_limit = settings.SEARCH_SUGGEST_MAX_LIMIT
+    try:
+        limit = int(request.GET.get('limit', settings.SEARCH_SUGGEST_LIMIT))
+    except ValueError:
+        limit = settings.SEARCH_SUGGEST_LIMIT
+    limit = min(max(limit, 1), max_limit)
+
+    if query:
+        results = catalog_search.suggest(query, limit)
+    else:
+        results = {result_type: [] for result_type in RESULT_TYPES}
+
+    response = JsonResponse({'success': True, 'results': results})
+    # Stejné prefixy se opakují, odpověď může obsloužit cache prohlížeče nebo proxy.
+    patch_cache_control(response, public=True, max_age=settings.SEARCH_SUGGEST_MAX_AGE)
+    return response
+
+
 def update_note_in_cart(request, product_id):
     if request.method == "POST":
         note = request.POST.get('note', '').strip()
@@ -409,6 +311,15 @@ def update_note_in_cart(request, product_id):
 
 logger = logging.getLogger(__name__)
 
+def cart_etag(request):
+    """Verze košíku v session: otisk jeho obsahu, změní se s každou úpravou košíku."""
+    cart = request.session.get('cart', {})
+    return hashlib.md5(json.dumps(cart, sort_keys=True, default=str).encode()).hexdigest()
+
+
+# Košík patří jednomu návštěvníkovi; prohlížeč se vždy zeptá a při shodě ETagu dostane 304.
+@cache_control(private=True, no_cache=True)
+@etag(cart_etag)
 def cart_data(request):
     cart = request.session.get('cart', {})  # Načítání košíku ze session
     logger.info(f"Cart data: {cart}")  # Výpis obsahu košíku do logu
@@ -432,6 +343,8 @@ def cart_data(request):
         'cart_count': sum(item['quantity'] for item in cart.values())  # Počet položek
     })
 
+@cache_control(private=True, no_cache=True)
+@etag(cart_etag)
 def cart_data_navbar(request):
     cart = request.session.get('cart', {})
     cart_items = [